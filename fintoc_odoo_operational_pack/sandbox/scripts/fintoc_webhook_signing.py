@@ -0,0 +1,24 @@
+"""Fintoc webhook signing, as verified by `_fintoc_validate_webhook_signature` in Odoo.
+
+The `Fintoc-Signature` header is `t=<unix timestamp>,v1=<hex HMAC-SHA256>`, where the HMAC of the
+webhook secret is computed over `<timestamp>.<raw body>`.
+"""
+import hashlib
+import hmac
+import time
+
+
+def sign(body, secret, timestamp=None):
+    """Return the `Fintoc-Signature` header value of a raw webhook body.
+
+    :param str body: The exact raw body that will be sent.
+    :param str secret: The webhook secret (FINTOC_WEBHOOK_SECRET).
+    :param int timestamp: The signature timestamp; defaults to now.
+    """
+    timestamp = int(time.time()) if timestamp is None else int(timestamp)
+    signature = hmac.new(
+        secret.encode('utf-8'),
+        f'{timestamp}.{body}'.encode('utf-8'),
+        hashlib.sha256,
+    ).hexdigest()
+    return f't={timestamp},v1={signature}'
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""Send signed Fintoc webhooks to Odoo, one at a time or as a concurrent load test.
+
+Payloads are built from `sandbox/webhook-fixtures.json` and signed in the exact
+`Fintoc-Signature: t=<timestamp>,v1=<hmac>` format verified by the Odoo module.
+
+Single webhook (replaces the former simulate_webhook.sh):
+
+    python3 sandbox/scripts/load_webhooks.py --url https://<odoo>/payment/fintoc/webhook \
+        --secret "$FINTOC_WEBHOOK_SECRET_TEST" --event payment_intent.succeeded \
+        --tx-ref TX-REF-001 --resource-id pi_test_001
+
+Load test: 500 transaction lifecycles at 50 webhooks/s over 16 connections, with 5% duplicated
+deliveries, 10% lifecycles delivered out of order and 2% stale signatures:
+
+    python3 sandbox/scripts/load_webhooks.py --url http://localhost:8069/payment/fintoc/webhook \
+        --secret whsec_test_123 --flows 500 --rate 50 --concurrency 16 \
+        --tx-ref-template 'LOAD-{n}' --duplicate-rate 0.05 --out-of-order-rate 0.1 \
+        --stale-rate 0.02
+
+Each lifecycle `n` targets the transaction reference built from `--tx-ref-template` and the Fintoc
+ids `cs_load_<n>`, `pi_load_<n>` and `re_load_<n>`. A payment lifecycle is
+`checkout_session.finished` then one `payment_intent.*` status; a refund lifecycle is `refund.in_progress` then one final
+`refund.*` status. Only the event types given to `--event-types` are sent.
+"""
+import argparse
+import copy
+import http.client
+import json
+import os
+import random
+import ssl
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from fintoc_webhook_signing import sign
+
+DEFAULT_FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'webhook-fixtures.json'
+)
+PAYMENT_STATUS_EVENTS = (
+    'payment_intent.succeeded',
+    'payment_intent.failed',
+    'payment_intent.rejected',
+)
+REFUND_STATUS_EVENTS = ('refund.succeeded', 'refund.failed')
+
+
+class Delivery:
+    """One webhook delivery and its outcome."""
+
+    def __init__(self, event, kind='normal', timestamp_offset=0):
+        self.event = event
+        self.body = json.dumps(event)
+        self.kind = kind  # normal, duplicate, out_of_order or stale
+        self.timestamp_offset = timestamp_offset
+        self.http_status = None
+        self.response_status = None
+        self.latency = None
+
+    @property
+    def expected_http_status(self):
+        return 403 if self.kind == 'stale' else 200
+
+
+class WebhookClient:
+    """Thread-local keep-alive connections to the webhook URL."""
+
+    def __init__(self, url, timeout, insecure=False):
+        self.url = urlsplit(url)
+        self.timeout = timeout
+        self.ssl_context = ssl._create_unverified_context() if insecure else None
+        self._local = threading.local()
+
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.url.scheme == 'https':
+                connection = http.client.HTTPSConnection(
+                    self.url.netloc, timeout=self.timeout, context=self.ssl_context
+                )
+            else:
+                connection = http.client.HTTPConnection(self.url.netloc, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def post(self, body, headers):
+        path = self.url.path or '/'
+        if self.url.query:
+            path = f'{path}?{self.url.query}'
+        for attempt in range(2):  # Reconnect once if the server closed the kept-alive connection.
+            connection = self._get_connection()
+            try:
+                connection.request('POST', path, body=body.encode('utf-8'), headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+
+def build_event(fixture, event_id, tx_ref, resource_ids, reason=None):
+    """Return a copy of the fixture with the given identifiers."""
+    event = copy.deepcopy(fixture)
+    event['id'] = event_id
+    event['created_at'] = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+    data = event['data']
+    event_type = event['type']
+    if event_type == 'checkout_session.finished':
+        data.update({'id': resource_ids['cs'], 'payment_intent_id': resource_ids['pi']})
+    elif event_type.startswith('payment_intent.'):
+        data['id'] = resource_ids['pi']
+    elif event_type.startswith('refund.'):
+        data.update({'id': resource_ids['re'], 'resource_id': resource_ids['pi']})
+    data.setdefault('metadata', {})['odoo_tx_reference'] = tx_ref
+    if reason:
+        data['failure_reason' if 'failure_reason' in data else 'reason'] = reason
+    return event
+
+
+def build_flows(fixtures, args):
+    """Return the lifecycles to deliver, each as a chronologically ordered list of events."""
+    event_types = args.event_types or list(fixtures)
+    payment_statuses = [t for t in PAYMENT_STATUS_EVENTS if t in event_types]
+    refund_statuses = [t for t in REFUND_STATUS_EVENTS if t in event_types]
+    families = []
+    if 'checkout_session.finished' in event_types or payment_statuses:
+        families.append(('checkout_session.finished', payment_statuses))
+    if 'refund.in_progress' in event_types or refund_statuses:
+        families.append(('refund.in_progress', refund_statuses))
+    if not families:
+        sys.exit(f"No supported event type among {', '.join(event_types)}")
+
+    flows = []
+    for n in range(args.flows):
+        first_type, status_types = families[n % len(families)]
+        lifecycle_types = [first_type] if first_type in event_types else []
+        if status_types:
+            lifecycle_types.append(status_types[(n // len(families)) % len(status_types)])
+        resource_ids = {'cs': f'cs_load_{n}', 'pi': f'pi_load_{n}', 're': f're_load_{n}'}
+        tx_ref = args.tx_ref_template.format(n=n)
+        if first_type.startswith('refund.') and args.refund_tx_ref_template:
+            tx_ref = args.refund_tx_ref_template.format(n=n)
+        flows.append([
+            build_event(
+                fixtures[event_type], f'evt_load_{args.run_id}_{n}_{i}', tx_ref, resource_ids
+            )
+            for i, event_type in enumerate(lifecycle_types)
+        ])
+    return flows
+
+
+def build_deliveries(flows, args, rng):
+    """Interleave the lifecycles into a delivery schedule, injecting the faults."""
+    scheduled = []
+    for events in flows:
+        kind = 'normal'
+        if len(events) > 1 and rng.random() < args.out_of_order_rate:
+            events = list(reversed(events))
+            kind = 'out_of_order'
+        # Lifecycles start at random points of the run and overlap each other.
+        position = rng.uniform(0, len(flows))
+        for event in events:
+            if rng.random() < args.stale_rate:
+                delivery = Delivery(event, 'stale', -args.stale_age)
+            else:
+                delivery = Delivery(event, kind)
+            scheduled.append((position, delivery))
+            if delivery.kind != 'stale' and rng.random() < args.duplicate_rate:
+                scheduled.append((position + rng.uniform(0, 10), Delivery(event, 'duplicate')))
+            position += rng.uniform(1, 5)
+    scheduled.sort(key=lambda item: item[0])
+    return [delivery for _position, delivery in scheduled]
+
+
+def send(client, secret, delivery):
+    timestamp = int(time.time()) + delivery.timestamp_offset
+    headers = {
+        'Content-Type': 'application/json',
+        'Fintoc-Signature': sign(delivery.body, secret, timestamp),
+    }
+    start = time.monotonic()
+    try:
+        delivery.http_status, response_body = client.post(delivery.body, headers)
+    except (http.client.HTTPException, OSError) as error:
+        delivery.http_status, response_body = 'error', str(error).encode()
+    delivery.latency = time.monotonic() - start
+    try:
+        delivery.response_status = json.loads(response_body).get('status')
+    except (ValueError, AttributeError):
+        delivery.response_status = None
+    return delivery
+
+
+def run(deliveries, args):
+    client = WebhookClient(args.url, args.timeout, insecure=args.insecure)
+    start = time.monotonic()
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for i, delivery in enumerate(deliveries):
+            if args.rate:
+                # Open loop: deliveries are scheduled at the target rate, whatever the latency.
+                delay = start + i / args.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(executor.submit(send, client, args.secret, delivery))
+        results = [future.result() for future in futures]
+    return results, time.monotonic() - start
+
+
+def format_latencies(latencies):
+    if not latencies:
+        return 'n/a'
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return (
+        f"p50={percentile(50):.1f}ms p90={percentile(90):.1f}ms p99={percentile(99):.1f}ms "
+        f"max={ordered[-1] * 1000:.1f}ms mean={statistics.mean(ordered) * 1000:.1f}ms"
+    )
+
+
+def build_report(results, elapsed):
+    by_type = defaultdict(list)
+    outcomes = Counter()
+    unexpected = Counter()
+    for delivery in results:
+        by_type[delivery.event['type']].append(delivery.latency)
+        outcomes[(delivery.kind, delivery.http_status, delivery.response_status)] += 1
+        if delivery.http_status != delivery.expected_http_status:
+            unexpected[(delivery.kind, delivery.http_status)] += 1
+    return {
+        'deliveries': len(results),
+        'elapsed_seconds': round(elapsed, 3),
+        'achieved_rate': round(len(results) / elapsed, 2) if elapsed else None,
+        'latency': format_latencies([d.latency for d in results]),
+        'latency_by_event_type': {t: format_latencies(l) for t, l in sorted(by_type.items())},
+        'outcomes': {
+            f'{kind} http={http_status} status={status}': count
+            for (kind, http_status, status), count in sorted(outcomes.items(), key=str)
+        },
+        'unexpected_http_statuses': {
+            f'{kind} http={http_status}': count for (kind, http_status), count in unexpected.items()
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n', 1)[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('\n\n', 1)[1],
+    )
+    parser.add_argument('--url', required=True, help="Odoo webhook URL.")
+    parser.add_argument('--secret', required=True, help="Webhook secret of the provider.")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_PATH)
+
+    single = parser.add_argument_group("single webhook")
+    single.add_argument('--event', help="Send a single webhook of this event type.")
+    single.add_argument('--tx-ref', help="Odoo transaction reference of the single webhook.")
+    single.add_argument('--resource-id', help="Fintoc id of the payment intent or refund.")
+    single.add_argument('--event-id')
+    single.add_argument('--reason', help="Failure reason of failed/rejected events.")
+
+    load = parser.add_argument_group("load test")
+    load.add_argument('--flows', type=int, default=100, help="Transaction lifecycles to deliver.")
+    load.add_argument('--event-types', nargs='+', help="Event types to send (default: all).")
+    load.add_argument('--tx-ref-template', default='TX-REF-{n}')
+    load.add_argument('--refund-tx-ref-template', default='R-TX-REF-{n}')
+    load.add_argument('--rate', type=float, default=0, help="Target webhooks/s (0: unbounded).")
+    load.add_argument('--concurrency', type=int, default=8)
+    load.add_argument('--duplicate-rate', type=float, default=0.0)
+    load.add_argument('--out-of-order-rate', type=float, default=0.0)
+    load.add_argument('--stale-rate', type=float, default=0.0)
+    load.add_argument('--stale-age', type=int, default=600, help="Age of stale signatures (s).")
+    load.add_argument('--seed', type=int)
+    load.add_argument('--timeout', type=float, default=30)
+    load.add_argument('--insecure', action='store_true', help="Skip TLS verification.")
+    load.add_argument('--json', action='store_true', help="Print the report as JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.run_id = f'{int(time.time())}{random.randint(0, 999):03d}'
+    with open(args.fixtures, encoding='utf-8') as fixtures_file:
+        fixtures = json.load(fixtures_file)
+
+    if args.event:
+        if args.event not in fixtures:
+            sys.exit(f"Unsupported event: {args.event}")
+        resource_id = args.resource_id or (
+            're_test_001' if args.event.startswith('refund.') else 'pi_test_001'
+        )
+        resource_ids = {'cs': 'cs_test_001', 'pi': resource_id, 're': resource_id}
+        if args.event.startswith('refund.'):
+            resource_ids['pi'] = fixtures[args.event]['data'].get('resource_id') or 'pi_test_001'
+        event = build_event(
+            fixtures[args.event],
+            args.event_id or f'evt_{args.run_id}',
+            args.tx_ref or fixtures[args.event]['data']['metadata']['odoo_tx_reference'],
+            resource_ids,
+            reason=args.reason,
+        )
+        client = WebhookClient(args.url, args.timeout, insecure=args.insecure)
+        delivery = send(client, args.secret, Delivery(event))
+        print(
+            f"HTTP {delivery.http_status} status={delivery.response_status} "
+            f"({delivery.latency * 1000:.1f} ms)"
+        )
+        return 0 if delivery.http_status == 200 else 1
+
+    rng = random.Random(args.seed)
+    deliveries = build_deliveries(build_flows(fixtures, args), args, rng)
+    results, elapsed = run(deliveries, args)
+    report = build_report(results, elapsed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            if isinstance(value, dict):
+                print(f"{key}:")
+                for sub_key, sub_value in value.items():
+                    print(f"  {sub_key}: {sub_value}")
+            else:
+                print(f"{key}: {value}")
+    return 1 if report['unexpected_http_statuses'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
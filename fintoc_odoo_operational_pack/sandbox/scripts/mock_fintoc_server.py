@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Fintoc API described in `contract/openapi.yaml`.
+
+It only depends on the Python standard library. Point the `API Base URL` of the Odoo provider at it
+(e.g. `http://localhost:8787`) to run the checkout, refund and webhook flows without network access:
+
+    python3 sandbox/scripts/mock_fintoc_server.py --port 8787 \
+        --webhook-url http://localhost:8069/payment/fintoc/webhook/1 \
+        --webhook-secret whsec_test_123
+
+Implemented API endpoints:
+- POST /v2/checkout_sessions, POST /v1/checkout_sessions, GET /v{1,2}/checkout_sessions/<id>
+- GET /v1/payment_intents/<id>
+- POST /v1/webhook_endpoints, PUT /v1/webhook_endpoints/<id>
+- POST /v1/refunds, GET /v1/refunds/<id>, POST /v1/refunds/<id>/cancel
+
+Checkout sessions redirect the customer to `/_mock/checkout/<id>`, a page that completes the payment
+(`?outcome=succeeded|failed|rejected|cancel`), emits the signed webhooks and redirects back to Odoo.
+
+Control endpoints, to change the injected behavior while the server runs:
+- GET/POST /_mock/config   Read or partially update the settings (same names as the CLI options).
+- GET /_mock/state         Stored resources and counters.
+- POST /_mock/reset        Forget all resources.
+- POST /_mock/events       Emit a signed webhook: {"type": "...", "resource_id": "...", "data": {}}.
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from fintoc_webhook_signing import sign
+
+_logger = logging.getLogger('mock_fintoc')
+
+DEFAULT_CONFIG = {
+    'latency_ms': 0,  # Added to every API call.
+    'latency_jitter_ms': 0,  # Uniform random extra latency, in [0, latency_jitter_ms].
+    'error_rate': 0.0,  # Share of the API calls answered with `error_status`.
+    'error_status': 503,
+    'v2_not_found': False,  # Answer 404 on /v2/checkout_sessions, like accounts without /v2.
+    'payment_intent_unsupported': False,  # Reject checkout sessions using payment_intent.
+    'auto_complete': '',  # Complete checkout sessions right away with this payment outcome.
+    'refund_outcome': 'succeeded',  # Final status of refunds: succeeded, failed or none.
+    'webhook_url': '',  # Overrides the URLs registered through /v1/webhook_endpoints.
+    'webhook_secret': '',
+    'webhook_delay_ms': 200,  # Delay before each emitted webhook.
+}
+
+PAYMENT_OUTCOMES = ('succeeded', 'failed', 'rejected')
+FAILURE_REASONS = {
+    'failed': ('failure_reason', 'insufficient_funds'),
+    'rejected': ('reason', 'compliance_check_failed'),
+}
+
+
+class MockFintoc:
+    """The resources and settings of the mock server, shared by all request threads."""
+
+    def __init__(self, config):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.lock = threading.Lock()
+        self.webhook_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='webhook')
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkout_sessions = {}
+            self.payment_intents = {}
+            self.refunds = {}
+            self.webhook_endpoints = {}
+            self.idempotent_responses = {}
+            self.counters = dict.fromkeys(
+                ('api_calls', 'injected_errors', 'webhooks_sent', 'webhooks_failed'), 0
+            )
+            self.id_sequence = itertools.count(1)
+
+    def new_id(self, prefix):
+        return f'{prefix}_{next(self.id_sequence):06d}{secrets.token_hex(4)}'
+
+    # === WEBHOOKS === #
+
+    def emit(self, event_type, resource, delay_ms=None):
+        """Send a signed webhook for a resource to the configured or registered endpoints."""
+        with self.lock:
+            urls = [self.config['webhook_url']] if self.config['webhook_url'] else [
+                endpoint['url'] for endpoint in self.webhook_endpoints.values()
+                if event_type in endpoint['enabled_events']
+            ]
+        event = {
+            'id': self.new_id('evt'),
+            'type': event_type,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+            'data': dict(resource),
+        }
+        if delay_ms is None:
+            delay_ms = self.config['webhook_delay_ms']
+        for url in urls:
+            self.webhook_executor.submit(self._send_webhook, url, event, delay_ms)
+        return event
+
+    def _send_webhook(self, url, event, delay_ms):
+        time.sleep(delay_ms / 1000)
+        body = json.dumps(event)
+        headers = {'Content-Type': 'application/json'}
+        if self.config['webhook_secret']:
+            headers['Fintoc-Signature'] = sign(body, self.config['webhook_secret'])
+        request = urllib.request.Request(url, data=body.encode(), headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                _logger.info("Webhook %s %s -> %s", event['type'], event['id'], response.status)
+            counter = 'webhooks_sent'
+        except (urllib.error.URLError, OSError) as error:
+            _logger.warning(
+                "Webhook %s %s to %s failed: %s", event['type'], event['id'], url, error
+            )
+            counter = 'webhooks_failed'
+        with self.lock:
+            self.counters[counter] += 1
+
+    # === BUSINESS === #
+
+    def complete_checkout(self, session, outcome):
+        """Pay a checkout session and emit its webhooks, as if the customer had paid."""
+        with self.lock:
+            payment_intent = {
+                'id': self.new_id('pi'),
+                'object': 'payment_intent',
+                'amount': session['amount'],
+                'currency': session['currency'],
+                'status': outcome,
+                'checkout_session_id': session['id'],
+                'metadata': session.get('metadata') or {},
+            }
+            if outcome in FAILURE_REASONS:
+                key, reason = FAILURE_REASONS[outcome]
+                payment_intent[key] = reason
+            self.payment_intents[payment_intent['id']] = payment_intent
+            session.update({'status': 'finished', 'payment_intent_id': payment_intent['id']})
+        self.emit('checkout_session.finished', session)
+        self.emit(f'payment_intent.{outcome}', payment_intent)
+        return payment_intent
+
+    def settle_refund(self, refund):
+        """Move an in-progress refund to its configured final status and emit its webhook."""
+        time.sleep(self.config['webhook_delay_ms'] / 1000)
+        outcome = self.config['refund_outcome']
+        with self.lock:
+            if outcome not in ('succeeded', 'failed') or refund['status'] != 'in_progress':
+                return
+            refund['status'] = outcome
+            if outcome == 'failed':
+                refund['failure_reason'] = 'refund_window_expired'
+        self.emit(f'refund.{outcome}', refund)
+
+
+class MockFintocHandler(BaseHTTPRequestHandler):
+    server_version = 'MockFintoc/1.0'
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API behind its load balancer.
+
+    API_ROUTES = [
+        ('POST', r'/v(?P<version>[12])/checkout_sessions', 'create_checkout_session'),
+        ('GET', r'/v[12]/checkout_sessions/(?P<id>[^/]+)', 'get_checkout_session'),
+        ('GET', r'/v1/payment_intents/(?P<id>[^/]+)', 'get_payment_intent'),
+        ('POST', r'/v1/webhook_endpoints', 'create_webhook_endpoint'),
+        ('PUT', r'/v1/webhook_endpoints/(?P<id>[^/]+)', 'update_webhook_endpoint'),
+        ('POST', r'/v1/refunds', 'create_refund'),
+        ('GET', r'/v1/refunds/(?P<id>[^/]+)', 'get_refund'),
+        ('POST', r'/v1/refunds/(?P<id>[^/]+)/cancel', 'cancel_refund'),
+    ]
+    CONTROL_ROUTES = [
+        ('GET', r'/_mock/checkout/(?P<id>[^/]+)', 'checkout_page'),
+        ('GET', r'/_mock/config', 'get_config'),
+        ('POST', r'/_mock/config', 'update_config'),
+        ('GET', r'/_mock/state', 'get_state'),
+        ('POST', r'/_mock/reset', 'reset'),
+        ('POST', r'/_mock/events', 'emit_event'),
+        ('GET', r'/_mock/health', 'health'),
+    ]
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def log_message(self, format, *args):
+        _logger.debug("%s - %s", self.address_string(), format % args)
+
+    # === DISPATCH === #
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.body = self._read_json_body()
+        if self.body is None:
+            return self._respond(400, {'error': 'invalid_json', 'message': "Invalid JSON body."})
+
+        for routes, is_api in ((self.API_ROUTES, True), (self.CONTROL_ROUTES, False)):
+            for route_method, pattern, handler_name in routes:
+                match = re.fullmatch(pattern, url.path)
+                if route_method == method and match:
+                    if is_api:
+                        return self._handle_api_call(handler_name, match.groupdict())
+                    return getattr(self, handler_name)(**match.groupdict())
+        return self._respond(404, {'error': 'not_found', 'message': "Not found."})
+
+    def _handle_api_call(self, handler_name, params):
+        config = self.mock.config
+        with self.mock.lock:
+            self.mock.counters['api_calls'] += 1
+        latency_ms = config['latency_ms'] + random.uniform(0, config['latency_jitter_ms'])
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+        if not self.headers.get('Authorization'):
+            return self._respond(401, {'error': 'unauthorized', 'message': "Missing secret key."})
+        if random.random() < config['error_rate']:
+            with self.mock.lock:
+                self.mock.counters['injected_errors'] += 1
+            return self._respond(config['error_status'], {
+                'error': 'internal_server_error', 'message': "Injected mock error.",
+            })
+
+        idempotency_key = self.headers.get('Idempotency-Key')
+        replay_key = idempotency_key and (self.command, self.path, idempotency_key)
+        if replay_key:
+            with self.mock.lock:
+                replayed_response = self.mock.idempotent_responses.get(replay_key)
+            if replayed_response:
+                return self._respond(*replayed_response)
+
+        status, data = getattr(self, handler_name)(**params)
+        if replay_key and status < 500:
+            with self.mock.lock:
+                self.mock.idempotent_responses[replay_key] = (status, data)
+        return self._respond(status, data)
+
+    def _read_json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    def _respond(self, status, data=None, headers=None):
+        body = json.dumps(data if data is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # === API === #
+
+    def create_checkout_session(self, version):
+        config = self.mock.config
+        if version == '2' and config['v2_not_found']:
+            return 404, {'error': 'not_found', 'message': "Not found."}
+        payment_methods = self.body.get('payment_methods') or []
+        if config['payment_intent_unsupported'] and 'payment_intent' in payment_methods:
+            return 422, {
+                'error': 'invalid_enum',
+                'message': "payment_methods: payment_intent is not supported for this account.",
+            }
+        missing_fields = [
+            field for field in ('amount', 'currency', 'success_url', 'cancel_url')
+            if not self.body.get(field)
+        ]
+        if missing_fields:
+            return 400, {
+                'error': 'invalid_request',
+                'message': f"Missing fields: {', '.join(missing_fields)}",
+            }
+
+        host = self.headers.get('Host') or f'localhost:{self.server.server_port}'
+        with self.mock.lock:
+            session_id = self.mock.new_id('cs')
+            session = {
+                'id': session_id,
+                'object': 'checkout_session',
+                'status': 'created',
+                'redirect_url': f'http://{host}/_mock/checkout/{session_id}',
+                **{
+                    key: self.body.get(key)
+                    for key in (
+                        'amount', 'currency', 'success_url', 'cancel_url', 'customer_email',
+                        'payment_methods', 'metadata',
+                    )
+                },
+            }
+            self.mock.checkout_sessions[session_id] = session
+        if config['auto_complete'] in PAYMENT_OUTCOMES:
+            self.mock.webhook_executor.submit(
+                self.mock.complete_checkout, session, config['auto_complete']
+            )
+        return 201, session
+
+    def get_checkout_session(self, id):
+        return self._get_resource(self.mock.checkout_sessions, id)
+
+    def get_payment_intent(self, id):
+        return self._get_resource(self.mock.payment_intents, id)
+
+    def get_refund(self, id):
+        return self._get_resource(self.mock.refunds, id)
+
+    def _get_resource(self, resources, resource_id):
+        with self.mock.lock:
+            resource = resources.get(resource_id)
+        if not resource:
+            return 404, {
+                'error': 'resource_not_found', 'message': f"No such resource: {resource_id}",
+            }
+        return 200, resource
+
+    def create_webhook_endpoint(self):
+        if not self.body.get('url') or not self.body.get('enabled_events'):
+            return 400, {
+                'error': 'invalid_request', 'message': "url and enabled_events are required.",
+            }
+        with self.mock.lock:
+            endpoint = {
+                'id': self.mock.new_id('we'),
+                'object': 'webhook_endpoint',
+                'url': self.body['url'],
+                'enabled_events': self.body['enabled_events'],
+            }
+            self.mock.webhook_endpoints[endpoint['id']] = endpoint
+        return 201, endpoint
+
+    def update_webhook_endpoint(self, id):
+        with self.mock.lock:
+            endpoint = self.mock.webhook_endpoints.get(id)
+            if not endpoint:
+                return 404, {'error': 'resource_not_found', 'message': f"No such endpoint: {id}"}
+            endpoint.update({
+                key: self.body[key] for key in ('url', 'enabled_events') if key in self.body
+            })
+        return 200, endpoint
+
+    def create_refund(self):
+        payment_intent_id = self.body.get('resource_id')
+        if not payment_intent_id or self.body.get('resource_type') != 'payment_intent':
+            return 400, {
+                'error': 'invalid_request', 'message': "A payment_intent resource_id is required.",
+            }
+        with self.mock.lock:
+            payment_intent = self.mock.payment_intents.get(payment_intent_id) or {}
+            refund = {
+                'id': self.mock.new_id('re'),
+                'object': 'refund',
+                'status': 'in_progress',
+                'resource_id': payment_intent_id,
+                'resource_type': 'payment_intent',
+                'amount': self.body.get('amount') or payment_intent.get('amount'),
+                'metadata': self.body.get('metadata') or {},
+            }
+            self.mock.refunds[refund['id']] = refund
+        self.mock.emit('refund.in_progress', refund)
+        self.mock.webhook_executor.submit(self.mock.settle_refund, refund)
+        return 201, refund
+
+    def cancel_refund(self, id):
+        with self.mock.lock:
+            refund = self.mock.refunds.get(id)
+            if not refund:
+                return 404, {'error': 'resource_not_found', 'message': f"No such refund: {id}"}
+            if refund['status'] not in ('in_progress', 'pending'):
+                return 409, {
+                    'error': 'refund_not_cancelable',
+                    'message': f"Refund is {refund['status']} and cannot be canceled.",
+                }
+            refund['status'] = 'canceled'
+        return 200, refund
+
+    # === CONTROL === #
+
+    def checkout_page(self, id):
+        with self.mock.lock:
+            session = self.mock.checkout_sessions.get(id)
+        if not session:
+            return self._respond(404, {'error': 'resource_not_found'})
+
+        outcome = self.query.get('outcome')
+        if outcome not in PAYMENT_OUTCOMES + ('cancel',):
+            links = ''.join(
+                f'<li><a href="?outcome={o}">{o}</a></li>' for o in PAYMENT_OUTCOMES + ('cancel',)
+            )
+            body = (
+                f'<html><body><h1>Mock Fintoc checkout {id}</h1>'
+                f'<p>{session["amount"]} {session["currency"]}</p><ul>{links}</ul></body></html>'
+            ).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if outcome != 'cancel':
+            self.mock.complete_checkout(session, outcome)
+        return_url = session['cancel_url'] if outcome == 'cancel' else session['success_url']
+        scheme, netloc, path, query, fragment = urlsplit(return_url)
+        query = '&'.join(filter(None, [query, urlencode({'checkout_session_id': id})]))
+        self.send_response(303)
+        self.send_header('Location', urlunsplit((scheme, netloc, path, query, fragment)))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def get_config(self):
+        return self._respond(200, self.mock.config)
+
+    def update_config(self):
+        unknown_keys = set(self.body) - set(DEFAULT_CONFIG)
+        if unknown_keys:
+            return self._respond(400, {
+                'error': f"Unknown settings: {', '.join(sorted(unknown_keys))}",
+            })
+        self.mock.config.update(self.body)
+        return self._respond(200, self.mock.config)
+
+    def get_state(self):
+        with self.mock.lock:
+            state = {
+                'counters': dict(self.mock.counters),
+                'checkout_sessions': list(self.mock.checkout_sessions.values()),
+                'payment_intents': list(self.mock.payment_intents.values()),
+                'refunds': list(self.mock.refunds.values()),
+                'webhook_endpoints': list(self.mock.webhook_endpoints.values()),
+            }
+        return self._respond(200, state)
+
+    def reset(self):
+        self.mock.reset()
+        return self._respond(200, {'status': 'reset'})
+
+    def emit_event(self):
+        event_type = self.body.get('type') or ''
+        resources = {
+            'checkout_session': self.mock.checkout_sessions,
+            'payment_intent': self.mock.payment_intents,
+            'refund': self.mock.refunds,
+        }.get(event_type.split('.', 1)[0])
+        if resources is None:
+            return self._respond(400, {'error': f"Unsupported event type: {event_type}"})
+        with self.mock.lock:
+            resource = dict(resources.get(self.body.get('resource_id')) or {})
+        resource.update(self.body.get('data') or {})
+        event = self.mock.emit(event_type, resource, delay_ms=0)
+        return self._respond(202, event)
+
+    def health(self):
+        return self._respond(200, {'status': 'ok'})
+
+
+class MockFintocServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mock):
+        super().__init__(address, MockFintocHandler)
+        self.mock = mock
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    for key, default in DEFAULT_CONFIG.items():
+        option = '--' + key.replace('_', '-')
+        if isinstance(default, bool):
+            parser.add_argument(option, action='store_true')
+        else:
+            parser.add_argument(option, type=type(default), default=default)
+    parser.add_argument('--log-level', default='INFO')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(message)s')
+    mock = MockFintoc({key: getattr(args, key) for key in DEFAULT_CONFIG})
+    server = MockFintocServer((args.host, args.port), mock)
+    _logger.info("Mock Fintoc API listening on http://%s:%s", args.host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        mock.webhook_executor.shutdown(wait=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,6 +31,7 @@ Features:
         'views/payment_fintoc_templates.xml',
         'data/payment_method_data.xml',
         'data/payment_provider_data.xml',
+        'data/ir_cron_data.xml',
         'views/payment_provider_views.xml',
         'views/payment_transaction_views.xml',
     ],
@@ -1,8 +1,60 @@
 FINTOC_API_BASE_URL = 'https://api.fintoc.com'
 
-DEFAULT_TIMEOUT = 20
-DEFAULT_WEBHOOK_TOLERANCE_SECONDS = 300
+DEFAULT_TIMEOUT = 20  # Read timeout, in seconds.
+DEFAULT_CONNECT_TIMEOUT = 5
+
+# Overall time budget, in seconds, of the API calls (fallbacks included) of a business operation.
+DEFAULT_CHECKOUT_DEADLINE = 30
+MIN_CALL_TIMEOUT = 1  # Calls are not attempted with less budget left than this.
+OPERATION_DEADLINE_FIELDS = {
+    'checkout': 'fintoc_checkout_deadline',
+}
+# Time, in seconds, a render waits for a concurrent render creating the same checkout session.
+CHECKOUT_SINGLEFLIGHT_LOCK_TIMEOUT = 3
+
+# Circuit breaker of the API client, shared by all workers through payment.fintoc.circuit.
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures opening the circuit.
+CIRCUIT_OPEN_SECONDS = 30  # Time during which requests fail fast before a recovery probe.
+CIRCUIT_PROBE_TIMEOUT_SECONDS = 2 * DEFAULT_TIMEOUT  # A stuck probe is replaced after this delay.
+CIRCUIT_STATE_CACHE_SECONDS = 2  # Process-local cache of the state of closed circuits.
+CIRCUIT_FAILURE_STATUS_CODES = (502, 503, 504)
+
+# Token-bucket rate limiter of the API client, shared by all workers through
+# payment.fintoc.rate.limit. Requests with a deadline (checkouts, refunds) may borrow tokens ahead
+# within their budget; background requests (crons, bulk jobs) wait for tokens and leave a reserve.
+# The shared limiter costs a committed write per API call: opt-in, 0 (the default) disables it.
+RATE_LIMIT_PER_SECOND_PARAM = 'payment_fintoc.rate_limit_per_second'
+DEFAULT_RATE_LIMIT_PER_SECOND = 0
+RATE_LIMIT_BURST_PARAM = 'payment_fintoc.rate_limit_burst'
+DEFAULT_RATE_LIMIT_BURST = 20
+RATE_LIMIT_BACKGROUND_RESERVE = 0.25  # Share of the burst kept for requests with a deadline.
+RATE_LIMIT_BACKGROUND_MAX_WAIT = 60  # Seconds a background request waits for a token at most.
+RATE_LIMIT_JITTER = 0.25  # Random extra wait, as a share of the wait (and of at least a second).
+# Retries of the 429 (Too Many Requests) answers of the requests carrying an Idempotency-Key.
+RATE_LIMIT_MAX_RETRIES = 3
+RATE_LIMIT_BACKOFF_SECONDS = 1  # Doubled on every retry when Fintoc sends no Retry-After.
+RATE_LIMIT_MAX_BACKOFF_SECONDS = 30  # Upper bound of Retry-After and of the backoff.
+
+# Negotiated checkout sessions API version, negotiated again by the first checkout once expired.
+CHECKOUT_API_VERSION_TTL_HOURS = 24
+# A payment_intent incompatibility learned from the account is trusted for this long.
+PAYMENT_INTENT_SUPPORT_TTL_HOURS = 24
+# Provider fields showing each capability learned from the Fintoc account; suffixed with _date for
+# the date it was learned on.
+API_CAPABILITY_FIELDS = {
+    'checkout_api_version': 'fintoc_checkout_api_version',
+    'payment_intent_support': 'fintoc_payment_intent_support',
+}
+# Provider fields that invalidate the capabilities learned from the Fintoc account when written.
+API_CAPABILITY_RESET_FIELDS = ('fintoc_secret_key', 'fintoc_api_base_url', 'fintoc_collection_mode')
+
+# Keep-alive HTTP connection pooling (per worker process).
+HTTP_POOL_MAXSIZE = 10  # Connections kept alive per (base URL, secret key) pair.
+HTTP_POOL_MAX_SESSIONS = 32  # Distinct (base URL, secret key) pairs pooled per process.
+HTTP_WARMUP_TIMEOUT = 5
+HTTP_WARMUP_PARAM = 'payment_fintoc.http_warmup'
 
+DEFAULT_WEBHOOK_TOLERANCE_SECONDS = 300
 SUPPORTED_WEBHOOK_EVENTS = [
     'checkout_session.finished',
     'payment_intent.succeeded',
@@ -13,6 +65,88 @@ SUPPORTED_WEBHOOK_EVENTS = [
     'refund.failed',
 ]
 
+# Events that never change the state of a transaction, only its Fintoc identifiers.
+IDENTIFIER_ONLY_WEBHOOK_EVENTS = ('checkout_session.finished',)
+# Progress of a Fintoc resource reached by each event: an event of a lower rank than the last event
+# applied to the transaction is stale. Events of a same rank are final states, and only newer ones
+# (by their `created_at`) are applied.
+EVENT_STATE_RANKS = {
+    'checkout_session.finished': 1,
+    'payment_intent.succeeded': 2,
+    'payment_intent.failed': 2,
+    'payment_intent.rejected': 2,
+    'refund.in_progress': 1,
+    'refund.succeeded': 2,
+    'refund.failed': 2,
+}
+NOTIFICATION_IDENTIFIER_KEYS = ('payment_intent_id', 'checkout_session_id', 'refund_id')
+
+# Webhook event processor.
+EVENT_BATCH_SIZE_PARAM = 'payment_fintoc.event_batch_size'
+DEFAULT_EVENT_BATCH_SIZE = 200
+RECENT_EVENT_IDS_CACHE_SIZE = 10_000  # Event ids remembered per process to short-circuit retries.
+EVENT_PROCESSING_LOCK_NAMESPACE = 84_201  # First key of the per-transaction advisory locks.
+
+# Outbox of the API calls that must eventually reach Fintoc (refunds, refund cancellations and
+# webhook registrations), delivered in the background by a cron while Fintoc is unreachable.
+OUTBOX_BATCH_SIZE_PARAM = 'payment_fintoc.outbox_batch_size'
+DEFAULT_OUTBOX_BATCH_SIZE = 100
+OUTBOX_CONCURRENCY_PARAM = 'payment_fintoc.outbox_concurrency'
+DEFAULT_OUTBOX_CONCURRENCY = 8
+OUTBOX_BACKOFF_SECONDS = 30  # Doubled on every failed attempt.
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+OUTBOX_MAX_ATTEMPTS = 48
+OUTBOX_RETENTION_DAYS = 30  # Sent messages are deleted after this delay.
+
+# Reconciliation of the transactions whose webhooks may have been lost.
+RECONCILE_MIN_AGE_MINUTES_PARAM = 'payment_fintoc.reconcile_min_age_minutes'
+DEFAULT_RECONCILE_MIN_AGE_MINUTES = 30
+RECONCILE_MAX_AGE_DAYS_PARAM = 'payment_fintoc.reconcile_max_age_days'
+DEFAULT_RECONCILE_MAX_AGE_DAYS = 7
+RECONCILE_PAGE_SIZE_PARAM = 'payment_fintoc.reconcile_page_size'
+DEFAULT_RECONCILE_PAGE_SIZE = 100
+RECONCILE_MAX_REQUESTS_PARAM = 'payment_fintoc.reconcile_max_requests'  # Per cron run.
+DEFAULT_RECONCILE_MAX_REQUESTS = 1000
+RECONCILE_CONCURRENCY_PARAM = 'payment_fintoc.reconcile_concurrency'
+DEFAULT_RECONCILE_CONCURRENCY = 4
+# Delay before checking again a transaction whose Fintoc resource has no final status yet.
+RECONCILE_BACKOFF_MINUTES = 15  # Doubled on every check.
+RECONCILE_MAX_BACKOFF_MINUTES = 24 * 60
+
+# Webhook event type equivalent to the status of a fetched Fintoc resource.
+PAYMENT_INTENT_STATUS_EVENTS = {
+    'succeeded': 'payment_intent.succeeded',
+    'failed': 'payment_intent.failed',
+    'rejected': 'payment_intent.rejected',
+}
+REFUND_STATUS_EVENTS = {
+    'pending': 'refund.in_progress',
+    'in_progress': 'refund.in_progress',
+    'succeeded': 'refund.succeeded',
+    'failed': 'refund.failed',
+    'rejected': 'refund.failed',
+}
+CHECKOUT_SESSION_STATUS_EVENTS = {
+    'finished': 'checkout_session.finished',
+}
+
+# Webhook event retention, in days, by event state. The payload of expired events is deleted, while
+# their event_id is kept as a tombstone for the deduplication of late redeliveries. Received events
+# are never deleted.
+EVENT_RETENTION_PARAM = 'payment_fintoc.event_retention_days_%s'
+DEFAULT_EVENT_RETENTION_DAYS = {
+    'processed': 30,
+    'error': 180,
+}
+# Tombstones are only deleted once older than this, in days; 0 keeps them forever.
+EVENT_TOMBSTONE_RETENTION_PARAM = 'payment_fintoc.event_tombstone_retention_days'
+DEFAULT_EVENT_TOMBSTONE_RETENTION_DAYS = 365
+EVENT_CLEANUP_BATCH_SIZE_PARAM = 'payment_fintoc.event_cleanup_batch_size'
+DEFAULT_EVENT_CLEANUP_BATCH_SIZE = 1000
+# Payloads longer than this (in characters) are zlib-compressed once their event is handled.
+EVENT_PAYLOAD_COMPRESSION_THRESHOLD_PARAM = 'payment_fintoc.event_payload_compression_threshold'
+DEFAULT_EVENT_PAYLOAD_COMPRESSION_THRESHOLD = 2048
+
 DEFAULT_PAYMENT_METHOD_CODES = [
     'fintoc_bank_transfer',
     'fintoc_card',
@@ -25,6 +159,29 @@ PAYMENT_METHOD_MAPPING = {
     'card': 'card',
 }
 
+# Prometheus-style metrics, aggregated across the worker processes.
+METRICS_TOKEN_PARAM = 'payment_fintoc.metrics_token'  # The scrape route is disabled when unset.
+METRICS_FLUSH_INTERVAL_SECONDS = 1  # Delay between two snapshots of a process, if it changed.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Tracing of the webhook pipeline and of the checkout render.
+TRACE_SLOW_THRESHOLD_MS_PARAM = 'payment_fintoc.trace_slow_threshold_ms'  # 0 disables the log.
+DEFAULT_TRACE_SLOW_THRESHOLD_MS = 1000
+TRACE_EXPORTER_PARAM = 'payment_fintoc.trace_exporter'  # 'file', 'otlp' or unset.
+TRACE_EXPORTER_TARGET_PARAM = 'payment_fintoc.trace_exporter_target'  # File path or OTLP URL.
+TRACE_EXPORT_QUEUE_SIZE = 1000
+TRACE_EXPORT_TIMEOUT = 5
+
 RETURN_SUCCESS_ROUTE = '/payment/fintoc/return/success'
 RETURN_CANCEL_ROUTE = '/payment/fintoc/return/cancel'
 WEBHOOK_ROUTE = '/payment/fintoc/webhook'
+WEBHOOK_PROVIDER_ROUTE = '/payment/fintoc/webhook/<int:provider_id>'
+METRICS_ROUTE = '/payment/fintoc/metrics'
+
+# Provider fields that invalidate the process-local webhook keys when written.
+WEBHOOK_KEY_RING_FIELDS = (
+    'code',
+    'fintoc_webhook_secret',
+    'fintoc_webhook_previous_secrets',
+    'fintoc_webhook_tolerance',
+)
@@ -1,15 +1,20 @@
+import hmac
 import json
 import logging
+import time
 
+import psycopg2
 from werkzeug import urls
-from werkzeug.exceptions import BadRequest, Forbidden
+from werkzeug.exceptions import BadRequest, Forbidden, NotFound
 
-from odoo import _, fields, http
-from odoo.exceptions import ValidationError
+from odoo import _, http
 from odoo.http import request
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
 
 from odoo.addons.payment import utils as payment_utils
 from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc import tracing
+from odoo.addons.payment_fintoc.metrics import METRICS
 
 _logger = logging.getLogger(__name__)
 
@@ -31,7 +36,7 @@ class PaymentFintocController(http.Controller):
         """
         tx_sudo = self._get_tx_from_return(reference, access_token)
         if checkout_session_id:
-            tx_sudo.write({'fintoc_checkout_session_id': checkout_session_id})
+            tx_sudo._fintoc_write_changed_values({'fintoc_checkout_session_id': checkout_session_id})
         # Keep transaction in draft until webhook confirmation to avoid blocking retries in portal.
         return request.redirect(self._get_payment_status_url(), local=False)
 
@@ -50,7 +55,7 @@ class PaymentFintocController(http.Controller):
         """
         tx_sudo = self._get_tx_from_return(reference, access_token)
         if checkout_session_id:
-            tx_sudo.write({'fintoc_checkout_session_id': checkout_session_id})
+            tx_sudo._fintoc_write_changed_values({'fintoc_checkout_session_id': checkout_session_id})
         if tx_sudo.state in ('draft', 'pending'):
             tx_sudo._set_canceled(
                 state_message=_("Checkout was canceled on Fintoc."),
@@ -59,114 +64,137 @@ class PaymentFintocController(http.Controller):
         return request.redirect(self._get_payment_status_url(), local=False)
 
     @http.route(
-        const.WEBHOOK_ROUTE,
+        [const.WEBHOOK_ROUTE, const.WEBHOOK_PROVIDER_ROUTE],
         type='http',
         auth='public',
         methods=['POST'],
         csrf=False,
         save_session=False,
     )
-    def fintoc_webhook(self):
-        """Process incoming Fintoc webhook notifications."""
+    def fintoc_webhook(self, provider_id=None):
+        """Process incoming Fintoc webhook notifications.
+
+        Webhooks received on the provider-specific route are only verified against the secrets of
+        that provider; the generic route falls back on the whole webhook key ring.
+        """
+        start = time.monotonic()
+        outcome = 'error'
+        try:
+            with tracing.start_trace(request.env, 'fintoc.webhook') as root_span:
+                try:
+                    outcome = self._handle_fintoc_webhook(provider_id)
+                except Forbidden:
+                    outcome = 'forbidden'
+                    raise
+                except BadRequest:
+                    outcome = 'bad_request'
+                    raise
+                except psycopg2.OperationalError as error:
+                    if error.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY:
+                        # The request is about to be replayed by Odoo.
+                        outcome = 'retried'
+                        METRICS.inc('fintoc_webhook_concurrency_retries_total', {
+                            'pgcode': error.pgcode,
+                        })
+                    raise
+                finally:
+                    root_span.set_attribute('outcome', outcome)
+        finally:
+            METRICS.observe(
+                'fintoc_webhook_duration_seconds', time.monotonic() - start, {'outcome': outcome}
+            )
+        return request.make_json_response({'status': outcome})
+
+    @staticmethod
+    def _handle_fintoc_webhook(provider_id):
+        """Verify, store and, unless asynchronous, process a webhook; return its outcome."""
         raw_body = request.httprequest.get_data(cache=False, as_text=False) or b''
         signature_header = request.httprequest.headers.get('Fintoc-Signature')
         if not signature_header:
             _logger.warning("Received Fintoc webhook without signature header")
+            METRICS.inc('fintoc_webhook_signature_failures_total', {'reason': 'missing'})
             raise Forbidden()
 
-        providers = request.env['payment.provider'].sudo().search([
-            ('code', '=', 'fintoc'),
-            ('fintoc_webhook_secret', '!=', False),
-        ])
-        provider = providers.filtered(
-            lambda p: p._fintoc_validate_webhook_signature(signature_header, raw_body)
-        )[:1]
-        if not provider:
-            _logger.warning("Received Fintoc webhook with invalid signature")
+        try:
+            body_text = raw_body.decode('utf-8')
+        except UnicodeDecodeError:
+            _logger.warning("Received Fintoc webhook with a non UTF-8 body")
             raise Forbidden()
 
-        try:
-            event_payload = json.loads(raw_body.decode('utf-8'))
-        except (UnicodeDecodeError, json.JSONDecodeError):
+        with tracing.span('json_parse'):
+            try:
+                event_payload = json.loads(body_text)
+            except json.JSONDecodeError:
+                raise BadRequest()
+        if not isinstance(event_payload, dict):
             raise BadRequest()
 
+        provider_model = request.env['payment.provider'].sudo()
+        with tracing.span('signature'):
+            if provider_id:
+                provider = provider_model.browse(provider_id)
+            else:
+                # Only verify the secrets of the provider of the transaction the event relates to.
+                provider = provider_model._fintoc_get_webhook_provider(event_payload)
+            if not provider or not provider._fintoc_validate_webhook_signature(
+                signature_header, body_text
+            ):
+                _logger.warning("Received Fintoc webhook with invalid signature")
+                METRICS.inc('fintoc_webhook_signature_failures_total', {'reason': 'invalid'})
+                raise Forbidden()
+
         event_id = event_payload.get('id')
         event_type = event_payload.get('type')
         if not event_id or not event_type:
             raise BadRequest()
 
-        event_model = request.env['payment.fintoc.event'].sudo()
-        existing_event = event_model.search([('event_id', '=', event_id)], limit=1)
-        if existing_event:
-            return request.make_json_response({'status': 'duplicate'})
-
-        event = event_model.create({
-            'event_id': event_id,
-            'event_type': event_type,
-            'provider_id': provider.id,
-            'payload': raw_body.decode('utf-8', errors='replace'),
-            'state': 'received',
-        })
-
-        notification_data = self._build_notification_data(event_payload)
-        try:
-            tx_sudo = request.env['payment.transaction'].sudo()._handle_notification_data(
-                'fintoc', notification_data
-            )
-        except ValidationError as error:
-            event.write({
-                'state': 'error',
-                'error_message': str(error),
-                'processed_date': fields.Datetime.now(),
-            })
-            _logger.exception(
-                "Unable to process Fintoc webhook event %s (%s)",
-                event_id,
-                event_type,
+        with tracing.span('dedup', event_type=event_type):
+            event = request.env['payment.fintoc.event'].sudo()._create_if_new(
+                event_id, event_type, provider.id, body_text
             )
-            return request.make_json_response({'status': 'ignored'})
+        if not event:
+            METRICS.inc('fintoc_webhook_duplicate_events_total')
+            return 'duplicate'
+        if provider.fintoc_webhook_async:
+            # Acknowledge now; the event processor cron applies the event to its transaction.
+            event._trigger_processing()
+            return 'queued'
+
+        with tracing.span('process'):
+            event._process(partition_lock=True)
+        if event.state == 'received':
+            # Another request is processing the same transaction: serialize through the queue.
+            event._trigger_processing()
+            return 'queued'
+        return 'ignored' if event.state == 'error' else 'ok'
 
-        event.write({
-            'state': 'processed',
-            'transaction_id': tx_sudo.id,
-            'processed_date': fields.Datetime.now(),
-        })
-        return request.make_json_response({'status': 'ok'})
+    @http.route(
+        const.METRICS_ROUTE,
+        type='http',
+        auth='public',
+        methods=['GET'],
+        csrf=False,
+        save_session=False,
+    )
+    def fintoc_metrics(self):
+        """Expose the Fintoc metrics of all workers in the Prometheus text format.
 
-    @staticmethod
-    def _build_notification_data(event_payload):
-        """Normalize Fintoc event payload for payment.transaction hooks."""
-        event_type = event_payload.get('type')
-        resource = event_payload.get('data') or {}
-        metadata = resource.get('metadata') or {}
-
-        notification_data = {
-            'event_id': event_payload.get('id'),
-            'event_type': event_type,
-            'resource': resource,
-            'odoo_tx_reference': metadata.get('odoo_tx_reference'),
-            'reference': event_payload.get('reference'),
-        }
-
-        if event_type == 'checkout_session.finished':
-            notification_data.update({
-                'checkout_session_id': resource.get('id') or resource.get('checkout_session_id'),
-                'payment_intent_id': resource.get('payment_intent_id'),
-            })
-        elif event_type and event_type.startswith('payment_intent.'):
-            notification_data.update({
-                'payment_intent_id': resource.get('id') or resource.get('payment_intent_id'),
-                'checkout_session_id': resource.get('checkout_session_id'),
-                'reason': resource.get('failure_reason') or resource.get('reason'),
-            })
-        elif event_type and event_type.startswith('refund.'):
-            notification_data.update({
-                'refund_id': resource.get('id') or resource.get('refund_id'),
-                'payment_intent_id': resource.get('resource_id') or resource.get('payment_intent_id'),
-                'reason': resource.get('failure_reason') or resource.get('reason'),
-            })
-
-        return notification_data
+        The route is disabled until a token is configured, and then requires it as a bearer token.
+        """
+        token = request.env['ir.config_parameter'].sudo().get_param(const.METRICS_TOKEN_PARAM)
+        if not token:
+            raise NotFound()
+        authorization = request.httprequest.headers.get('Authorization') or ''
+        if not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+            raise Forbidden()
+
+        gauges = request.env['payment.fintoc.event'].sudo()._get_metrics_gauges()
+        gauges += request.env['payment.fintoc.rate.limit'].sudo()._get_metrics_gauges()
+        gauges += request.env['payment.fintoc.outbox'].sudo()._get_metrics_gauges()
+        return request.make_response(
+            METRICS.render(gauges),
+            headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')],
+        )
 
     @staticmethod
     def _get_tx_from_return(reference, access_token):
@@ -0,0 +1,285 @@
+"""Process-local Prometheus-style metrics, aggregated across the Odoo worker processes.
+
+Each process accumulates its counters and histograms in memory, and a daemon thread regularly
+writes a snapshot of them to its own file of a shared directory, named after its host, PID and a
+random instance token, so that the recording requests never wait for the disk.
+The scrape route sums the snapshots of all processes; the snapshots of the dead processes of the
+local host are folded into an archive so that counters never go backwards. The snapshots of other
+hosts are never archived, as their processes cannot be checked from here.
+"""
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+from odoo.tools import config
+
+from odoo.addons.payment_fintoc import const
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_FILENAME = 'archive.json'
+LOCK_FILENAME = '.lock'
+
+
+def normalize_endpoint(endpoint):
+    """Replace the resource ids of an API endpoint by a placeholder to bound label cardinality."""
+    path = (endpoint or '').split('?', 1)[0]
+    return '/'.join(
+        segment if not segment or re.fullmatch(r'[a-z_]+|v\d+', segment) else '{id}'
+        for segment in path.split('/')
+    )
+
+
+class FintocMetrics:
+
+    def __init__(self, directory=None, flush_interval=const.METRICS_FLUSH_INTERVAL_SECONDS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Keeps the snapshots of the process written in order.
+        self._counters = {}
+        self._histograms = {}
+        self._dirty = False  # Whether metrics were recorded since the last snapshot.
+        self._thread = None
+        self._hostname = socket.gethostname()
+        self._pid = os.getpid()
+        # Distinguishes this process from a previous one of the same PID.
+        self._instance = uuid.uuid4().hex[:8]
+
+    def get_directory(self):
+        return self.directory or os.path.join(config['data_dir'], 'fintoc_metrics')
+
+    # === RECORDING === #
+
+    def inc(self, name, labels=None, value=1):
+        """Increment a counter."""
+        key = (name, self._freeze_labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+        self._ensure_flusher()
+
+    def observe(self, name, value, labels=None):
+        """Record an observation, typically a duration in seconds, in a histogram."""
+        key = (name, self._freeze_labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': [0] * (len(const.METRICS_LATENCY_BUCKETS) + 1),
+                    'sum': 0.0,
+                }
+            bucket_index = next(
+                (i for i, bound in enumerate(const.METRICS_LATENCY_BUCKETS) if value <= bound),
+                len(const.METRICS_LATENCY_BUCKETS),
+            )
+            histogram['buckets'][bucket_index] += 1
+            histogram['sum'] += value
+            self._dirty = True
+        self._ensure_flusher()
+
+    @staticmethod
+    def _freeze_labels(labels):
+        return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+    # === PERSISTENCE === #
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._flush_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='fintoc-metrics-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        """Write the snapshot of this process to the shared directory."""
+        directory = self.get_directory()
+        filename = f'{self._hostname}-{self._pid}-{self._instance}.json'
+        with self._flush_lock:
+            with self._lock:
+                snapshot = self._build_snapshot(self._counters, self._histograms)
+                self._dirty = False
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._write(os.path.join(directory, filename), snapshot)
+            except OSError:
+                _logger.warning("Unable to write the Fintoc metrics snapshot to %s", directory)
+
+    @staticmethod
+    def _build_snapshot(counters, histograms):
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [
+                [name, labels, histogram['buckets'], histogram['sum']]
+                for (name, labels), histogram in histograms.items()
+            ],
+        }
+
+    @staticmethod
+    def _write(path, snapshot):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+            os.replace(tmp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    def _after_fork_in_child(self):
+        # The parent keeps reporting its own metrics; the child starts from scratch, and the
+        # flusher thread of the parent does not exist in the child.
+        self._reset()
+
+    # === AGGREGATION === #
+
+    def collect(self):
+        """Return the metrics of all processes, summed.
+
+        :return: The counters, by (name, labels), and the histograms, by (name, labels).
+        :rtype: tuple(dict, dict)
+        """
+        self.flush()
+        directory = self.get_directory()
+        counters, histograms = {}, {}
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILENAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._archive_dead_processes(directory)
+                for filename in os.listdir(directory):
+                    if filename.endswith('.json'):
+                        snapshot = self._read(os.path.join(directory, filename))
+                        self._merge(snapshot, counters, histograms)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return counters, histograms
+
+    def _archive_dead_processes(self, directory):
+        archive_path = os.path.join(directory, ARCHIVE_FILENAME)
+        counters, histograms = {}, {}
+        self._merge(self._read(archive_path), counters, histograms)
+        dead_paths = []
+        for filename in os.listdir(directory):
+            hostname, pid, _instance = self._parse_snapshot_filename(filename)
+            if hostname == self._hostname and not self._is_alive(pid):
+                path = os.path.join(directory, filename)
+                self._merge(self._read(path), counters, histograms)
+                dead_paths.append(path)
+        if not dead_paths:
+            return
+        self._write(archive_path, self._build_snapshot(counters, histograms))
+        for path in dead_paths:
+            os.remove(path)
+
+    @staticmethod
+    def _parse_snapshot_filename(filename):
+        """Return the host, PID and instance token of a process snapshot file, or Nones."""
+        parts = filename[:-len('.json')].rsplit('-', 2) if filename.endswith('.json') else []
+        if len(parts) != 3 or not parts[1].isdigit():
+            return None, None, None
+        return parts[0], int(parts[1]), parts[2]
+
+    @staticmethod
+    def _is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, encoding='utf-8') as snapshot_file:
+                return json.load(snapshot_file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _merge(snapshot, counters, histograms):
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total in snapshot.get('histograms', []):
+            key = (name, tuple(tuple(label) for label in labels))
+            histogram = histograms.setdefault(key, {'buckets': [0] * len(buckets), 'sum': 0.0})
+            histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], buckets)]
+            histogram['sum'] += total
+
+    # === EXPOSITION === #
+
+    def render(self, gauges=None):
+        """Render all metrics in the Prometheus text exposition format.
+
+        :param list gauges: The gauges computed at scrape time, as (name, labels, value) tuples.
+        :return: The exposition text.
+        :rtype: str
+        """
+        counters, histograms = self.collect()
+        lines = []
+        for metric_name in sorted({name for name, _labels in counters}):
+            lines.append(f'# TYPE {metric_name} counter')
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric_name:
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+        for metric_name in sorted({name for name, _labels in histograms}):
+            lines.append(f'# TYPE {metric_name} histogram')
+            for (name, labels), histogram in sorted(histograms.items()):
+                if name != metric_name:
+                    continue
+                cumulative_count = 0
+                bounds = [str(bound) for bound in const.METRICS_LATENCY_BUCKETS] + ['+Inf']
+                for bound, count in zip(bounds, histogram['buckets']):
+                    cumulative_count += count
+                    bucket_labels = labels + (('le', bound),)
+                    lines.append(
+                        f'{name}_bucket{self._format_labels(bucket_labels)} {cumulative_count}'
+                    )
+                lines.append(f'{name}_sum{self._format_labels(labels)} {histogram["sum"]}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {cumulative_count}')
+        gauges = [(name, self._freeze_labels(labels), value) for name, labels, value in gauges or []]
+        for metric_name in sorted({name for name, _labels, _value in gauges}):
+            lines.append(f'# TYPE {metric_name} gauge')
+            for name, labels, value in sorted(gauges):
+                if name == metric_name:
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        formatted_labels = ','.join(
+            '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+            for key, value in labels
+        )
+        return f'{{{formatted_labels}}}'
+
+
+METRICS = FintocMetrics()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=METRICS._after_fork_in_child)
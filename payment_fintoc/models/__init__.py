@@ -1,3 +1,7 @@
 from . import payment_provider
 from . import payment_transaction
 from . import payment_fintoc_event
+from . import payment_fintoc_circuit
+from . import payment_fintoc_rate_limit
+from . import payment_fintoc_outbox
+from . import payment_fintoc_capability
@@ -1,23 +1,156 @@
+import hashlib
 import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from odoo import _
 from odoo.exceptions import ValidationError
 
-from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc import const, tracing
+from odoo.addons.payment_fintoc.metrics import METRICS, normalize_endpoint
 
 _logger = logging.getLogger(__name__)
 
 
+def get_credentials_key(base_url, secret_key):
+    """Return a key identifying a Fintoc account on an API base URL without exposing its secret."""
+    return hashlib.sha256(f"{base_url}\x00{secret_key or ''}".encode('utf-8')).hexdigest()
+
+
+class FintocSessionPool:
+    """Process-local pool of keep-alive HTTP sessions, keyed by base URL and secret key.
+
+    Sessions are never shared across processes: the pool is emptied in the child after a fork
+    (Odoo prefork workers) so that no TLS connection of the parent is reused by a worker.
+    """
+
+    def __init__(self, max_sessions=const.HTTP_POOL_MAX_SESSIONS, pool_maxsize=const.HTTP_POOL_MAXSIZE):
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self.warm_up_targets = ()
+        self._reset()
+
+    def _reset(self):
+        """Drop the sessions inherited from a parent process without closing their sockets."""
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._pid = os.getpid()
+
+    def get(self, base_url, secret_key):
+        """Return the pooled session for the given base URL and secret key."""
+        if self._pid != os.getpid():
+            self._reset()
+        key = get_credentials_key(base_url, secret_key)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sessions[key] = session
+            while len(self._sessions) > self.max_sessions:
+                _evicted_key, evicted_session = self._sessions.popitem(last=False)
+                evicted_session.close()
+            return session
+
+    def schedule_warm_up(self, targets):
+        """Open a connection to each (base URL, secret key) target in a background thread.
+
+        The targets are remembered so that every worker forked afterwards warms up its own pool.
+        """
+        self.warm_up_targets = tuple(targets)
+        if not self.warm_up_targets:
+            return
+        thread = threading.Thread(
+            target=self._warm_up, name='fintoc-http-warm-up', daemon=True
+        )
+        thread.start()
+
+    def _warm_up(self):
+        for base_url, secret_key in self.warm_up_targets:
+            try:
+                self.get(base_url, secret_key).head(base_url, timeout=const.HTTP_WARMUP_TIMEOUT)
+            except requests.exceptions.RequestException:
+                _logger.info("Unable to warm up the Fintoc connection pool for %s", base_url)
+
+    def _after_fork_in_child(self):
+        self._reset()
+        self.schedule_warm_up(self.warm_up_targets)
+
+
+SESSION_POOL = FintocSessionPool()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=SESSION_POOL._after_fork_in_child)
+
+
+class FintocDeadline:
+    """Time budget shared by all the API calls, fallbacks included, of a business operation."""
+
+    def __init__(
+        self,
+        seconds,
+        connect_timeout=const.DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=const.DEFAULT_TIMEOUT,
+    ):
+        self.expires_at = time.monotonic() + seconds
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def get_remaining(self):
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def get_timeout(self):
+        """Return the (connect, read) timeouts of the next call, capped by the remaining budget.
+
+        :raise ValidationError: If the budget is exhausted.
+        """
+        remaining = self.get_remaining()
+        if remaining < const.MIN_CALL_TIMEOUT:
+            raise ValidationError(_(
+                "Fintoc did not answer in time. Please try again in a moment."
+            ))
+        return min(self.connect_timeout, remaining), min(self.read_timeout, remaining)
+
+
 class FintocApiClient:
-    """Small API client wrapper for Fintoc requests."""
+    """Small API client wrapper for Fintoc requests.
+
+    The provider configuration is read once, when the client is built, so that a client can send
+    requests from worker threads without touching the ORM records of the calling thread.
+    """
 
     def __init__(self, provider):
         provider.ensure_one()
         self.provider = provider
+        self.base_url = self.get_base_url(provider)
+        self.secret_key = provider.fintoc_secret_key or ''
+        self.timeouts = self.get_timeouts(provider)
+        self.circuit_model = provider.env['payment.fintoc.circuit'].sudo()
+        self.rate_limit_model = provider.env['payment.fintoc.rate.limit'].sudo()
+        self.rate_limit = self.rate_limit_model._get_rate_limit()
 
-    def request(self, method, endpoint, payload=None, idempotency_key=None, timeout=None):
+    def request(
+        self,
+        method,
+        endpoint,
+        payload=None,
+        idempotency_key=None,
+        timeout=None,
+        deadline=None,
+    ):
         """Send an API request and raise ValidationError on failures."""
         status_code, response_data = self.request_raw(
             method=method,
@@ -25,41 +158,222 @@ class FintocApiClient:
             payload=payload,
             idempotency_key=idempotency_key,
             timeout=timeout,
+            deadline=deadline,
         )
         if status_code >= 400:
             raise ValidationError(self._build_http_error_message(status_code, response_data))
         return response_data
 
-    def request_raw(self, method, endpoint, payload=None, idempotency_key=None, timeout=None):
-        """Send an API request and return raw status + response json dict."""
-        base_url = (self.provider.fintoc_api_base_url or const.FINTOC_API_BASE_URL).rstrip('/')
-        url = f"{base_url}{endpoint}"
+    def request_raw(
+        self,
+        method,
+        endpoint,
+        payload=None,
+        idempotency_key=None,
+        timeout=None,
+        deadline=None,
+    ):
+        """Send an API request and return raw status + response json dict.
+
+        Requests are guarded by a circuit breaker shared by all workers: while Fintoc is
+        unreachable, they fail fast instead of each waiting for the full timeout. They are also
+        paced by a token-bucket rate limiter shared by all workers. When Fintoc answers 429 (Too
+        Many Requests), all the requests of the account are held back for the `Retry-After` delay
+        (or an exponential backoff), and the request is retried after it if it carries an
+        idempotency key.
+
+        :param timeout: The timeout of the call, in seconds or as a (connect, read) tuple. Defaults
+                        to the connect and read timeouts of the provider.
+        :param FintocDeadline deadline: The budget of the business operation, capping the timeout.
+        """
+        url = f"{self.base_url}{endpoint}"
         headers = {
-            'Authorization': self.provider.fintoc_secret_key or '',
+            'Authorization': self.secret_key,
             'Content-Type': 'application/json',
         }
         if idempotency_key:
             headers['Idempotency-Key'] = idempotency_key
 
-        request_timeout = timeout or const.DEFAULT_TIMEOUT
+        metric_labels = {'method': method.upper(), 'endpoint': normalize_endpoint(endpoint)}
+        credentials_key = get_credentials_key(self.base_url, self.secret_key)
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit(credentials_key, deadline)
+            if deadline:
+                request_timeout = deadline.get_timeout()
+            else:
+                request_timeout = timeout or self.timeouts
+            response = self._send(
+                method, url, headers, payload, request_timeout, credentials_key, metric_labels
+            )
+            if response.status_code != 429:
+                break
 
-        try:
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=headers,
-                json=payload,
-                timeout=request_timeout,
+            METRICS.inc('fintoc_api_rate_limited_total', metric_labels)
+            backoff = min(
+                self._get_retry_after(response)
+                or const.RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt,
+                const.RATE_LIMIT_MAX_BACKOFF_SECONDS,
             )
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            _logger.exception("Fintoc API unreachable at endpoint %s", endpoint)
-            raise ValidationError(
-                _("Fintoc is not reachable right now. Please try again in a moment.")
+            if self.rate_limit[0]:
+                self.rate_limit_model._run_isolated('_block', credentials_key, backoff)
+            backoff += random.uniform(0, const.RATE_LIMIT_JITTER * max(backoff, 1))
+            if (
+                not idempotency_key
+                or attempt >= const.RATE_LIMIT_MAX_RETRIES
+                or (deadline and deadline.get_remaining() < backoff + const.MIN_CALL_TIMEOUT)
+            ):
+                break
+            attempt += 1
+            _logger.info(
+                "Fintoc rate limited endpoint %s, retry %s in %.1fs", endpoint, attempt, backoff
             )
+            time.sleep(backoff)
 
         response_data = self._safe_parse_json(response)
         return response.status_code, response_data
 
+    def _send(self, method, url, headers, payload, request_timeout, circuit_key, metric_labels):
+        """Send a single HTTP request through the circuit breaker and return its response."""
+        endpoint = metric_labels['endpoint']
+        if not self.circuit_model._run_isolated('_acquire', circuit_key):
+            _logger.warning("Fintoc circuit is open, failing fast on endpoint %s", endpoint)
+            METRICS.observe(
+                'fintoc_api_request_duration_seconds', 0, dict(metric_labels, status='circuit_open')
+            )
+            raise ValidationError(self._get_unreachable_message())
+
+        start = time.monotonic()
+        try:
+            with tracing.span('fintoc_api', **metric_labels):
+                response = SESSION_POOL.get(self.base_url, self.secret_key).request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=payload,
+                    timeout=request_timeout,
+                )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            METRICS.observe(
+                'fintoc_api_request_duration_seconds',
+                time.monotonic() - start,
+                dict(metric_labels, status='unreachable'),
+            )
+            self.circuit_model._run_isolated('_record_failure', circuit_key)
+            _logger.exception("Fintoc API unreachable at endpoint %s", endpoint)
+            raise ValidationError(self._get_unreachable_message())
+        METRICS.observe(
+            'fintoc_api_request_duration_seconds',
+            time.monotonic() - start,
+            dict(metric_labels, status=response.status_code),
+        )
+
+        if response.status_code in const.CIRCUIT_FAILURE_STATUS_CODES:
+            self.circuit_model._run_isolated('_record_failure', circuit_key)
+        else:
+            self.circuit_model._run_isolated('_record_success', circuit_key)
+        return response
+
+    def _wait_for_rate_limit(self, key, deadline):
+        """Wait until the rate limiter lets the next request of the account through.
+
+        Requests with a deadline borrow tokens ahead as long as the wait fits in their budget.
+        Background requests only take the tokens above the reserve, and give up after a while.
+
+        :raise ValidationError: If no token is available within the budget of the request.
+        """
+        rate, burst = self.rate_limit
+        if not rate:
+            return
+
+        priority = 'deadline' if deadline else 'background'
+        give_up_at = time.monotonic() + const.RATE_LIMIT_BACKGROUND_MAX_WAIT
+        start = time.monotonic()
+        while True:
+            if deadline:
+                budget = deadline.get_remaining() - const.MIN_CALL_TIMEOUT
+                floor = -budget * rate
+            else:
+                budget = give_up_at - time.monotonic()
+                floor = min(burst * const.RATE_LIMIT_BACKGROUND_RESERVE, burst - 1)
+            granted, wait = self.rate_limit_model._run_isolated(
+                '_acquire', key, rate, burst, floor
+            )
+            if not granted:
+                # Spread the requests that were held back together.
+                wait += random.uniform(0, const.RATE_LIMIT_JITTER * max(wait, 1))
+            if wait > budget:
+                METRICS.inc('fintoc_rate_limiter_rejections_total', {'priority': priority})
+                raise ValidationError(_(
+                    "Fintoc is receiving too many requests right now. Please try again in a moment."
+                ))
+            if wait > 0:
+                time.sleep(wait)
+            if granted:
+                METRICS.observe(
+                    'fintoc_rate_limiter_wait_seconds',
+                    time.monotonic() - start,
+                    {'priority': priority},
+                )
+                return
+
+    @staticmethod
+    def _get_retry_after(response):
+        """Return the delay, in seconds, of the `Retry-After` header of a response, if any."""
+        retry_after = (response.headers.get('Retry-After') or '').strip()
+        if not retry_after:
+            return None
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=timezone.utc)
+        return max((retry_date - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    @staticmethod
+    def request_raw_concurrently(api_requests, max_workers):
+        """Send several API requests through a bounded thread pool.
+
+        Only the HTTP calls run in the pool threads, which is why the clients must be built, and the
+        payloads prepared, beforehand in the calling thread.
+
+        :param list api_requests: The (client, request_raw kwargs) pairs of the requests.
+        :param int max_workers: The maximum number of requests sent at the same time.
+        :return: For each request, in order, its (status code, response data) pair, or the
+                 ValidationError raised when Fintoc could not be reached.
+        :rtype: list
+        """
+        def send(api_request):
+            client, request_kwargs = api_request
+            try:
+                return client.request_raw(**request_kwargs)
+            except ValidationError as error:
+                return error
+
+        if not api_requests:
+            return []
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            return list(executor.map(send, api_requests))
+
+    @staticmethod
+    def _get_unreachable_message():
+        return _("Fintoc is not reachable right now. Please try again in a moment.")
+
+    @staticmethod
+    def get_timeouts(provider):
+        """Return the (connect, read) timeouts configured on the provider."""
+        return (
+            provider.fintoc_connect_timeout or const.DEFAULT_CONNECT_TIMEOUT,
+            provider.fintoc_read_timeout or const.DEFAULT_TIMEOUT,
+        )
+
+    @staticmethod
+    def get_base_url(provider):
+        return (provider.fintoc_api_base_url or const.FINTOC_API_BASE_URL).rstrip('/')
+
     @staticmethod
     def _safe_parse_json(response):
         try:
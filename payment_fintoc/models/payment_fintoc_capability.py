@@ -0,0 +1,70 @@
+from odoo import api, fields, models
+
+
+class PaymentFintocCapability(models.Model):
+    _name = 'payment.fintoc.capability'
+    _description = 'Fintoc API Capability'
+
+    provider_id = fields.Many2one(
+        comodel_name='payment.provider',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+    capability = fields.Selection(
+        selection=[
+            ('checkout_api_version', "Checkout API Version"),
+            ('payment_intent_support', "Payment Intent Support"),
+        ],
+        required=True,
+    )
+    value = fields.Char(help="The value of the capability learned from the Fintoc account.")
+    check_date = fields.Datetime(help="Last time the capability was learned or confirmed.")
+
+    _sql_constraints = [
+        (
+            'payment_fintoc_capability_unique',
+            'unique(provider_id, capability)',
+            'A capability is only learned once per provider.',
+        ),
+    ]
+
+    # === BUSINESS METHODS === #
+
+    @api.model
+    def _learn(self, provider, capability, value):
+        """Remember the value of a capability of the account of a provider.
+
+        The capabilities are learned by the checkouts of customers: they are kept apart from the
+        provider so that concurrent checkouts never write, nor lock, the provider row. The value is
+        upserted so that concurrent checkouts learning a same capability do not conflict.
+
+        :param recordset provider: The provider, as a `payment.provider` record.
+        :param str capability: The learned capability.
+        :param str value: The value of the capability.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO payment_fintoc_capability AS capability (
+                provider_id, capability, value, check_date,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES (
+                %(provider_id)s, %(capability)s, %(value)s, NOW() AT TIME ZONE 'UTC',
+                %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            )
+            ON CONFLICT (provider_id, capability) DO UPDATE
+               SET value = EXCLUDED.value,
+                   check_date = EXCLUDED.check_date,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            """,
+            {
+                'provider_id': provider.id,
+                'capability': capability,
+                'value': value,
+                'uid': self.env.uid,
+            },
+        )
+        self.invalidate_model(['value', 'check_date'])
+        provider.invalidate_recordset()
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+
+import psycopg2
+
+from odoo import api, fields, models
+
+from odoo.addons.payment_fintoc import const
+
+_logger = logging.getLogger(__name__)
+
+# Process-local state of the circuits last seen closed without failures: {key: [expiry monotonic
+# time, consecutive failures of the process]}. The failures of a closed circuit are only recorded in
+# the database once they reach the failure threshold.
+_closed_circuits = {}
+_closed_circuits_lock = threading.Lock()
+
+
+def _is_known_closed(key):
+    with _closed_circuits_lock:
+        return key in _closed_circuits and _closed_circuits[key][0] > time.monotonic()
+
+
+def _record_local_success(key):
+    """Reset the failures of a circuit last seen closed and return whether it was."""
+    with _closed_circuits_lock:
+        if key not in _closed_circuits:
+            return False
+        _closed_circuits[key][1] = 0
+        return True
+
+
+def _record_local_failure(key):
+    """Count a failure of a circuit and return the number of failures to record in the database.
+
+    The failures of a circuit last seen closed are counted in memory until the failure threshold is
+    reached; those of other circuits are all recorded.
+    """
+    with _closed_circuits_lock:
+        if key not in _closed_circuits:
+            return 1
+        _closed_circuits[key][1] += 1
+        failure_count = _closed_circuits[key][1]
+        if failure_count < const.CIRCUIT_FAILURE_THRESHOLD:
+            return 0
+        del _closed_circuits[key]
+        return failure_count
+
+
+class PaymentFintocCircuit(models.Model):
+    _name = 'payment.fintoc.circuit'
+    _description = 'Fintoc API Circuit Breaker'
+
+    key = fields.Char(
+        help="Hash of the API base URL and secret key guarded by the circuit.",
+        required=True,
+        index=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('closed', 'Closed'),
+            ('open', 'Open'),
+            ('half_open', 'Half-Open'),
+        ],
+        default='closed',
+        required=True,
+    )
+    failure_count = fields.Integer()
+    opened_date = fields.Datetime()
+    probe_date = fields.Datetime()
+
+    _sql_constraints = [
+        ('payment_fintoc_circuit_unique', 'unique(key)', 'A circuit already exists for this key.'),
+    ]
+
+    # === BUSINESS METHODS === #
+
+    @api.model
+    def _acquire(self, key):
+        """Return whether a request guarded by the circuit may be sent.
+
+        Requests are always allowed while the circuit is closed. Once open, requests fail fast
+        until the open period elapsed; then a single request is allowed through as recovery probe.
+        Only a closed circuit without recorded failures is cached as such, so that the success
+        following a recorded failure resets the count of consecutive failures.
+
+        Note: `self.env.cr` must be a cursor dedicated to the circuit breaker.
+
+        :param str key: The key of the circuit.
+        :return: Whether the request may be sent.
+        :rtype: bool
+        """
+        self.env.cr.execute(
+            """
+            SELECT state,
+                   failure_count,
+                   opened_date < (NOW() AT TIME ZONE 'UTC') - make_interval(secs => %s),
+                   probe_date < (NOW() AT TIME ZONE 'UTC') - make_interval(secs => %s)
+              FROM payment_fintoc_circuit
+             WHERE key = %s
+            """,
+            (const.CIRCUIT_OPEN_SECONDS, const.CIRCUIT_PROBE_TIMEOUT_SECONDS, key),
+        )
+        row = self.env.cr.fetchone()
+        state, failure_count, open_period_elapsed, probe_expired = row or (
+            'closed', 0, False, False
+        )
+        with _closed_circuits_lock:
+            if state == 'closed' and not failure_count:
+                _closed_circuits.setdefault(key, [0, 0])[0] = (
+                    time.monotonic() + const.CIRCUIT_STATE_CACHE_SECONDS
+                )
+            else:
+                _closed_circuits.pop(key, None)
+        if state == 'closed':
+            return True
+        if (state == 'open' and not open_period_elapsed) or (
+            state == 'half_open' and not probe_expired
+        ):
+            return False
+
+        # Only the worker that switches the circuit to half-open sends the recovery probe.
+        self.env.cr.execute(
+            """
+            UPDATE payment_fintoc_circuit
+               SET state = 'half_open',
+                   probe_date = NOW() AT TIME ZONE 'UTC'
+             WHERE key = %s
+               AND state = %s
+            RETURNING id
+            """,
+            (key, state),
+        )
+        is_probe = bool(self.env.cr.fetchone())
+        if is_probe:
+            _logger.info("Sending a recovery probe through the open Fintoc circuit %s", key[:12])
+        return is_probe
+
+    @api.model
+    def _record_success(self, key):
+        """Close the circuit after a successful request.
+
+        Note: `self.env.cr` must be a cursor dedicated to the circuit breaker.
+        """
+        self.env.cr.execute(
+            """
+            UPDATE payment_fintoc_circuit
+               SET state = 'closed',
+                   failure_count = 0
+             WHERE key = %s
+               AND (state != 'closed' OR failure_count > 0)
+            RETURNING id
+            """,
+            (key,),
+        )
+        if self.env.cr.fetchone():
+            _logger.info("Fintoc circuit %s closed", key[:12])
+
+    @api.model
+    def _record_failure(self, key, failure_count=1):
+        """Count failed requests and open the circuit once the failure threshold is reached.
+
+        A failed recovery probe reopens the circuit immediately.
+
+        Note: `self.env.cr` must be a cursor dedicated to the circuit breaker.
+
+        :param str key: The key of the circuit.
+        :param int failure_count: The number of consecutive failed requests to count.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO payment_fintoc_circuit AS circuit (
+                key, state, failure_count, create_date, write_date
+            )
+            VALUES (%s, 'closed', %s, NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (key) DO UPDATE
+               SET failure_count = circuit.failure_count + EXCLUDED.failure_count,
+                   write_date = EXCLUDED.write_date
+            RETURNING state, failure_count
+            """,
+            (key, failure_count),
+        )
+        state, failure_count = self.env.cr.fetchone()
+        if state == 'half_open' or (
+            state == 'closed' and failure_count >= const.CIRCUIT_FAILURE_THRESHOLD
+        ):
+            self.env.cr.execute(
+                """
+                UPDATE payment_fintoc_circuit
+                   SET state = 'open',
+                       opened_date = NOW() AT TIME ZONE 'UTC'
+                 WHERE key = %s
+                """,
+                (key,),
+            )
+            _logger.warning(
+                "Fintoc circuit %s opened after %s consecutive failures", key[:12], failure_count
+            )
+
+    @api.model
+    def _run_isolated(self, method_name, key):
+        """Run a circuit method in its own short, committed transaction.
+
+        The circuit state must survive the rollback of the request that sent the API call, and
+        concurrent workers must not conflict on it, hence the dedicated READ COMMITTED cursor.
+        Circuit bookkeeping is best-effort: database errors are logged and ignored.
+
+        The database is only touched when the state of the circuit may change: requests through a
+        circuit recently seen closed are let through, and the successes and failures of a circuit
+        last seen closed are counted in memory until the failure threshold is reached.
+        """
+        args = ()
+        if method_name == '_acquire' and _is_known_closed(key):
+            return True
+        if method_name == '_record_success' and _record_local_success(key):
+            return True
+        if method_name == '_record_failure':
+            failure_count = _record_local_failure(key)
+            if not failure_count:
+                return True
+            args = (failure_count,)
+        try:
+            with self.env.registry.cursor() as cr:
+                if not self.env.registry.in_test_mode():
+                    cr.execute('SET TRANSACTION ISOLATION LEVEL READ COMMITTED')
+                return getattr(self.with_env(self.env(cr=cr)), method_name)(key, *args)
+        except psycopg2.Error:
+            _logger.exception("Unable to update the Fintoc circuit %s", key[:12])
+            return True
@@ -1,4 +1,45 @@
-from odoo import fields, models
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+
+import psycopg2
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import ValidationError
+from odoo.modules import module
+
+from odoo.addons.payment_fintoc import const, tracing
+from odoo.addons.payment_fintoc.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+
+class RecentEventIds:
+    """Bounded, thread-safe LRU set of the (database, webhook event id) pairs known to be stored."""
+
+    def __init__(self, maxsize=const.RECENT_EVENT_IDS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._event_ids = OrderedDict()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._event_ids:
+                return False
+            self._event_ids.move_to_end(key)
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._event_ids[key] = True
+            self._event_ids.move_to_end(key)
+            while len(self._event_ids) > self.maxsize:
+                self._event_ids.popitem(last=False)
+
+
+RECENT_EVENT_IDS = RecentEventIds()
 
 
 class PaymentFintocEvent(models.Model):
@@ -18,6 +59,12 @@ class PaymentFintocEvent(models.Model):
         ondelete='set null',
     )
     payload = fields.Text()
+    payload_compressed = fields.Binary(
+        string="Compressed Payload",
+        help="The zlib-compressed payload of handled events whose payload exceeds the threshold, "
+             "stored as raw bytes.",
+        attachment=False,
+    )
     state = fields.Selection(
         selection=[
             ('received', 'Received'),
@@ -26,6 +73,7 @@ class PaymentFintocEvent(models.Model):
         ],
         default='received',
         required=True,
+        index=True,
     )
     error_message = fields.Char()
     processed_date = fields.Datetime()
@@ -33,3 +81,418 @@ class PaymentFintocEvent(models.Model):
     _sql_constraints = [
         ('payment_fintoc_event_unique', 'unique(event_id)', 'Webhook event already processed.'),
     ]
+
+    def init(self):
+        super().init()
+        # Serve the retention cron, which deletes events by state and age.
+        tools.create_index(
+            self.env.cr,
+            'payment_fintoc_event_state_create_date_index',
+            self._table,
+            ['state', 'create_date'],
+        )
+        # Serve the retention cron, which deletes the payloads of expired events.
+        tools.create_index(
+            self.env.cr,
+            'payment_fintoc_event_state_create_date_payload_index',
+            self._table,
+            ['state', 'create_date'],
+            where='payload IS NOT NULL OR payload_compressed IS NOT NULL',
+        )
+        # Serve the compression of the large payloads of handled events.
+        tools.create_index(
+            self.env.cr,
+            'payment_fintoc_event_payload_length_index',
+            self._table,
+            ['length(payload)'],
+            where="payload IS NOT NULL AND state != 'received'",
+        )
+
+    # === CRUD METHODS === #
+
+    @api.model
+    def _create_if_new(self, event_id, event_type, provider_id, payload):
+        """Store a webhook event unless an event with the same id was already stored.
+
+        Deduplication is a single atomic `INSERT ... ON CONFLICT DO NOTHING` so that concurrent
+        deliveries of a same event never violate the unique constraint, and event ids recently seen
+        by this process in the same database are rejected without querying it.
+
+        :param str event_id: The Fintoc event id.
+        :param str event_type: The Fintoc event type.
+        :param int provider_id: The id of the provider that received the event.
+        :param str payload: The raw body of the webhook.
+        :return: The created event, or an empty recordset if the event is a duplicate.
+        :rtype: recordset of `payment.fintoc.event`
+        """
+        # The process may serve several databases, each with its own events.
+        recent_key = (self.env.cr.dbname, event_id)
+        if recent_key in RECENT_EVENT_IDS:
+            return self.browse()
+
+        self.env.cr.execute(
+            """
+            INSERT INTO payment_fintoc_event (
+                event_id, event_type, provider_id, payload, state,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES (%s, %s, %s, %s, 'received', %s, %s, %s, %s)
+            ON CONFLICT (event_id) DO NOTHING
+            RETURNING id
+            """,
+            (
+                event_id, event_type, provider_id, payload,
+                self.env.uid, self.env.cr.now(), self.env.uid, self.env.cr.now(),
+            ),
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            RECENT_EVENT_IDS.add(recent_key)  # The conflicting event is committed.
+            return self.browse()
+
+        # Only remember the event once stored for good, so that a rolled back one can be retried.
+        self.env.cr.postcommit.add(lambda: RECENT_EVENT_IDS.add(recent_key))
+        return self.browse(row[0])
+
+    # === BUSINESS METHODS === #
+
+    def _process(self, partition_lock=False):
+        """Apply the received events to their transactions.
+
+        The transactions of all events are resolved with a single query. The events of a same
+        transaction are then applied in chronological order and coalesced into one notification, so
+        that a batch costs at most one state transition per transaction. Each transaction is
+        processed in its own savepoint so that a failing one only marks its own events as `error`.
+
+        :param bool partition_lock: Whether to skip the transactions that are being processed, or
+                                    were just updated, by another worker, leaving their events in
+                                    the queue.
+        :return: None
+        """
+        events = self.filtered(lambda e: e.state == 'received')
+        notification_data_by_event_id, created_at_by_event_id = {}, {}
+        with tracing.span('parse_payloads'):
+            for event in events:
+                try:
+                    event_payload = json.loads(event._get_payload() or '{}')
+                except json.JSONDecodeError as error:
+                    event._set_error(str(error))
+                    continue
+                notification_data_by_event_id[event.id] = self._build_notification_data(
+                    event_payload
+                )
+                created_at_by_event_id[event.id] = event_payload.get('created_at') or ''
+
+        with tracing.span('tx_lookup'):
+            tx_model = self.env['payment.transaction'].sudo()
+            tx_by_event_id = tx_model._fintoc_get_txs_from_notifications(
+                notification_data_by_event_id
+            )
+        events_by_tx = defaultdict(lambda: self.browse())
+        for event in events.filtered(lambda e: e.id in notification_data_by_event_id):
+            tx_sudo = tx_by_event_id.get(event.id)
+            if not tx_sudo:
+                event._set_error(_(
+                    "Fintoc: no transaction could be matched from webhook notification data."
+                ))
+                continue
+            events_by_tx[tx_sudo] |= event
+
+        # Lock the transactions in a defined order.
+        for tx_sudo, tx_events in sorted(events_by_tx.items(), key=lambda item: item[0].id):
+            if partition_lock and not self._try_lock_transaction(tx_sudo):
+                continue
+            tx_events = tx_events.sorted(lambda e: (created_at_by_event_id[e.id], e.id))
+            notification_data = self._coalesce_notification_data(
+                [notification_data_by_event_id[event.id] for event in tx_events]
+            )
+            try:
+                with self.env.cr.savepoint():
+                    with tracing.span('apply', event_type=notification_data.get('event_type')):
+                        tx_sudo._process_notification_data(notification_data)
+                    with tracing.span('post_processing'):
+                        tx_sudo._execute_callback()
+            except ValidationError as error:
+                tx_events._set_error(str(error))
+                _logger.exception(
+                    "Unable to process Fintoc webhook events %s for transaction %s",
+                    ', '.join(tx_events.mapped('event_id')),
+                    tx_sudo.reference,
+                )
+                continue
+
+            tx_events.write({
+                'state': 'processed',
+                'transaction_id': tx_sudo.id,
+                'processed_date': fields.Datetime.now(),
+            })
+
+    def _get_payload(self):
+        """Return the raw payload of the event, decompressing it if necessary."""
+        self.ensure_one()
+        if self.payload_compressed:
+            return zlib.decompress(self.payload_compressed).decode('utf-8')
+        return self.payload
+
+    def _set_error(self, error_message):
+        self.write({
+            'state': 'error',
+            'error_message': error_message,
+            'processed_date': fields.Datetime.now(),
+        })
+
+    @api.model
+    def _coalesce_notification_data(self, notification_data_list):
+        """Merge chronologically sorted notifications of a same transaction into a single one.
+
+        The merged notification is the last one that changes the state of the transaction (or the
+        last one if none does), enriched with the latest Fintoc identifiers of all notifications.
+
+        :param list notification_data_list: The notifications, sorted from oldest to newest.
+        :return: The merged notification data.
+        :rtype: dict
+        """
+        identifiers = {}
+        final_notification_data = notification_data_list[-1]
+        for notification_data in notification_data_list:
+            identifiers.update({
+                key: notification_data[key]
+                for key in const.NOTIFICATION_IDENTIFIER_KEYS
+                if notification_data.get(key)
+            })
+            if notification_data.get('event_type') not in const.IDENTIFIER_ONLY_WEBHOOK_EVENTS:
+                final_notification_data = notification_data
+        return dict(final_notification_data, **identifiers)
+
+    @api.model
+    def _try_lock_transaction(self, tx):
+        """Reserve the processing of a transaction, without waiting for other workers.
+
+        The advisory lock partitions the transactions between the workers processing events. The
+        row lock is then taken before any write on the transaction: if another request holds it, or
+        updated the transaction since the current one started, it fails right away instead of
+        letting the first write fail with a serialization error that replays the whole request.
+
+        :return: Whether the transaction is locked for the current request.
+        :rtype: bool
+        """
+        self.env.cr.execute(
+            'SELECT pg_try_advisory_xact_lock(%s, %s)',
+            (const.EVENT_PROCESSING_LOCK_NAMESPACE, tx.id),
+        )
+        if not self.env.cr.fetchone()[0]:
+            METRICS.inc('fintoc_tx_lock_contention_total', {'reason': 'locked'})
+            return False
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    'SELECT id FROM payment_transaction WHERE id = %s FOR NO KEY UPDATE NOWAIT',
+                    (tx.id,),
+                    log_exceptions=False,
+                )
+        except psycopg2.errors.LockNotAvailable:
+            METRICS.inc('fintoc_tx_lock_contention_total', {'reason': 'locked'})
+            return False
+        except psycopg2.errors.SerializationFailure:
+            METRICS.inc('fintoc_tx_lock_contention_total', {'reason': 'concurrent_update'})
+            return False
+        return True
+
+    @api.model
+    def _claim_received_events(self, limit):
+        """Lock and return a batch of received events that no other worker is processing."""
+        self.env.cr.execute(
+            """
+            SELECT id
+              FROM payment_fintoc_event
+             WHERE state = 'received'
+          ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+            """,
+            (limit,),
+        )
+        return self.browse(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _cron_process_received_events(self, batch_size=None):
+        """Drain the queue of received events, batch by batch.
+
+        Batches are claimed with `FOR UPDATE SKIP LOCKED` and transactions are partitioned with
+        advisory locks, so that several workers can run this method in parallel.
+        """
+        batch_size = batch_size or int(self.env['ir.config_parameter'].sudo().get_param(
+            const.EVENT_BATCH_SIZE_PARAM, const.DEFAULT_EVENT_BATCH_SIZE
+        ))
+        while True:
+            events = self._claim_received_events(batch_size)
+            if not events:
+                return
+            events._process(partition_lock=True)
+            if module.current_test:
+                return
+            self.env.cr.commit()
+            if all(event.state == 'received' for event in events):
+                return  # All transactions are locked by other workers; let them progress.
+
+    @api.model
+    def _cron_cleanup_events(self):
+        """Delete the payloads of expired events, old tombstones, and compress large payloads.
+
+        Expired events are kept as tombstones, without payload, so that their event_id still
+        deduplicates late redeliveries; the tombstones are deleted once well past the redelivery
+        window. All steps work in bounded batches, committed one by one, so that the cron never
+        holds long-running locks on the event table.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param(
+            const.EVENT_CLEANUP_BATCH_SIZE_PARAM, const.DEFAULT_EVENT_CLEANUP_BATCH_SIZE
+        ))
+        tombstone_days = int(ICP.get_param(
+            const.EVENT_TOMBSTONE_RETENTION_PARAM, const.DEFAULT_EVENT_TOMBSTONE_RETENTION_DAYS
+        ))
+        for state, default_days in const.DEFAULT_EVENT_RETENTION_DAYS.items():
+            days = int(ICP.get_param(const.EVENT_RETENTION_PARAM % state, default_days))
+            if days <= 0:
+                continue  # Keep forever.
+            limit_date = fields.Datetime.subtract(fields.Datetime.now(), days=days)
+            self._cleanup_in_batches(
+                """
+                UPDATE payment_fintoc_event
+                   SET payload = NULL,
+                       payload_compressed = NULL
+                 WHERE id IN (
+                     SELECT id
+                       FROM payment_fintoc_event
+                      WHERE state = %s
+                        AND create_date < %s
+                        AND (payload IS NOT NULL OR payload_compressed IS NOT NULL)
+                      LIMIT %s
+                 )
+                """,
+                (state, limit_date, batch_size),
+                "Deleted the payloads of %s expired Fintoc %s events",
+                state,
+            )
+            if tombstone_days <= 0:
+                continue
+            limit_date = fields.Datetime.subtract(
+                fields.Datetime.now(), days=max(tombstone_days, days)
+            )
+            self._cleanup_in_batches(
+                """
+                DELETE FROM payment_fintoc_event
+                 WHERE id IN (
+                     SELECT id
+                       FROM payment_fintoc_event
+                      WHERE state = %s
+                        AND create_date < %s
+                      LIMIT %s
+                 )
+                """,
+                (state, limit_date, batch_size),
+                "Deleted %s Fintoc %s event tombstones",
+                state,
+            )
+        self.invalidate_model()
+        if not module.current_test:
+            self.env.cr.commit()
+
+        threshold = int(ICP.get_param(
+            const.EVENT_PAYLOAD_COMPRESSION_THRESHOLD_PARAM,
+            const.DEFAULT_EVENT_PAYLOAD_COMPRESSION_THRESHOLD,
+        ))
+        if threshold <= 0:
+            return
+        while True:
+            self.env.cr.execute(
+                """
+                SELECT id
+                  FROM payment_fintoc_event
+                 WHERE state != 'received'
+                   AND payload IS NOT NULL
+                   AND length(payload) > %s
+                 LIMIT %s
+                """,
+                (threshold, batch_size),
+            )
+            events = self.browse(row[0] for row in self.env.cr.fetchall())
+            events._compress_payload()
+            if len(events) < batch_size or module.current_test:
+                return
+            self.env.cr.commit()
+
+    @api.model
+    def _cleanup_in_batches(self, query, params, log_message, *log_args):
+        """Run a cleanup query, whose last parameter is the batch size, until it is exhausted.
+
+        Each batch is committed, unless in test mode.
+        """
+        batch_size = params[-1]
+        while True:
+            self.env.cr.execute(query, params)
+            count = self.env.cr.rowcount
+            if count:
+                _logger.info(log_message, count, *log_args)
+            if count < batch_size or module.current_test:
+                return
+            self.env.cr.commit()
+
+    def _compress_payload(self):
+        """Move the payload of the events to zlib-compressed storage."""
+        for event in self.filtered('payload'):
+            event.write({
+                'payload_compressed': zlib.compress(event.payload.encode('utf-8')),
+                'payload': False,
+            })
+
+    def _trigger_processing(self):
+        """Wake the event processor cron up so that queued events are handled promptly."""
+        self.env.ref('payment_fintoc.cron_process_fintoc_events')._trigger()
+
+    @api.model
+    def _get_metrics_gauges(self):
+        """Return the depth of the event queue by state, as (name, labels, value) metric gauges."""
+        count_by_state = dict.fromkeys(dict(self._fields['state'].selection), 0)
+        for state, count in self._read_group([], ['state'], ['__count']):
+            count_by_state[state] = count
+        return [
+            ('fintoc_event_queue_depth', {'state': state}, count)
+            for state, count in count_by_state.items()
+        ]
+
+    @api.model
+    def _build_notification_data(self, event_payload):
+        """Normalize Fintoc event payload for payment.transaction hooks."""
+        event_type = event_payload.get('type')
+        resource = event_payload.get('data') or {}
+        metadata = resource.get('metadata') or {}
+
+        notification_data = {
+            'event_id': event_payload.get('id'),
+            'event_type': event_type,
+            'resource': resource,
+            'odoo_tx_reference': metadata.get('odoo_tx_reference'),
+            'reference': event_payload.get('reference'),
+            'created_at': event_payload.get('created_at'),
+        }
+
+        if event_type == 'checkout_session.finished':
+            notification_data.update({
+                'checkout_session_id': resource.get('id') or resource.get('checkout_session_id'),
+                'payment_intent_id': resource.get('payment_intent_id'),
+            })
+        elif event_type and event_type.startswith('payment_intent.'):
+            notification_data.update({
+                'payment_intent_id': resource.get('id') or resource.get('payment_intent_id'),
+                'checkout_session_id': resource.get('checkout_session_id'),
+                'reason': resource.get('failure_reason') or resource.get('reason'),
+            })
+        elif event_type and event_type.startswith('refund.'):
+            notification_data.update({
+                'refund_id': resource.get('id') or resource.get('refund_id'),
+                'payment_intent_id': resource.get('resource_id') or resource.get('payment_intent_id'),
+                'reason': resource.get('failure_reason') or resource.get('reason'),
+            })
+
+        return notification_data
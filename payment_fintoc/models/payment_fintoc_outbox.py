@@ -0,0 +1,316 @@
+import json
+import logging
+import random
+import uuid
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+from odoo.modules import module
+
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.models.fintoc_api import FintocApiClient
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFintocOutbox(models.Model):
+    _name = 'payment.fintoc.outbox'
+    _description = 'Fintoc API Outbox'
+    _order = 'id'
+
+    provider_id = fields.Many2one(
+        comodel_name='payment.provider',
+        required=True,
+        ondelete='cascade',
+    )
+    transaction_id = fields.Many2one(
+        comodel_name='payment.transaction',
+        help="The transaction of the call. The calls of a same transaction are sent in order.",
+        ondelete='cascade',
+        index='btree_not_null',
+    )
+    operation = fields.Selection(
+        selection=[
+            ('refund', 'Refund'),
+            ('refund_cancel', 'Refund Cancellation'),
+            ('webhook_registration', 'Webhook Registration'),
+        ],
+        required=True,
+    )
+    payload = fields.Text(help="The JSON payload of the call, if it cannot be rebuilt when sent.")
+    idempotency_key = fields.Char(required=True)
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('sent', 'Sent'),
+            ('failed', 'Failed'),
+        ],
+        default='pending',
+        required=True,
+        index=True,
+    )
+    attempt_count = fields.Integer()
+    next_attempt_date = fields.Datetime(default=fields.Datetime.now, required=True)
+    last_error = fields.Char()
+
+    # === BUSINESS METHODS - ENQUEUE === #
+
+    @api.model
+    def _enqueue(self, operation, provider, transaction=None, payload=None, idempotency_key=None):
+        """Record an API call to send to Fintoc, in the current database transaction.
+
+        The call is thus only sent if the Odoo-side change that requires it is committed: the
+        dispatcher cron is woken up once the transaction is committed, and sends it in the
+        background.
+
+        :param str operation: The operation of the call.
+        :param recordset provider: The provider, as a `payment.provider` record.
+        :param recordset transaction: The transaction of the call, as a `payment.transaction`
+                                      record, if any.
+        :param dict payload: The payload of the call, if it cannot be rebuilt when it is sent.
+        :param str idempotency_key: The idempotency key of the call; defaults to a random one.
+        :return: The outbox message.
+        :rtype: recordset of `payment.fintoc.outbox`
+        """
+        message = self.sudo().create({
+            'provider_id': provider.id,
+            'transaction_id': transaction and transaction.id,
+            'operation': operation,
+            'payload': json.dumps(payload) if payload is not None else False,
+            'idempotency_key': idempotency_key or str(uuid.uuid4()),
+        })
+        self._trigger_dispatch()
+        return message
+
+    @api.model
+    def _trigger_dispatch(self):
+        """Wake the dispatcher cron up once the current transaction is committed.
+
+        The messages recorded in a same transaction, like bulk refunds, share a single trigger.
+        """
+        precommit_data = self.env.cr.precommit.data
+        if not precommit_data.get('payment_fintoc.outbox_triggered'):
+            precommit_data['payment_fintoc.outbox_triggered'] = True
+            self.env.ref('payment_fintoc.cron_dispatch_fintoc_outbox')._trigger()
+
+    # === BUSINESS METHODS - DISPATCH === #
+
+    @api.model
+    def _claim_due_messages(self, limit):
+        """Lock and return a batch of due messages, at most one per transaction (or provider).
+
+        Only the oldest pending message of a transaction is due, so that its calls reach Fintoc in
+        the order in which they were recorded.
+        """
+        self.env.cr.execute(
+            """
+            SELECT id
+              FROM payment_fintoc_outbox outbox
+             WHERE state = 'pending'
+               AND next_attempt_date <= NOW() AT TIME ZONE 'UTC'
+               AND NOT EXISTS (
+                   SELECT 1
+                     FROM payment_fintoc_outbox older
+                    WHERE older.state = 'pending'
+                      AND older.id < outbox.id
+                      AND older.provider_id = outbox.provider_id
+                      AND older.transaction_id IS NOT DISTINCT FROM outbox.transaction_id
+               )
+          ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+            """,
+            (limit,),
+        )
+        return self.browse(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _cron_dispatch(self, batch_size=None):
+        """Send the due messages of the outbox, batch by batch.
+
+        The calls of a batch are sent concurrently, and each batch is committed once sent. The run
+        stops when a batch gets no definitive answer, as Fintoc is then not reachable.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = batch_size or int(ICP.get_param(
+            const.OUTBOX_BATCH_SIZE_PARAM, const.DEFAULT_OUTBOX_BATCH_SIZE
+        ))
+        concurrency = int(ICP.get_param(
+            const.OUTBOX_CONCURRENCY_PARAM, const.DEFAULT_OUTBOX_CONCURRENCY
+        ))
+        while True:
+            messages = self._claim_due_messages(batch_size)
+            if not messages:
+                return
+            messages._send(concurrency)
+            if module.current_test:
+                return
+            self.env.cr.commit()
+            if all(message.state == 'pending' for message in messages):
+                return  # Fintoc is not accepting requests right now; retry on the next run.
+
+    def _send(self, concurrency):
+        """Send the calls of the messages through a thread pool and apply their results."""
+        clients = {}
+        messages, api_requests = self.browse(), []
+        for message in self:
+            try:
+                request_kwargs = message._prepare_request()
+                if message.provider_id not in clients:
+                    clients[message.provider_id] = message.provider_id._fintoc_get_api_client()
+            except UserError as error:
+                message._set_failed(str(error))
+                continue
+            messages |= message
+            api_requests.append((clients[message.provider_id], request_kwargs))
+
+        results = FintocApiClient.request_raw_concurrently(api_requests, concurrency)
+        for message, result in zip(messages, results):
+            message._apply_result(result)
+
+    def _prepare_request(self):
+        """Return the `request_raw` arguments of the call of the message.
+
+        The calls whose target depends on the result of an older call (the refund ID, the webhook
+        endpoint ID) are built when sent rather than when recorded.
+
+        :raise UserError: If the call cannot be built anymore.
+        """
+        self.ensure_one()
+        request_kwargs = {'method': 'POST', 'idempotency_key': self.idempotency_key}
+        if self.operation == 'refund':
+            request_kwargs.update(endpoint='/v1/refunds', payload=json.loads(self.payload))
+        elif self.operation == 'refund_cancel':
+            refund_id = self.transaction_id.fintoc_refund_id
+            if not refund_id:
+                raise UserError(_("No Fintoc refund ID found on this transaction."))
+            request_kwargs.update(endpoint=f'/v1/refunds/{refund_id}/cancel', payload={})
+        else:  # webhook_registration
+            provider = self.provider_id
+            request_kwargs['payload'] = provider._fintoc_get_webhook_registration_payload()
+            if provider.fintoc_webhook_endpoint_id:
+                request_kwargs.update(
+                    method='PUT',
+                    endpoint=f'/v1/webhook_endpoints/{provider.fintoc_webhook_endpoint_id}',
+                )
+            else:
+                request_kwargs['endpoint'] = '/v1/webhook_endpoints'
+        return request_kwargs
+
+    def _apply_result(self, result):
+        """Update the message, and the records of its operation, from the result of its call.
+
+        :param result: The (status code, response data) pair of the call, or the ValidationError
+                       raised when Fintoc could not be reached.
+        :return: Whether the message must be sent again right away.
+        :rtype: bool
+        """
+        self.ensure_one()
+        if isinstance(result, ValidationError):
+            self._postpone(str(result))
+            return False
+        status_code, response_data = result
+        if status_code == 429 or status_code >= 500:
+            self._postpone(FintocApiClient._build_http_error_message(status_code, response_data))
+            return False
+
+        try:
+            with self.env.cr.savepoint():
+                resend = getattr(self, f'_apply_{self.operation}_response')(
+                    status_code, response_data
+                )
+                if not resend:
+                    self.write({'state': 'sent', 'last_error': False})
+        except ValidationError as error:
+            self._set_failed(str(error))
+            return False
+        return resend
+
+    def _apply_refund_response(self, status_code, response_data):
+        if status_code >= 400:
+            raise ValidationError(
+                FintocApiClient._build_http_error_message(status_code, response_data)
+            )
+        self.transaction_id._fintoc_apply_refund_response(response_data)
+
+    def _apply_refund_cancel_response(self, status_code, response_data):
+        if status_code >= 400:
+            raise ValidationError(
+                FintocApiClient._build_http_error_message(status_code, response_data)
+            )
+        self.transaction_id._set_canceled(
+            state_message=_("Refund cancellation requested in Fintoc.")
+        )
+
+    def _apply_webhook_registration_response(self, status_code, response_data):
+        provider = self.provider_id
+        if status_code == 404 and provider.fintoc_webhook_endpoint_id:
+            # The endpoint was deleted in Fintoc: register a new one.
+            provider.fintoc_webhook_endpoint_id = False
+            return True
+        if status_code >= 400:
+            raise ValidationError(
+                FintocApiClient._build_http_error_message(status_code, response_data)
+            )
+        webhook_endpoint_id = response_data.get('id') or response_data.get('data', {}).get('id')
+        if not webhook_endpoint_id:
+            raise ValidationError(_(
+                "Fintoc did not return a webhook endpoint ID. Please verify your credentials."
+            ))
+        provider.write({
+            'fintoc_webhook_endpoint_id': webhook_endpoint_id,
+            'fintoc_webhook_endpoint_url': provider._fintoc_get_webhook_endpoint_url(),
+            'fintoc_webhook_last_sync': fields.Datetime.now(),
+        })
+
+    def _postpone(self, error_message):
+        """Schedule the next attempt of the message with an exponential backoff and jitter."""
+        self.ensure_one()
+        if self.attempt_count + 1 >= const.OUTBOX_MAX_ATTEMPTS:
+            self._set_failed(error_message)
+            return
+        backoff = min(
+            const.OUTBOX_BACKOFF_SECONDS * 2 ** self.attempt_count,
+            const.OUTBOX_MAX_BACKOFF_SECONDS,
+        )
+        backoff += random.uniform(0, backoff * const.RATE_LIMIT_JITTER)
+        self.write({
+            'attempt_count': self.attempt_count + 1,
+            'next_attempt_date': fields.Datetime.add(fields.Datetime.now(), seconds=int(backoff)),
+            'last_error': error_message,
+        })
+        _logger.info(
+            "Fintoc %s call of outbox message %s postponed by %ss: %s",
+            self.operation, self.id, int(backoff), error_message,
+        )
+
+    def _set_failed(self, error_message):
+        """Give up on the message. A refund that Fintoc never accepted is set in error."""
+        self.ensure_one()
+        self.write({'state': 'failed', 'last_error': error_message})
+        _logger.warning(
+            "Fintoc %s call of outbox message %s failed: %s", self.operation, self.id, error_message
+        )
+        if self.operation == 'refund' and self.transaction_id.state in ('draft', 'pending'):
+            self.transaction_id._set_error(error_message)
+
+    # === BUSINESS METHODS - MAINTENANCE === #
+
+    @api.autovacuum
+    def _gc_sent_messages(self):
+        """Delete the messages sent long ago."""
+        limit_date = fields.Datetime.subtract(
+            fields.Datetime.now(), days=const.OUTBOX_RETENTION_DAYS
+        )
+        self.search([('state', '=', 'sent'), ('write_date', '<', limit_date)]).unlink()
+
+    @api.model
+    def _get_metrics_gauges(self):
+        """Return the depth of the outbox by state, as (name, labels, value) metric gauges."""
+        count_by_state = dict.fromkeys(dict(self._fields['state'].selection), 0)
+        for state, count in self._read_group([], ['state'], ['__count']):
+            count_by_state[state] = count
+        return [
+            ('fintoc_outbox_depth', {'state': state}, count)
+            for state, count in count_by_state.items()
+        ]
@@ -0,0 +1,167 @@
+import logging
+
+import psycopg2
+
+from odoo import api, fields, models
+
+from odoo.addons.payment_fintoc import const
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentFintocRateLimit(models.Model):
+    _name = 'payment.fintoc.rate.limit'
+    _description = 'Fintoc API Rate Limiter'
+
+    key = fields.Char(
+        help="Hash of the API base URL and secret key whose requests are rate limited.",
+        required=True,
+        index=True,
+    )
+    tokens = fields.Float(
+        help="Tokens left in the bucket at the refill date. Negative when requests with a deadline "
+             "borrowed tokens ahead.",
+    )
+    refill_date = fields.Datetime(help="Last time the bucket was refilled.")
+    blocked_until = fields.Datetime(
+        help="No request is sent before this date, as asked by Fintoc through a 429 answer.",
+    )
+
+    _sql_constraints = [
+        (
+            'payment_fintoc_rate_limit_unique',
+            'unique(key)',
+            'A rate limiter already exists for this key.',
+        ),
+    ]
+
+    # === BUSINESS METHODS === #
+
+    @api.model
+    def _acquire(self, key, rate, burst, floor):
+        """Refill the token bucket and take a token from it if enough are left.
+
+        A token is only taken if the bucket holds at least `floor` tokens once it is taken. A
+        negative floor lets the request borrow tokens ahead, and wait until they are refilled.
+
+        Note: `self.env.cr` must be a cursor dedicated to the rate limiter.
+
+        :param str key: The key of the rate limiter.
+        :param float rate: The tokens added to the bucket per second.
+        :param float burst: The capacity of the bucket.
+        :param float floor: The minimum number of tokens left in the bucket after taking one.
+        :return: Whether a token was taken, and the seconds to wait before sending the request (if
+                 it was) or before trying again (if it was not).
+        :rtype: tuple[bool, float]
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO payment_fintoc_rate_limit AS bucket (
+                key, tokens, refill_date, create_date, write_date
+            )
+            VALUES (
+                %(key)s, %(burst)s, NOW() AT TIME ZONE 'UTC',
+                NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'
+            )
+            ON CONFLICT (key) DO UPDATE
+               SET tokens = LEAST(
+                       %(burst)s,
+                       bucket.tokens + %(rate)s * GREATEST(
+                           EXTRACT(EPOCH FROM EXCLUDED.refill_date - bucket.refill_date), 0
+                       )
+                   ),
+                   refill_date = GREATEST(EXCLUDED.refill_date, bucket.refill_date)
+            RETURNING tokens,
+                      GREATEST(EXTRACT(EPOCH FROM blocked_until - refill_date), 0)
+            """,
+            {'key': key, 'rate': rate, 'burst': burst},
+        )
+        tokens, blocked_seconds = self.env.cr.fetchone()
+        if blocked_seconds:
+            return False, float(blocked_seconds)
+        if tokens - 1 < floor:
+            return False, (floor + 1 - tokens) / rate
+
+        self.env.cr.execute(
+            "UPDATE payment_fintoc_rate_limit SET tokens = tokens - 1 WHERE key = %s", (key,)
+        )
+        return True, max(1 - tokens, 0) / rate
+
+    @api.model
+    def _block(self, key, seconds):
+        """Hold back all the requests of the rate limiter for the given number of seconds.
+
+        Note: `self.env.cr` must be a cursor dedicated to the rate limiter.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO payment_fintoc_rate_limit AS bucket (
+                key, tokens, refill_date, blocked_until, create_date, write_date
+            )
+            VALUES (
+                %(key)s, 0, NOW() AT TIME ZONE 'UTC',
+                NOW() AT TIME ZONE 'UTC' + make_interval(secs => %(seconds)s),
+                NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'
+            )
+            ON CONFLICT (key) DO UPDATE
+               SET blocked_until = GREATEST(bucket.blocked_until, EXCLUDED.blocked_until),
+                   write_date = EXCLUDED.write_date
+            """,
+            {'key': key, 'seconds': seconds},
+        )
+        _logger.info("Fintoc rate limiter %s holds requests back for %ss", key[:12], seconds)
+
+    @api.model
+    def _run_isolated(self, method_name, key, *args):
+        """Run a rate limiter method in its own short, committed transaction.
+
+        Like the circuit breaker, the bucket is shared by all the workers and must not depend on
+        the transaction of the request. Rate limiting is best-effort: database errors are logged
+        and the request is let through.
+        """
+        try:
+            with self.env.registry.cursor() as cr:
+                if not self.env.registry.in_test_mode():
+                    cr.execute('SET TRANSACTION ISOLATION LEVEL READ COMMITTED')
+                return getattr(self.with_env(self.env(cr=cr)), method_name)(key, *args)
+        except psycopg2.Error:
+            _logger.exception("Unable to update the Fintoc rate limiter %s", key[:12])
+            return True, 0
+
+    @api.model
+    def _get_rate_limit(self):
+        """Return the configured (rate, burst) of the rate limiters; a zero rate disables them."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        rate = float(ICP.get_param(
+            const.RATE_LIMIT_PER_SECOND_PARAM, const.DEFAULT_RATE_LIMIT_PER_SECOND
+        ))
+        burst = float(ICP.get_param(const.RATE_LIMIT_BURST_PARAM, const.DEFAULT_RATE_LIMIT_BURST))
+        return max(rate, 0), max(burst, 1)
+
+    @api.model
+    def _get_metrics_gauges(self):
+        """Return the saturation of the rate limiters, as (name, labels, value) metric gauges.
+
+        The saturation is the share of the bucket in use: 0 when it is full, 1 when it is empty,
+        and more than 1 while requests with a deadline borrow tokens ahead.
+        """
+        rate, burst = self._get_rate_limit()
+        if not rate:
+            return []
+        self.env.cr.execute(
+            """
+            SELECT key,
+                   LEAST(
+                       %(burst)s,
+                       tokens + %(rate)s * GREATEST(
+                           EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - refill_date), 0
+                       )
+                   )
+              FROM payment_fintoc_rate_limit
+            """,
+            {'rate': rate, 'burst': burst},
+        )
+        return [
+            ('fintoc_rate_limiter_saturation', {'key': key[:12]}, round(1 - tokens / burst, 4))
+            for key, tokens in self.env.cr.fetchall()
+        ]
@@ -2,14 +2,20 @@ import hashlib
 import hmac
 import logging
 import time
+from collections import defaultdict
 
 from werkzeug import urls
 
-from odoo import _, Command, api, fields, models
+from odoo import _, Command, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 
 from odoo.addons.payment_fintoc import const
-from odoo.addons.payment_fintoc.models.fintoc_api import FintocApiClient
+from odoo.addons.payment_fintoc.metrics import METRICS
+from odoo.addons.payment_fintoc.models.fintoc_api import (
+    SESSION_POOL,
+    FintocApiClient,
+    FintocDeadline,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -36,9 +42,22 @@ class PaymentProvider(models.Model):
         groups='base.group_system',
         copy=False,
     )
+    fintoc_webhook_previous_secrets = fields.Text(
+        string="Previous Webhook Secrets",
+        help=(
+            "Webhook secrets still accepted while rotating FINTOC_WEBHOOK_SECRET, one per line. "
+            "Clear them once Fintoc only signs with the current secret."
+        ),
+        groups='base.group_system',
+        copy=False,
+    )
     fintoc_webhook_endpoint_url = fields.Char(
         string="Webhook Endpoint URL",
-        help="Public HTTPS URL that Fintoc will call to notify payment and refund status updates.",
+        help=(
+            "Public HTTPS URL that Fintoc will call to notify payment and refund status updates. "
+            "Use the provider-specific route (/payment/fintoc/webhook/<provider id>) so incoming "
+            "webhooks are only verified against this provider's secrets."
+        ),
         required_if_provider='fintoc',
     )
     fintoc_webhook_endpoint_id = fields.Char(
@@ -56,6 +75,28 @@ class PaymentProvider(models.Model):
         help="Maximum age accepted for webhook signatures.",
         default=const.DEFAULT_WEBHOOK_TOLERANCE_SECONDS,
     )
+    fintoc_connect_timeout = fields.Integer(
+        string="API Connect Timeout (seconds)",
+        default=const.DEFAULT_CONNECT_TIMEOUT,
+    )
+    fintoc_read_timeout = fields.Integer(
+        string="API Read Timeout (seconds)",
+        default=const.DEFAULT_TIMEOUT,
+    )
+    fintoc_checkout_deadline = fields.Integer(
+        string="Checkout Deadline (seconds)",
+        help=(
+            "Overall time budget of the API calls creating a checkout session, fallbacks included."
+        ),
+        default=const.DEFAULT_CHECKOUT_DEADLINE,
+    )
+    fintoc_webhook_async = fields.Boolean(
+        string="Asynchronous Webhook Processing",
+        help=(
+            "If enabled, webhooks are only verified, deduplicated and queued before being "
+            "acknowledged. Queued events are applied to transactions in the background."
+        ),
+    )
     fintoc_api_base_url = fields.Char(
         string="API Base URL (Optional)",
         help=(
@@ -64,6 +105,31 @@ class PaymentProvider(models.Model):
         ),
     )
 
+    fintoc_checkout_api_version = fields.Selection(
+        string="Checkout API Version",
+        help="The checkout sessions API version negotiated with the Fintoc account.",
+        selection=[('v2', "v2"), ('v1', "v1")],
+        compute='_compute_fintoc_api_capabilities',
+    )
+    fintoc_checkout_api_version_date = fields.Datetime(
+        string="Checkout API Version Checked On",
+        compute='_compute_fintoc_api_capabilities',
+    )
+
+    fintoc_payment_intent_support = fields.Selection(
+        string="Payment Intent Support",
+        help=(
+            "Whether the Fintoc account accepts the payment_intent payment method. Accounts that "
+            "do not are sent payment_initiation directly."
+        ),
+        selection=[('supported', "Supported"), ('unsupported', "Unsupported")],
+        compute='_compute_fintoc_api_capabilities',
+    )
+    fintoc_payment_intent_support_date = fields.Datetime(
+        string="Payment Intent Support Checked On",
+        compute='_compute_fintoc_api_capabilities',
+    )
+
     fintoc_collection_mode = fields.Selection(
         string="Collection Mode",
         selection=[
@@ -142,6 +208,22 @@ class PaymentProvider(models.Model):
             ))
             provider.fintoc_configuration_warning = "\n".join(warnings) if warnings else False
 
+    def _compute_fintoc_api_capabilities(self):
+        capabilities = self.env['payment.fintoc.capability'].sudo().search([
+            ('provider_id', 'in', self.ids),
+        ])
+        capability_by_key = {
+            (capability.provider_id, capability.capability): capability
+            for capability in capabilities
+        }
+        for provider in self:
+            for capability_name, field_name in const.API_CAPABILITY_FIELDS.items():
+                capability = capability_by_key.get(
+                    (provider, capability_name), capabilities.browse()
+                )
+                provider[field_name] = capability.value
+                provider[f'{field_name}_date'] = capability.check_date
+
     @api.depends('code')
     def _compute_view_configuration_fields(self):
         """Override of payment to adapt the Fintoc provider form."""
@@ -227,10 +309,17 @@ class PaymentProvider(models.Model):
         fintoc_providers = providers.filtered(lambda p: p.code == 'fintoc')
         fintoc_providers._fintoc_sync_payment_methods()
         fintoc_providers._fintoc_ensure_accounting_setup()
+        if fintoc_providers:
+            self.env.registry.clear_cache()  # Invalidate the webhook keys.
         return providers
 
     def write(self, values):
         result = super().write(values)
+        if any(key in values for key in const.API_CAPABILITY_RESET_FIELDS):
+            # Another account or environment may not support the same API capabilities.
+            self._fintoc_reset_api_capabilities()
+        if any(key in values for key in const.WEBHOOK_KEY_RING_FIELDS):
+            self.env.registry.clear_cache()  # Invalidate the webhook keys.
         if (
             not self.env.context.get('skip_fintoc_pm_sync')
             and any(
@@ -253,28 +342,74 @@ class PaymentProvider(models.Model):
             self.filtered(lambda p: p.code == 'fintoc')._fintoc_ensure_accounting_setup()
         return result
 
+    def unlink(self):
+        has_fintoc_providers = any(provider.code == 'fintoc' for provider in self)
+        result = super().unlink()
+        if has_fintoc_providers:
+            self.env.registry.clear_cache()  # Invalidate the webhook keys.
+        return result
+
+    def _register_hook(self):
+        """Override of base to warm up the Fintoc connection pool of each worker, if enabled."""
+        super()._register_hook()
+        if not tools.str2bool(
+            self.env['ir.config_parameter'].sudo().get_param(const.HTTP_WARMUP_PARAM, 'False')
+        ):
+            return
+        providers = self.sudo().search([
+            ('code', '=', 'fintoc'),
+            ('state', '!=', 'disabled'),
+            ('fintoc_secret_key', '!=', False),
+        ])
+        SESSION_POOL.schedule_warm_up({
+            (FintocApiClient.get_base_url(provider), provider.fintoc_secret_key)
+            for provider in providers
+        })
+
     # === BUSINESS METHODS === #
 
     def _fintoc_sync_payment_methods(self):
-        """Synchronize attached payment methods from the Fintoc method toggles."""
-        bank_method = self.env.ref(
-            'payment_fintoc.payment_method_fintoc_bank_transfer', raise_if_not_found=False
-        )
-        card_method = self.env.ref('payment_fintoc.payment_method_fintoc_card', raise_if_not_found=False)
+        """Synchronize attached payment methods from the Fintoc method toggles.
+
+        Providers are grouped by the set of methods they should have, so that each distinct set
+        costs a single write; providers already attached to the right methods are not written.
+        """
+        bank_method_id, card_method_id = self._fintoc_get_payment_method_ids()
 
+        providers_by_method_ids = defaultdict(lambda: self.browse())
         for provider in self:
             method_ids = []
-            if provider.fintoc_enable_bank_transfer and bank_method:
-                method_ids.append(bank_method.id)
-            if provider.fintoc_enable_card and card_method:
-                method_ids.append(card_method.id)
-
-            provider.with_context(skip_fintoc_pm_sync=True).write({
-                'payment_method_ids': [Command.set(method_ids)]
+            if provider.fintoc_enable_bank_transfer and bank_method_id:
+                method_ids.append(bank_method_id)
+            if provider.fintoc_enable_card and card_method_id:
+                method_ids.append(card_method_id)
+            if set(provider.payment_method_ids.ids) != set(method_ids):
+                providers_by_method_ids[tuple(method_ids)] |= provider
+
+        for method_ids, providers in providers_by_method_ids.items():
+            providers.with_context(skip_fintoc_pm_sync=True).write({
+                'payment_method_ids': [Command.set(list(method_ids))]
             })
 
+    @api.model
+    @tools.ormcache()
+    def _fintoc_get_payment_method_ids(self):
+        """Return the ids of the Fintoc bank transfer and card payment methods, or False."""
+        xmlid_to_res_id = self.env['ir.model.data']._xmlid_to_res_id
+        return (
+            xmlid_to_res_id(
+                'payment_fintoc.payment_method_fintoc_bank_transfer', raise_if_not_found=False
+            ),
+            xmlid_to_res_id('payment_fintoc.payment_method_fintoc_card', raise_if_not_found=False),
+        )
+
     def _fintoc_ensure_accounting_setup(self):
-        """Ensure account payment method + journal line exist for Fintoc providers."""
+        """Ensure account payment method + journal line exist for Fintoc providers.
+
+        The journal lines of all providers are fetched with one search and fixed with one batched
+        write. Only the providers without a line on their current journal yet go through the journal
+        selection of account_payment, which works provider by provider.
+        """
         if (
             'account.payment.method' not in self.env
             or 'account.payment.method.line' not in self.env
@@ -295,29 +430,45 @@ class PaymentProvider(models.Model):
                 'payment_type': 'inbound',
             })
 
-        for provider in self.filtered(lambda p: p.code == 'fintoc'):
-            provider_sudo = provider.sudo()
-            # Trigger compute/default journal selection in account_payment.
-            provider_sudo.journal_id
-            if provider_sudo.journal_id and hasattr(provider_sudo, '_ensure_payment_method_line'):
-                provider_sudo._ensure_payment_method_line(allow_create=True)
+        providers_sudo = self.filtered(lambda p: p.code == 'fintoc').sudo()
+        # Trigger compute/default journal selection in account_payment.
+        providers_sudo = providers_sudo.filtered('journal_id')
+        if not providers_sudo:
+            return
 
-            if not provider_sudo.journal_id:
-                continue
+        def get_journal_lines(providers):
+            """Return the lines of the providers on their current journal, by provider."""
+            lines = payment_method_line_model.search([
+                ('payment_provider_id', 'in', providers.ids),
+                ('journal_id', 'in', providers.journal_id.ids),
+            ])
+            return {
+                line.payment_provider_id: line
+                for line in lines
+                if line.journal_id == line.payment_provider_id.journal_id
+            }
 
-            pay_method_line = payment_method_line_model.search([
-                ('payment_provider_id', '=', provider_sudo.id),
-                ('journal_id', '=', provider_sudo.journal_id.id),
-            ], limit=1)
-            if not pay_method_line:
-                payment_method_line_model.create({
+        line_by_provider = get_journal_lines(providers_sudo)
+        new_providers_sudo = providers_sudo.filtered(lambda p: p not in line_by_provider)
+        if new_providers_sudo:
+            if hasattr(new_providers_sudo, '_ensure_payment_method_line'):
+                for provider_sudo in new_providers_sudo:
+                    provider_sudo._ensure_payment_method_line(allow_create=True)
+                line_by_provider.update(get_journal_lines(new_providers_sudo))
+            payment_method_line_model.create([
+                {
                     'name': provider_sudo.name,
                     'payment_method_id': account_payment_method.id,
                     'journal_id': provider_sudo.journal_id.id,
                     'payment_provider_id': provider_sudo.id,
-                })
-            elif pay_method_line.payment_method_id != account_payment_method:
-                pay_method_line.payment_method_id = account_payment_method
+                }
+                for provider_sudo in new_providers_sudo
+                if provider_sudo not in line_by_provider
+            ])
+
+        payment_method_line_model.union(*line_by_provider.values()).filtered(
+            lambda line: line.payment_method_id != account_payment_method
+        ).write({'payment_method_id': account_payment_method.id})
 
     def _get_default_payment_method_codes(self):
         """Override of payment to return default Fintoc payment methods."""
@@ -338,7 +489,27 @@ class PaymentProvider(models.Model):
             raise UserError(_("Fintoc Secret Key is required."))
         return FintocApiClient(self)
 
-    def _fintoc_make_request(self, endpoint, payload=None, method='POST', idempotency_key=None):
+    def _fintoc_new_deadline(self, operation):
+        """Return a new time budget for the API calls of the given business operation.
+
+        :param str operation: The operation, as a key of `const.OPERATION_DEADLINE_FIELDS`.
+        :return: The deadline of the operation.
+        :rtype: FintocDeadline
+        """
+        self.ensure_one()
+        connect_timeout, read_timeout = FintocApiClient.get_timeouts(self)
+        deadline_field = const.OPERATION_DEADLINE_FIELDS.get(operation)
+        seconds = deadline_field and self[deadline_field] or connect_timeout + read_timeout
+        return FintocDeadline(seconds, connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+    def _fintoc_make_request(
+        self,
+        endpoint,
+        payload=None,
+        method='POST',
+        idempotency_key=None,
+        deadline=None,
+    ):
         self.ensure_one()
         client = self._fintoc_get_api_client()
         return client.request(
@@ -346,6 +517,7 @@ class PaymentProvider(models.Model):
             endpoint=endpoint,
             payload=payload,
             idempotency_key=idempotency_key,
+            deadline=deadline,
         )
 
     def _fintoc_make_request_raw(
@@ -354,6 +526,7 @@ class PaymentProvider(models.Model):
         payload=None,
         method='POST',
         idempotency_key=None,
+        deadline=None,
     ):
         self.ensure_one()
         client = self._fintoc_get_api_client()
@@ -362,35 +535,148 @@ class PaymentProvider(models.Model):
             endpoint=endpoint,
             payload=payload,
             idempotency_key=idempotency_key,
+            deadline=deadline,
         )
 
-    def _fintoc_create_checkout_session(self, payload, idempotency_key):
-        """Create checkout session with automatic /v2 -> /v1 fallback."""
+    def _fintoc_create_checkout_session(self, payload, idempotency_key, deadline=None):
+        """Create checkout session with automatic /v2 -> /v1 fallback.
+
+        The API version negotiated with the account is remembered per provider, so that accounts
+        without /v2 go straight to /v1 until the version expires and is negotiated again.
+
+        :param dict payload: The checkout session payload.
+        :param str idempotency_key: The idempotency key of the /v2 call, suffixed for /v1.
+        :param FintocDeadline deadline: The budget shared by the /v2 and /v1 calls, if any.
+        """
         self.ensure_one()
 
+        v1_idempotency_key = None
+        if idempotency_key:
+            v1_idempotency_key = f"{idempotency_key}-v1"[:255]
+
+        if self._fintoc_uses_checkout_api_v1():
+            return self._fintoc_make_request(
+                endpoint='/v1/checkout_sessions',
+                payload=payload,
+                method='POST',
+                idempotency_key=v1_idempotency_key,
+                deadline=deadline,
+            )
+
         status_code, response_data = self._fintoc_make_request_raw(
             endpoint='/v2/checkout_sessions',
             payload=payload,
             method='POST',
             idempotency_key=idempotency_key,
+            deadline=deadline,
         )
         if status_code < 400:
+            self._fintoc_set_checkout_api_version('v2')
             return response_data
 
         if self._fintoc_should_retry_checkout_with_v1(status_code, response_data):
             _logger.info("Retrying Fintoc checkout session creation on /v1 endpoint")
-            v1_idempotency_key = None
-            if idempotency_key:
-                v1_idempotency_key = f"{idempotency_key}-v1"[:255]
-            return self._fintoc_make_request(
+            METRICS.inc('fintoc_checkout_fallback_total', {'fallback': 'v1'})
+            response_data = self._fintoc_make_request(
                 endpoint='/v1/checkout_sessions',
                 payload=payload,
                 method='POST',
                 idempotency_key=v1_idempotency_key,
+                deadline=deadline,
             )
+            self._fintoc_set_checkout_api_version('v1')
+            return response_data
 
         raise ValidationError(FintocApiClient._build_http_error_message(status_code, response_data))
 
+    def _fintoc_uses_checkout_api_v1(self):
+        """Return whether checkout sessions go straight to /v1.
+
+        Once the negotiated /v1 version expired, /v2 is tried again by the next checkout, in case
+        the account was upgraded.
+        """
+        self.ensure_one()
+        return (
+            self.fintoc_checkout_api_version == 'v1'
+            and not self._fintoc_is_checkout_api_version_expired()
+        )
+
+    def _fintoc_is_checkout_api_version_expired(self):
+        self.ensure_one()
+        expiry_date = fields.Datetime.subtract(
+            fields.Datetime.now(), hours=const.CHECKOUT_API_VERSION_TTL_HOURS
+        )
+        return (
+            not self.fintoc_checkout_api_version_date
+            or self.fintoc_checkout_api_version_date < expiry_date
+        )
+
+    def _fintoc_set_checkout_api_version(self, api_version):
+        """Remember the negotiated checkout API version.
+
+        The version is only written when it changes or expired, so that the checkouts of customers
+        do not write it every time.
+        """
+        self.ensure_one()
+        if (
+            self.fintoc_checkout_api_version != api_version
+            or self._fintoc_is_checkout_api_version_expired()
+        ):
+            self.env['payment.fintoc.capability'].sudo()._learn(
+                self, 'checkout_api_version', api_version
+            )
+
+    def _fintoc_supports_payment_intent(self):
+        """Return whether checkout sessions may be created with the payment_intent method.
+
+        Once the learned incompatibility expired, payment_intent is given another chance in case
+        the account was upgraded.
+        """
+        self.ensure_one()
+        return (
+            self.fintoc_payment_intent_support != 'unsupported'
+            or self._fintoc_is_payment_intent_support_expired()
+        )
+
+    def _fintoc_is_payment_intent_support_expired(self):
+        self.ensure_one()
+        expiry_date = fields.Datetime.subtract(
+            fields.Datetime.now(), hours=const.PAYMENT_INTENT_SUPPORT_TTL_HOURS
+        )
+        return (
+            not self.fintoc_payment_intent_support_date
+            or self.fintoc_payment_intent_support_date < expiry_date
+        )
+
+    def _fintoc_set_payment_intent_support(self, supported):
+        """Remember whether the account supports payment_intent.
+
+        The support is only written when it changes or expired, so that the checkouts of customers
+        do not write it every time.
+        """
+        self.ensure_one()
+        support = 'supported' if supported else 'unsupported'
+        if (
+            self.fintoc_payment_intent_support != support
+            or self._fintoc_is_payment_intent_support_expired()
+        ):
+            self.env['payment.fintoc.capability'].sudo()._learn(
+                self, 'payment_intent_support', support
+            )
+
+    def _fintoc_reset_api_capabilities(self):
+        self.env['payment.fintoc.capability'].sudo().search([
+            ('provider_id', 'in', self.ids),
+        ]).unlink()
+        capability_fields = list(const.API_CAPABILITY_FIELDS.values())
+        self.invalidate_recordset(
+            capability_fields + [f'{field_name}_date' for field_name in capability_fields]
+        )
+
+    def action_fintoc_reset_api_capabilities(self):
+        """Forget the API capabilities learned from the Fintoc account."""
+        self._fintoc_reset_api_capabilities()
+
     @staticmethod
     def _fintoc_should_retry_checkout_with_v1(status_code, response_data):
         if status_code in (404, 405, 410):
@@ -405,7 +691,7 @@ class PaymentProvider(models.Model):
     def _fintoc_get_webhook_endpoint_url(self):
         self.ensure_one()
         return self.fintoc_webhook_endpoint_url or urls.url_join(
-            self.get_base_url(), const.WEBHOOK_ROUTE
+            self.get_base_url(), f'{const.WEBHOOK_ROUTE}/{self.id}'
         )
 
     def _fintoc_get_webhook_registration_payload(self):
@@ -439,59 +725,89 @@ class PaymentProvider(models.Model):
         if not webhook_url.startswith('https://'):
             raise UserError(_("Webhook Endpoint URL must start with https://"))
 
-        payload = self._fintoc_get_webhook_registration_payload()
-        response_data = None
-
-        if self.fintoc_webhook_endpoint_id:
-            status_code, response = self._fintoc_make_request_raw(
-                endpoint=f'/v1/webhook_endpoints/{self.fintoc_webhook_endpoint_id}',
-                payload=payload,
-                method='PUT',
-            )
-            if status_code < 400:
-                response_data = response
-            elif status_code == 404:
-                response_data = self._fintoc_make_request(
-                    endpoint='/v1/webhook_endpoints',
-                    payload=payload,
-                    method='POST',
-                )
-            else:
-                raise ValidationError(FintocApiClient._build_http_error_message(status_code, response))
-        else:
-            response_data = self._fintoc_make_request(
-                endpoint='/v1/webhook_endpoints',
-                payload=payload,
-                method='POST',
-            )
-
-        webhook_endpoint_id = response_data.get('id') or response_data.get('data', {}).get('id')
-        if not webhook_endpoint_id:
-            raise ValidationError(_(
-                "Fintoc did not return a webhook endpoint ID. Please verify your credentials."
-            ))
-
-        self.write({
-            'fintoc_webhook_endpoint_id': webhook_endpoint_id,
-            'fintoc_webhook_endpoint_url': webhook_url,
-            'fintoc_webhook_last_sync': fields.Datetime.now(),
-        })
-
+        outbox_model = self.env['payment.fintoc.outbox']
+        if not outbox_model.sudo().search_count([
+            ('provider_id', '=', self.id),
+            ('operation', '=', 'webhook_registration'),
+            ('state', '=', 'pending'),
+        ], limit=1):
+            outbox_model._enqueue('webhook_registration', self)
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': _("Webhook synchronized"),
-                'message': _("Webhook endpoint was registered/updated successfully in Fintoc."),
+                'title': _("Webhook synchronization queued"),
+                'message': _(
+                    "The webhook endpoint will be registered/updated in Fintoc in a moment."
+                ),
                 'type': 'success',
                 'sticky': False,
             }
         }
 
-    def _fintoc_validate_webhook_signature(self, signature_header, raw_body):
-        """Validate Fintoc webhook signature with constant-time compare."""
+    def _fintoc_get_webhook_secrets(self):
+        """Return the current webhook secret followed by the secrets still accepted in rotation."""
+        self.ensure_one()
+        secrets = [self.fintoc_webhook_secret] if self.fintoc_webhook_secret else []
+        for secret in (self.fintoc_webhook_previous_secrets or '').splitlines():
+            secret = secret.strip()
+            if secret and secret not in secrets:
+                secrets.append(secret)
+        return secrets
+
+    @api.model
+    @tools.ormcache('provider_id')
+    def _fintoc_get_webhook_key(self, provider_id):
+        """Return the webhook secrets and timestamp tolerance of a Fintoc provider.
+
+        The keys are cached per process and invalidated whenever a provider field they depend on is
+        written, so verifying a webhook does not need any query.
+
+        :param int provider_id: The id of the provider.
+        :return: The secrets and the timestamp tolerance, or None if the provider has no secret.
+        :rtype: tuple|None
+        """
+        provider = self.sudo().browse(provider_id).exists()
+        if provider.code != 'fintoc' or not provider.fintoc_webhook_secret:
+            return None
+        return (
+            tuple(provider._fintoc_get_webhook_secrets()),
+            provider.fintoc_webhook_tolerance or const.DEFAULT_WEBHOOK_TOLERANCE_SECONDS,
+        )
+
+    @api.model
+    def _fintoc_get_webhook_provider(self, event_payload):
+        """Return the Fintoc provider expected to have signed a webhook of the generic route.
+
+        The provider is the one of the transaction the event relates to. Events that cannot be
+        related to a transaction can only be attributed when there is a single Fintoc provider.
+
+        :param dict event_payload: The unverified event payload.
+        :return: The provider, or an empty recordset if it cannot be determined.
+        :rtype: recordset of `payment.provider`
+        """
+        notification_data = self.env['payment.fintoc.event']._build_notification_data(
+            event_payload
+        )
+        tx = self.env['payment.transaction'].sudo()._fintoc_get_txs_from_notifications(
+            {0: notification_data}
+        ).get(0)
+        if tx:
+            return tx.provider_id.filtered(lambda p: p.code == 'fintoc')
+        providers = self.sudo().search([('code', '=', 'fintoc')], limit=2)
+        return providers if len(providers) == 1 else self.browse()
+
+    def _fintoc_validate_webhook_signature(self, signature_header, body_text):
+        """Validate Fintoc webhook signature with constant-time compare.
+
+        :param str signature_header: The value of the `Fintoc-Signature` header.
+        :param str body_text: The decoded raw body of the webhook.
+        :return: Whether the webhook was signed with one of the secrets of the provider.
+        :rtype: bool
+        """
         self.ensure_one()
-        if not self.fintoc_webhook_secret or not signature_header:
+        webhook_key = self._fintoc_get_webhook_key(self.id)
+        if not webhook_key or not signature_header:
             return False
 
         timestamp, signatures = self._fintoc_extract_signature_parts(signature_header)
@@ -503,25 +819,26 @@ class PaymentProvider(models.Model):
         except (TypeError, ValueError):
             return False
 
-        tolerance = self.fintoc_webhook_tolerance or const.DEFAULT_WEBHOOK_TOLERANCE_SECONDS
+        secrets, tolerance = webhook_key
         if abs(int(time.time()) - timestamp_int) > tolerance:
             _logger.warning(
                 "Ignoring Fintoc webhook with outdated timestamp for provider %s", self.id
             )
             return False
 
-        try:
-            body_text = raw_body.decode('utf-8')
-        except UnicodeDecodeError:
-            return False
-
         signed_payload = f"{timestamp}.{body_text}".encode('utf-8')
+        return any(
+            self._fintoc_signature_matches(secret, signed_payload, signatures)
+            for secret in secrets
+        )
+
+    @staticmethod
+    def _fintoc_signature_matches(secret, signed_payload, signatures):
         expected_signature = hmac.new(
-            self.fintoc_webhook_secret.encode('utf-8'),
+            secret.encode('utf-8'),
             signed_payload,
             hashlib.sha256,
         ).hexdigest()
-
         return any(hmac.compare_digest(sig, expected_signature) for sig in signatures)
 
     @staticmethod
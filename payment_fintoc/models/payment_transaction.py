@@ -1,15 +1,22 @@
 import copy
 import logging
+import time
 import uuid
+from datetime import datetime, timezone
 
+import psycopg2
 from werkzeug import urls
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
+from odoo.modules import module
+from odoo.osv import expression
 from odoo.tools.misc import hmac as hmac_tool
 
 from odoo.addons.payment import utils as payment_utils
-from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc import const, tracing
+from odoo.addons.payment_fintoc.metrics import METRICS
+from odoo.addons.payment_fintoc.models.fintoc_api import FintocApiClient
 
 _logger = logging.getLogger(__name__)
 
@@ -17,10 +24,13 @@ _logger = logging.getLogger(__name__)
 class PaymentTransaction(models.Model):
     _inherit = 'payment.transaction'
 
+    # Indexed to resolve the transactions of Fintoc notifications without sequential scans.
+    provider_reference = fields.Char(index='btree_not_null')
     fintoc_checkout_session_id = fields.Char(
         string="Fintoc Checkout Session ID",
         readonly=True,
         copy=False,
+        index='btree_not_null',
     )
     fintoc_redirect_url = fields.Char(
         string="Fintoc Redirect URL",
@@ -31,11 +41,13 @@ class PaymentTransaction(models.Model):
         string="Fintoc Payment Intent ID",
         readonly=True,
         copy=False,
+        index='btree_not_null',
     )
     fintoc_refund_id = fields.Char(
         string="Fintoc Refund ID",
         readonly=True,
         copy=False,
+        index='btree_not_null',
     )
     fintoc_checkout_attempt = fields.Integer(
         string="Fintoc Checkout Attempt",
@@ -43,6 +55,45 @@ class PaymentTransaction(models.Model):
         copy=False,
         default=0,
     )
+    fintoc_checkout_session_date = fields.Datetime(
+        string="Fintoc Checkout Session Date",
+        readonly=True,
+        copy=False,
+    )
+    fintoc_last_event_type = fields.Char(
+        string="Fintoc Last Event",
+        help="The last Fintoc event applied to the transaction; older events are ignored.",
+        readonly=True,
+        copy=False,
+    )
+    fintoc_last_event_date = fields.Datetime(
+        string="Fintoc Last Event Date",
+        readonly=True,
+        copy=False,
+    )
+    fintoc_reconcile_count = fields.Integer(
+        string="Fintoc Reconciliation Checks",
+        readonly=True,
+        copy=False,
+    )
+    fintoc_reconcile_next_date = fields.Datetime(
+        string="Fintoc Next Reconciliation",
+        help="The transaction is not checked by the reconciliation cron before this date.",
+        readonly=True,
+        copy=False,
+    )
+
+    # === CRUD METHODS === #
+
+    @api.model_create_multi
+    def create(self, values_list):
+        txs = super().create(values_list)
+        txs._fintoc_mark_written_by_request()
+        return txs
+
+    def write(self, values):
+        self._fintoc_mark_written_by_request()
+        return super().write(values)
 
     # === BUSINESS METHODS === #
 
@@ -52,13 +103,30 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'fintoc':
             return res
 
-        # Always create a fresh checkout session: Fintoc checkout links are one-time use.
-        checkout_attempt = (self.fintoc_checkout_attempt or 0) + 1
-        payload = self._fintoc_prepare_checkout_payload()
-        session_data = self._fintoc_create_checkout_session_with_fallback(
-            payload,
-            checkout_attempt,
-        )
+        with tracing.start_trace(self.env, 'fintoc.checkout_render', reference=self.reference):
+            session_values = self._fintoc_join_or_create_checkout_session()
+            if not session_values:
+                session_values = self._fintoc_create_checkout_session_values(
+                    (self.fintoc_checkout_attempt or 0) + 1
+                )
+                with tracing.span('write'):
+                    self.write(session_values)
+                    self.flush_recordset(list(session_values))
+        return {'api_url': session_values['fintoc_redirect_url']}
+
+    def _fintoc_create_checkout_session_values(self, checkout_attempt):
+        """Create a fresh checkout session and return the values to write on the transaction.
+
+        A fresh checkout session is always created: Fintoc checkout links are one-time use.
+        """
+        self.ensure_one()
+        with tracing.span('prepare_payload'):
+            payload = self._fintoc_prepare_checkout_payload()
+        with tracing.span('create_checkout_session'):
+            session_data = self._fintoc_create_checkout_session_with_fallback(
+                payload,
+                checkout_attempt,
+            )
 
         checkout_session_id = session_data.get('id')
         redirect_url = session_data.get('redirect_url')
@@ -66,14 +134,130 @@ class PaymentTransaction(models.Model):
             raise ValidationError(_(
                 "Fintoc did not return checkout session data (id/redirect_url)."
             ))
-
-        self.write({
+        return {
             'fintoc_checkout_session_id': checkout_session_id,
             'fintoc_redirect_url': redirect_url,
             'provider_reference': checkout_session_id,
             'fintoc_checkout_attempt': checkout_attempt,
-        })
-        return {'api_url': redirect_url}
+            'fintoc_checkout_session_date': fields.Datetime.now(),
+        }
+
+    def _fintoc_join_or_create_checkout_session(self):
+        """Create the checkout session of the transaction, unless a concurrent render just did.
+
+        Renders of a same transaction (double clicks, re-rendered redirect forms) are coalesced:
+        the session is created while holding the row lock of the transaction, in a dedicated
+        committed cursor, and a render that waited for that lock reuses the session created after
+        its own request started instead of calling Fintoc again. The request's own transaction
+        never writes the row, which avoids serialization failures between the renders.
+
+        Renders only wait briefly for the lock: a render that times out reuses the session if it
+        was committed meanwhile, and otherwise asks the customer to retry rather than holding a
+        worker while the concurrent render calls Fintoc.
+
+        Transactions created or written by the current request cannot be rendered concurrently
+        (and are locked by it), so they are left to the caller.
+
+        :return: The session values of the transaction, or None if the caller must create them.
+        :rtype: dict
+        :raise ValidationError: If a concurrent render is still creating the session.
+        """
+        self.ensure_one()
+        request_start = self._fintoc_get_request_start()
+        if not request_start:
+            return None
+
+        try:
+            with self.env.registry.cursor() as cr, tracing.span('singleflight'):
+                if not self.env.registry.in_test_mode():
+                    cr.execute('SET TRANSACTION ISOLATION LEVEL READ COMMITTED')
+                    cr.execute(
+                        "SELECT set_config('lock_timeout', %s, true)",
+                        (f'{const.CHECKOUT_SINGLEFLIGHT_LOCK_TIMEOUT}s',),
+                    )
+                session_values, attempt = self._fintoc_read_checkout_session(
+                    cr, request_start, lock=True
+                )
+                if not session_values:
+                    tx = self.with_env(self.env(cr=cr))
+                    session_values = tx._fintoc_create_checkout_session_values((attempt or 0) + 1)
+                    # Use the clock of the database, as for the start of the requests.
+                    cr.execute("SELECT clock_timestamp() AT TIME ZONE 'UTC'")
+                    session_values['fintoc_checkout_session_date'] = cr.fetchone()[0]
+                    with tracing.span('write'):
+                        tx.write(session_values)
+                        tx.flush_recordset(list(session_values))
+        except psycopg2.errors.LockNotAvailable:
+            with self.env.registry.cursor() as cr:
+                session_values = self._fintoc_read_checkout_session(cr, request_start)[0]
+            if not session_values:
+                _logger.warning(
+                    "Timeout waiting for a concurrent Fintoc checkout of tx %s", self.reference
+                )
+                raise ValidationError(_(
+                    "The payment is already being prepared. Please try again in a moment."
+                ))
+        self.invalidate_recordset(list(session_values))
+        return session_values
+
+    def _fintoc_read_checkout_session(self, cr, request_start, lock=False):
+        """Read the checkout session created by a concurrent render of the transaction.
+
+        :param cr: The dedicated cursor to read the committed transaction with.
+        :param datetime request_start: The start of the current request, in UTC.
+        :param bool lock: Whether to lock the row of the transaction.
+        :return: The session values, or None if no session was created after the request started,
+                 and the current checkout attempt.
+        :rtype: tuple
+        """
+        cr.execute(
+            f"""
+            SELECT fintoc_checkout_session_id,
+                   fintoc_redirect_url,
+                   fintoc_checkout_session_date >= %s,
+                   fintoc_checkout_attempt
+              FROM payment_transaction
+             WHERE id = %s
+             {'FOR NO KEY UPDATE' if lock else ''}
+            """,
+            (request_start, self.id),
+        )
+        checkout_session_id, redirect_url, is_concurrent, attempt = cr.fetchone()
+        if not (checkout_session_id and redirect_url and is_concurrent):
+            return None, attempt
+
+        METRICS.inc('fintoc_checkout_sessions_coalesced_total')
+        _logger.info(
+            "Reusing the Fintoc checkout session of a concurrent render of tx %s", self.reference
+        )
+        return {
+            'fintoc_checkout_session_id': checkout_session_id,
+            'fintoc_redirect_url': redirect_url,
+        }, attempt
+
+    def _fintoc_mark_written_by_request(self):
+        """Remember that the database transaction of the current request wrote the transactions.
+
+        The ids are kept in the postcommit data of the cursor, which lives until the commit or the
+        rollback of the transaction; unlike the precommit data, it is not cleared by the flushes
+        of savepoints. Writes still pending in the ORM cache and writes made in savepoints are thus
+        included.
+        """
+        self.env.cr.postcommit.data.setdefault(
+            'payment_fintoc.written_tx_ids', set()
+        ).update(self.ids)
+
+    def _fintoc_get_request_start(self):
+        """Return when the current request started, or None if it created or wrote the transaction.
+
+        :return: The start of the database transaction of the request, in UTC.
+        :rtype: datetime
+        """
+        self.ensure_one()
+        if self.id in self.env.cr.postcommit.data.get('payment_fintoc.written_tx_ids', ()):
+            return None
+        self.env.cr.execute("SELECT NOW() AT TIME ZONE 'UTC'")
+        return self.env.cr.fetchone()[0]
 
     def _fintoc_prepare_checkout_payload(self):
         """Build checkout session payload for Fintoc."""
@@ -192,33 +376,62 @@ class PaymentTransaction(models.Model):
         ))
 
     def _fintoc_create_checkout_session_with_fallback(self, payload, checkout_attempt):
-        """Create checkout session with automatic payment_intent fallback handling."""
+        """Create checkout session with automatic payment_intent fallback handling.
+
+        Whether the account supports payment_intent is learned once and remembered on the provider,
+        so that the first attempt of later checkouts already uses the right payment methods. All the
+        attempts share the checkout deadline of the provider.
+        """
         self.ensure_one()
-        idempotency_key = self._fintoc_build_checkout_idempotency_key('checkout', checkout_attempt)
+        provider = self.provider_id
+        deadline = provider._fintoc_new_deadline('checkout')
+        uses_payment_intent = self._fintoc_payload_uses_payment_intent(payload)
+        if uses_payment_intent and not provider._fintoc_supports_payment_intent():
+            return self._fintoc_create_payment_initiation_checkout_session(
+                payload, checkout_attempt, deadline
+            )
 
+        idempotency_key = self._fintoc_build_checkout_idempotency_key('checkout', checkout_attempt)
         try:
-            return self.provider_id._fintoc_create_checkout_session(payload, idempotency_key)
+            session_data = provider._fintoc_create_checkout_session(
+                payload, idempotency_key, deadline=deadline
+            )
         except ValidationError as error:
             if (
-                not self._fintoc_payload_uses_payment_intent(payload)
+                not uses_payment_intent
                 or not self._fintoc_should_fallback_to_payment_initiation(error)
             ):
                 raise
 
-            fallback_payload = self._fintoc_replace_payment_intent_with_payment_initiation(payload)
-            fallback_idempotency_key = self._fintoc_build_checkout_idempotency_key(
-                'checkout-payment-initiation-fallback',
-                checkout_attempt,
-            )
+            provider._fintoc_set_payment_intent_support(False)
+            METRICS.inc('fintoc_checkout_fallback_total', {'fallback': 'payment_initiation'})
             _logger.info(
                 "Retrying Fintoc checkout with payment_initiation fallback for tx %s",
                 self.reference,
             )
-            return self.provider_id._fintoc_create_checkout_session(
-                fallback_payload,
-                fallback_idempotency_key,
+            return self._fintoc_create_payment_initiation_checkout_session(
+                payload, checkout_attempt, deadline
             )
 
+        if uses_payment_intent:
+            provider._fintoc_set_payment_intent_support(True)
+        return session_data
+
+    def _fintoc_create_payment_initiation_checkout_session(
+        self, payload, checkout_attempt, deadline
+    ):
+        self.ensure_one()
+        fallback_payload = self._fintoc_replace_payment_intent_with_payment_initiation(payload)
+        fallback_idempotency_key = self._fintoc_build_checkout_idempotency_key(
+            'checkout-payment-initiation-fallback',
+            checkout_attempt,
+        )
+        return self.provider_id._fintoc_create_checkout_session(
+            fallback_payload,
+            fallback_idempotency_key,
+            deadline=deadline,
+        )
+
     def _fintoc_build_checkout_idempotency_key(self, suffix, checkout_attempt):
         """Build a per-attempt idempotency key to avoid reusing expired checkout sessions."""
         self.ensure_one()
@@ -268,6 +481,20 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'fintoc':
             return refund_tx
 
+        # The refund request is recorded in the outbox along with the refund transaction, and sent
+        # by the outbox dispatcher once committed.
+        self.env['payment.fintoc.outbox']._enqueue(
+            'refund',
+            refund_tx.provider_id,
+            transaction=refund_tx,
+            payload=self._fintoc_prepare_refund_payload(amount_to_refund),
+            idempotency_key=refund_tx.reference,
+        )
+        return refund_tx
+
+    def _fintoc_prepare_refund_payload(self, amount_to_refund=None):
+        """Build the refund request payload of the source transaction."""
+        self.ensure_one()
         if not self.fintoc_payment_intent_id:
             raise UserError(_(
                 "Cannot create Fintoc refund because payment_intent_id is missing on the source "
@@ -283,59 +510,245 @@ class PaymentTransaction(models.Model):
                 amount_to_refund,
                 self.currency_id,
             )
+        return payload
 
-        response_data = refund_tx.provider_id._fintoc_make_request(
-            endpoint='/v1/refunds',
-            payload=payload,
-            method='POST',
-            idempotency_key=refund_tx.reference,
-        )
-
+    def _fintoc_apply_refund_response(self, response_data):
+        """Update the refund transaction from the response of the refund request."""
+        self.ensure_one()
         refund_id = response_data.get('id')
         if not refund_id:
             raise ValidationError(_("Fintoc did not return a refund ID."))
 
-        refund_tx.write({
+        self.write({
             'fintoc_refund_id': refund_id,
-            'fintoc_payment_intent_id': self.fintoc_payment_intent_id,
+            'fintoc_payment_intent_id': self.source_transaction_id.fintoc_payment_intent_id,
             'provider_reference': refund_id,
         })
 
         refund_status = (response_data.get('status') or '').lower()
         if refund_status in ('succeeded', 'done', 'success'):
-            refund_tx._set_done()
+            self._set_done()
         elif refund_status in ('failed', 'rejected', 'error'):
-            refund_tx._set_error(_("Fintoc reported an immediate refund failure."))
+            self._set_error(_("Fintoc reported an immediate refund failure."))
         else:
-            refund_tx._set_pending()
+            self._set_pending()
+
+    def action_fintoc_bulk_refund(self):
+        """Refund the selected Fintoc payments in full.
+
+        The refund transactions are created right away and their requests are recorded in the
+        outbox, whose dispatcher sends them to Fintoc in the background, concurrently.
+        """
+        source_txs = self.filtered(
+            lambda tx: tx.provider_code == 'fintoc'
+            and tx.operation != 'refund'
+            and tx.state == 'done'
+            and tx.fintoc_payment_intent_id
+        )
+        refunded_amounts = dict(self._read_group(
+            [
+                ('source_transaction_id', 'in', source_txs.ids),
+                ('operation', '=', 'refund'),
+                ('state', 'not in', ('cancel', 'error')),
+            ],
+            groupby=['source_transaction_id'],
+            aggregates=['amount:sum'],
+        ))
 
-        return refund_tx
+        refund_txs = self.browse()
+        for source_tx in source_txs:
+            # Refund transactions have negative amounts.
+            amount_to_refund = source_tx.amount + refunded_amounts.get(source_tx, 0.0)
+            if source_tx.currency_id.compare_amounts(amount_to_refund, 0) <= 0:
+                continue
+            refund_txs |= source_tx._send_refund_request(amount_to_refund=amount_to_refund)
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Refunds queued"),
+                'message': _(
+                    "%(count)s Fintoc refunds were queued and will be sent in the background.",
+                    count=len(refund_txs),
+                ),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    @api.model
+    def _cron_fintoc_reconcile_stale_transactions(self):
+        """Fetch the status of the Fintoc transactions still waiting for a webhook.
+
+        Draft and pending transactions older than the minimum age (but younger than the maximum age)
+        are selected page by page, the least recently checked first. Their Fintoc resource is
+        fetched concurrently and its status is fed to `_process_notification_data`, exactly as if
+        the missed webhook had been received. The transactions still waiting are checked again
+        after an exponential backoff, so that abandoned checkouts do not starve the others. Each
+        page is committed, and a run stops after the maximum number of API requests.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        min_age = int(ICP.get_param(
+            const.RECONCILE_MIN_AGE_MINUTES_PARAM, const.DEFAULT_RECONCILE_MIN_AGE_MINUTES
+        ))
+        max_age = int(ICP.get_param(
+            const.RECONCILE_MAX_AGE_DAYS_PARAM, const.DEFAULT_RECONCILE_MAX_AGE_DAYS
+        ))
+        page_size = int(ICP.get_param(
+            const.RECONCILE_PAGE_SIZE_PARAM, const.DEFAULT_RECONCILE_PAGE_SIZE
+        ))
+        max_requests = int(ICP.get_param(
+            const.RECONCILE_MAX_REQUESTS_PARAM, const.DEFAULT_RECONCILE_MAX_REQUESTS
+        ))
+        concurrency = int(ICP.get_param(
+            const.RECONCILE_CONCURRENCY_PARAM, const.DEFAULT_RECONCILE_CONCURRENCY
+        ))
+
+        now = fields.Datetime.now()
+        domain = [
+            ('provider_code', '=', 'fintoc'),
+            ('state', 'in', ('draft', 'pending')),
+            ('create_date', '<=', fields.Datetime.subtract(now, minutes=min_age)),
+            ('create_date', '>=', fields.Datetime.subtract(now, days=max_age)),
+            '|',
+            ('fintoc_reconcile_next_date', '=', False),
+            ('fintoc_reconcile_next_date', '<=', now),
+            '|', '|',
+            ('fintoc_refund_id', '!=', False),
+            ('fintoc_payment_intent_id', '!=', False),
+            ('fintoc_checkout_session_id', '!=', False),
+        ]
+        while max_requests > 0:
+            txs = self.search(
+                domain,
+                order='fintoc_reconcile_next_date ASC NULLS FIRST, id',
+                limit=min(page_size, max_requests),
+            )
+            if not txs:
+                return
+            max_requests -= len(txs)
+            txs._fintoc_reconcile(concurrency)
+            txs.filtered(
+                lambda tx: tx.state in ('draft', 'pending')
+            )._fintoc_postpone_reconciliation()
+            if module.current_test:
+                return
+            self.env.cr.commit()
+
+    def _fintoc_reconcile(self, concurrency):
+        """Fetch the Fintoc resources of the transactions and process their current status."""
+        clients = {}
+        api_requests, status_events = [], []
+        txs = self.browse()
+        for tx in self:
+            endpoint, status_event_mapping = tx._fintoc_get_reconciliation_endpoint()
+            if not endpoint:
+                continue
+            if tx.provider_id not in clients:
+                try:
+                    clients[tx.provider_id] = tx.provider_id._fintoc_get_api_client()
+                except UserError:
+                    continue
+            txs |= tx
+            api_requests.append((clients[tx.provider_id], {'method': 'GET', 'endpoint': endpoint}))
+            status_events.append(status_event_mapping)
+
+        results = FintocApiClient.request_raw_concurrently(api_requests, concurrency)
+        event_model = self.env['payment.fintoc.event']
+        for tx, status_event_mapping, result in zip(txs, status_events, results):
+            if isinstance(result, ValidationError):
+                continue  # Fintoc is unreachable; the next run will retry.
+            status_code, resource = result
+            if status_code >= 400:
+                _logger.warning(
+                    "Unable to reconcile Fintoc tx %s (HTTP %s)", tx.reference, status_code
+                )
+                continue
+            event_type = status_event_mapping.get((resource.get('status') or '').lower())
+            if not event_type:
+                continue  # The resource has no final status yet.
+
+            notification_data = event_model._build_notification_data(
+                {'type': event_type, 'data': resource}
+            )
+            try:
+                with self.env.cr.savepoint():
+                    tx._process_notification_data(notification_data)
+                    tx._execute_callback()
+            except ValidationError:
+                _logger.exception("Unable to reconcile Fintoc tx %s", tx.reference)
+                continue
+            _logger.info("Reconciled Fintoc tx %s from a missed %s event", tx.reference, event_type)
+
+    def _fintoc_postpone_reconciliation(self):
+        """Schedule the next reconciliation of the transactions with an exponential backoff."""
+        now = fields.Datetime.now()
+        for count, txs in self.grouped('fintoc_reconcile_count').items():
+            backoff = min(
+                const.RECONCILE_BACKOFF_MINUTES * 2 ** count, const.RECONCILE_MAX_BACKOFF_MINUTES
+            )
+            txs.write({
+                'fintoc_reconcile_count': count + 1,
+                'fintoc_reconcile_next_date': fields.Datetime.add(now, minutes=backoff),
+            })
+
+    def _fintoc_get_reconciliation_endpoint(self):
+        """Return the endpoint of the Fintoc resource reflecting the status of the transaction.
+
+        :return: The endpoint and the mapping of the resource statuses to webhook event types, or
+                 (None, None) if the transaction cannot be reconciled.
+        :rtype: tuple(str, dict)
+        """
+        self.ensure_one()
+        if self.operation == 'refund':
+            if not self.fintoc_refund_id:
+                return None, None
+            return f'/v1/refunds/{self.fintoc_refund_id}', const.REFUND_STATUS_EVENTS
+        if self.fintoc_payment_intent_id:
+            return (
+                f'/v1/payment_intents/{self.fintoc_payment_intent_id}',
+                const.PAYMENT_INTENT_STATUS_EVENTS,
+            )
+        api_version = self.provider_id.fintoc_checkout_api_version or 'v2'
+        return (
+            f'/{api_version}/checkout_sessions/{self.fintoc_checkout_session_id}',
+            const.CHECKOUT_SESSION_STATUS_EVENTS,
+        )
 
     def action_fintoc_cancel_refund(self):
-        """Cancel a pending Fintoc refund from Odoo."""
+        """Cancel a pending Fintoc refund from Odoo.
+
+        The cancellation is sent through the outbox, after the refund request itself if that one
+        is still waiting to be delivered.
+        """
         self.ensure_one()
 
         if self.provider_code != 'fintoc' or self.operation != 'refund':
             raise UserError(_("This action is only available for Fintoc refund transactions."))
         if self.state not in ('draft', 'pending'):
             raise UserError(_("Only draft/pending refunds can be cancelled."))
-        if not self.fintoc_refund_id:
+        outbox_model = self.env['payment.fintoc.outbox']
+        pending_messages = outbox_model.sudo().search([
+            ('transaction_id', '=', self.id), ('state', '=', 'pending'),
+        ])
+        if not self.fintoc_refund_id and 'refund' not in pending_messages.mapped('operation'):
             raise UserError(_("No Fintoc refund ID found on this transaction."))
+        if 'refund_cancel' in pending_messages.mapped('operation'):
+            raise UserError(_("The cancellation of this refund is already waiting to be sent."))
 
-        self.provider_id._fintoc_make_request(
-            endpoint=f'/v1/refunds/{self.fintoc_refund_id}/cancel',
-            payload={},
-            method='POST',
+        outbox_model._enqueue(
+            'refund_cancel',
+            self.provider_id,
+            transaction=self,
             idempotency_key=f'cancel-{self.reference}',
         )
-        self._set_canceled(state_message=_("Refund cancellation requested in Fintoc."))
-
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': _("Refund cancellation requested"),
-                'message': _("Fintoc received the refund cancellation request."),
+                'message': _("The refund cancellation will be sent to Fintoc in a moment."),
                 'type': 'success',
                 'sticky': False,
             }
@@ -347,51 +760,157 @@ class PaymentTransaction(models.Model):
         if provider_code != 'fintoc' or len(tx) == 1:
             return tx
 
-        refund_id = notification_data.get('refund_id')
-        if refund_id:
-            tx = self.search([
-                ('provider_code', '=', 'fintoc'),
+        tx = self._fintoc_get_txs_from_notifications({0: notification_data}).get(0)
+        if tx:
+            return tx
+
+        raise ValidationError(_(
+            "Fintoc: no transaction could be matched from webhook notification data."
+        ))
+
+    @api.model
+    def _fintoc_get_txs_from_notifications(self, notification_data_by_key):
+        """Resolve the transactions of several Fintoc notifications with a single query.
+
+        All candidate identifiers are looked up at once through the indexed Fintoc identifier
+        columns, then each notification is matched with a deterministic priority: refund id, then
+        Odoo reference, then payment intent id, then checkout session id. Among several matches of a
+        same identifier, the most recent transaction wins.
+
+        :param dict notification_data_by_key: The normalized notification data, by arbitrary key.
+        :return: The matched transaction, by key of the notifications that could be matched.
+        :rtype: dict
+        """
+        start = time.monotonic()
+        refund_ids, references, payment_intent_ids, checkout_session_ids = set(), set(), set(), set()
+        for notification_data in notification_data_by_key.values():
+            if notification_data.get('refund_id'):
+                refund_ids.add(notification_data['refund_id'])
+            reference = notification_data.get('odoo_tx_reference') or notification_data.get('reference')
+            if reference:
+                references.add(reference)
+            if notification_data.get('payment_intent_id'):
+                payment_intent_ids.add(notification_data['payment_intent_id'])
+            if notification_data.get('checkout_session_id'):
+                checkout_session_ids.add(notification_data['checkout_session_id'])
+
+        domains = []
+        if refund_ids:
+            domains.append([
                 ('operation', '=', 'refund'),
                 '|',
-                ('fintoc_refund_id', '=', refund_id),
-                ('provider_reference', '=', refund_id),
-            ], limit=1)
-            if tx:
-                return tx
-
-        reference = notification_data.get('odoo_tx_reference') or notification_data.get('reference')
-        if reference:
-            tx = self.search([
-                ('reference', '=', reference),
-                ('provider_code', '=', 'fintoc'),
-            ], limit=1)
-            if tx:
-                return tx
-
-        payment_intent_id = notification_data.get('payment_intent_id')
-        if payment_intent_id:
-            tx = self.search([
-                ('provider_code', '=', 'fintoc'),
+                ('fintoc_refund_id', 'in', list(refund_ids)),
+                ('provider_reference', 'in', list(refund_ids)),
+            ])
+        if references:
+            domains.append([('reference', 'in', list(references))])
+        if payment_intent_ids:
+            domains.append([
                 ('operation', '!=', 'refund'),
                 '|',
-                ('fintoc_payment_intent_id', '=', payment_intent_id),
-                ('provider_reference', '=', payment_intent_id),
-            ], limit=1)
+                ('fintoc_payment_intent_id', 'in', list(payment_intent_ids)),
+                ('provider_reference', 'in', list(payment_intent_ids)),
+            ])
+        if checkout_session_ids:
+            domains.append([('fintoc_checkout_session_id', 'in', list(checkout_session_ids))])
+        if not domains:
+            return {}
+
+        txs = self.search(
+            expression.AND([[('provider_code', '=', 'fintoc')], expression.OR(domains)]),
+            order='id desc',
+        )
+        refund_txs = txs.filtered(lambda t: t.operation == 'refund')
+        payment_txs = txs - refund_txs
+        tx_by_refund_id, tx_by_reference, tx_by_payment_intent_id, tx_by_checkout_session_id = (
+            {}, {}, {}, {}
+        )
+        for tx in txs:
+            tx_by_reference.setdefault(tx.reference, tx)
+            if tx.fintoc_checkout_session_id:
+                tx_by_checkout_session_id.setdefault(tx.fintoc_checkout_session_id, tx)
+        for tx in refund_txs:
+            for refund_id in (tx.fintoc_refund_id, tx.provider_reference):
+                if refund_id:
+                    tx_by_refund_id.setdefault(refund_id, tx)
+        for tx in payment_txs:
+            for payment_intent_id in (tx.fintoc_payment_intent_id, tx.provider_reference):
+                if payment_intent_id:
+                    tx_by_payment_intent_id.setdefault(payment_intent_id, tx)
+
+        tx_by_key = {}
+        for key, notification_data in notification_data_by_key.items():
+            reference = notification_data.get('odoo_tx_reference') or notification_data.get('reference')
+            tx = (
+                tx_by_refund_id.get(notification_data.get('refund_id'))
+                or tx_by_reference.get(reference)
+                or tx_by_payment_intent_id.get(notification_data.get('payment_intent_id'))
+                or tx_by_checkout_session_id.get(notification_data.get('checkout_session_id'))
+            )
             if tx:
-                return tx
+                tx_by_key[key] = tx
+        METRICS.observe('fintoc_tx_lookup_duration_seconds', time.monotonic() - start)
+        return tx_by_key
+
+    def _fintoc_is_stale_event(self, event_type, event_date):
+        """Return whether an event is older than the last event applied to the transaction.
+
+        An event is stale if it moves the Fintoc resource back (e.g. `refund.in_progress` after
+        `refund.succeeded`, `checkout_session.finished` after `payment_intent.succeeded`), or if it
+        is a final state that is older than the final state already applied, or undated. Replayed
+        events are thus ignored without any write, while a final state created in the same instant
+        as the applied one, but of another type, is applied.
+
+        :param str event_type: The type of the event.
+        :param datetime event_date: The creation date of the event in Fintoc, if known.
+        :rtype: bool
+        """
+        self.ensure_one()
+        rank = const.EVENT_STATE_RANKS.get(event_type)
+        last_rank = const.EVENT_STATE_RANKS.get(self.fintoc_last_event_type)
+        if rank is None or last_rank is None or rank > last_rank:
+            return False
+        if rank < last_rank:
+            return True
+        if not event_date:
+            return True
+        if self.fintoc_last_event_date and event_date != self.fintoc_last_event_date:
+            return event_date < self.fintoc_last_event_date
+        return event_type == self.fintoc_last_event_type
 
-        checkout_session_id = notification_data.get('checkout_session_id')
-        if checkout_session_id:
-            tx = self.search([
-                ('provider_code', '=', 'fintoc'),
-                ('fintoc_checkout_session_id', '=', checkout_session_id),
-            ], limit=1)
-            if tx:
-                return tx
+    @staticmethod
+    def _fintoc_parse_event_date(created_at):
+        """Return the naive UTC datetime of the `created_at` of a Fintoc event, or None."""
+        if not created_at:
+            return None
+        try:
+            event_date = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if event_date.tzinfo:
+            event_date = event_date.astimezone(timezone.utc).replace(tzinfo=None)
+        return event_date
 
-        raise ValidationError(_(
-            "Fintoc: no transaction could be matched from webhook notification data."
-        ))
+    def _fintoc_write_changed_values(self, values):
+        """Write the values that differ from the current ones, if any.
+
+        Unchanged values are not written, so that a replayed event or redirect neither bumps the
+        `write_date` of the transaction nor invalidates the caches depending on it.
+
+        :param dict values: The values to write, by field name.
+        :return: The written values.
+        :rtype: dict
+        """
+        self.ensure_one()
+        changed_values = {
+            fname: value for fname, value in values.items()
+            if (self[fname] or False) != (value or False)
+        }
+        if changed_values:
+            self.write(changed_values)
+        elif values:
+            METRICS.inc('fintoc_tx_writes_elided_total')
+        return changed_values
 
     def _process_notification_data(self, notification_data):
         """Override of payment to process Fintoc webhook event data."""
@@ -399,10 +918,32 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'fintoc':
             return
 
+        event_type = notification_data.get('event_type')
+        start = time.monotonic()
+        try:
+            self._fintoc_apply_notification_data(notification_data)
+        finally:
+            METRICS.observe(
+                'fintoc_notification_processing_duration_seconds',
+                time.monotonic() - start,
+                {'event_type': event_type if event_type in const.SUPPORTED_WEBHOOK_EVENTS else 'other'},
+            )
+
+    def _fintoc_apply_notification_data(self, notification_data):
+        self.ensure_one()
         event_type = notification_data.get('event_type')
         if not event_type:
             raise ValidationError(_("Fintoc notification is missing event type."))
 
+        event_date = self._fintoc_parse_event_date(notification_data.get('created_at'))
+        if self._fintoc_is_stale_event(event_type, event_date):
+            METRICS.inc('fintoc_stale_events_dropped_total', {'event_type': event_type})
+            _logger.info(
+                "Ignoring stale Fintoc event %s for tx %s (last applied: %s)",
+                event_type, self.reference, self.fintoc_last_event_type,
+            )
+            return
+
         payment_intent_id = notification_data.get('payment_intent_id')
         checkout_session_id = notification_data.get('checkout_session_id')
         refund_id = notification_data.get('refund_id')
@@ -418,8 +959,12 @@ class PaymentTransaction(models.Model):
         if refund_id and self.operation == 'refund':
             updates['fintoc_refund_id'] = refund_id
             updates['provider_reference'] = refund_id
-        if updates:
-            self.write(updates)
+        if event_type in const.EVENT_STATE_RANKS:
+            updates['fintoc_last_event_type'] = event_type
+            updates['fintoc_last_event_date'] = event_date
+        # The changed values stay in the ORM cache and are flushed with the state transition below,
+        # in a single UPDATE of the transaction.
+        self._fintoc_write_changed_values(updates)
 
         if event_type == 'checkout_session.finished':
             # Keep draft state and wait for final payment_intent.* webhook status.
@@ -1,3 +1,10 @@
 from . import common
 from . import test_payment_provider
 from . import test_payment_transaction
+from . import test_payment_fintoc_circuit
+from . import test_payment_fintoc_rate_limit
+from . import test_payment_fintoc_outbox
+from . import test_payment_fintoc_event
+from . import test_metrics
+from . import test_tracing
+from . import test_webhook_benchmark
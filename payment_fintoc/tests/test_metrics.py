@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc.metrics import FintocMetrics, normalize_endpoint
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestFintocMetrics(FintocCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.metrics = FintocMetrics(directory=self.directory, flush_interval=3600)
+
+    def _write_snapshot(self, filename, duplicate_events_count):
+        with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as f:
+            json.dump({
+                'counters': [['fintoc_webhook_duplicate_events_total', [], duplicate_events_count]],
+                'histograms': [],
+            }, f)
+
+    def test_counters_are_summed_across_processes_and_survive_dead_ones(self):
+        self.metrics.inc('fintoc_webhook_duplicate_events_total', value=2)
+        self.metrics.observe('fintoc_webhook_duration_seconds', 0.02, {'outcome': 'ok'})
+        # Snapshot of another worker, which has exited since.
+        dead_filename = f'{socket.gethostname()}-999999999-0dead000.json'
+        self._write_snapshot(dead_filename, 3)
+
+        with patch.object(FintocMetrics, '_is_alive', side_effect=lambda pid: pid == os.getpid()):
+            exposition = self.metrics.render()
+            self.assertIn('fintoc_webhook_duplicate_events_total 5', exposition)
+            self.assertIn(
+                'fintoc_webhook_duration_seconds_bucket{outcome="ok",le="0.025"} 1', exposition
+            )
+            self.assertNotIn(dead_filename, os.listdir(self.directory))
+
+            # The archived counts are still reported on the next scrape.
+            self.assertIn('fintoc_webhook_duplicate_events_total 5', self.metrics.render())
+
+    def test_snapshots_of_other_hosts_are_never_archived(self):
+        remote_filename = 'other-host-999999999-0remote0.json'
+        self._write_snapshot(remote_filename, 3)
+
+        with patch.object(FintocMetrics, '_is_alive', side_effect=lambda pid: pid == os.getpid()):
+            self.assertIn('fintoc_webhook_duplicate_events_total 3', self.metrics.render())
+        self.assertIn(remote_filename, os.listdir(self.directory))
+        self.assertNotIn('archive.json', os.listdir(self.directory))
+
+    def test_snapshots_are_written_by_a_background_thread(self):
+        metrics = FintocMetrics(directory=self.directory, flush_interval=0.01)
+        writing_threads = []
+        write = FintocMetrics._write
+
+        def record_writing_thread(path, snapshot):
+            writing_threads.append(threading.current_thread().name)
+            write(path, snapshot)
+
+        with patch.object(FintocMetrics, '_write', side_effect=record_writing_thread):
+            metrics.inc('fintoc_webhook_duplicate_events_total')
+            for _attempt in range(200):
+                if writing_threads:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(writing_threads[:1], ['fintoc-metrics-flusher'])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_endpoint_ids_are_replaced_by_a_placeholder(self):
+        self.assertEqual(normalize_endpoint('/v1/refunds/re_123/cancel'), '/v1/refunds/{id}/cancel')
+        self.assertEqual(normalize_endpoint('/v2/checkout_sessions'), '/v2/checkout_sessions')
+
+    def test_event_queue_depth_is_reported_for_every_state(self):
+        self.env['payment.fintoc.event'].sudo().create({
+            'event_id': 'evt_metrics_1',
+            'event_type': 'payment_intent.succeeded',
+            'provider_id': self.fintoc.id,
+            'payload': '{}',
+        })
+        gauges = self.env['payment.fintoc.event']._get_metrics_gauges()
+        depth_by_state = {labels['state']: value for _name, labels, value in gauges}
+        self.assertEqual(set(depth_by_state), {'received', 'processed', 'error'})
+        self.assertGreaterEqual(depth_by_state['received'], 1)
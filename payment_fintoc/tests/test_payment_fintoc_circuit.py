@@ -0,0 +1,74 @@
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.models import payment_fintoc_circuit
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestPaymentFintocCircuit(FintocCommon):
+
+    def setUp(self):
+        super().setUp()
+        payment_fintoc_circuit._closed_circuits.clear()
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        circuit_model = self.env['payment.fintoc.circuit']
+        key = 'circuit_test_1'
+
+        for _i in range(const.CIRCUIT_FAILURE_THRESHOLD - 1):
+            circuit_model._record_failure(key)
+        self.assertTrue(circuit_model._acquire(key))
+
+        payment_fintoc_circuit._closed_circuits.clear()
+        circuit_model._record_failure(key)
+        self.assertFalse(circuit_model._acquire(key))
+
+    def test_single_recovery_probe_closes_the_circuit(self):
+        circuit_model = self.env['payment.fintoc.circuit']
+        key = 'circuit_test_2'
+        for _i in range(const.CIRCUIT_FAILURE_THRESHOLD):
+            circuit_model._record_failure(key)
+        self.env.cr.execute(
+            "UPDATE payment_fintoc_circuit SET opened_date = opened_date - interval '1 hour' "
+            "WHERE key = %s",
+            (key,),
+        )
+
+        self.assertTrue(circuit_model._acquire(key))  # The recovery probe.
+        self.assertFalse(circuit_model._acquire(key))
+
+        circuit_model._record_success(key)
+        self.assertTrue(circuit_model._acquire(key))
+        circuit = circuit_model.search([('key', '=', key)])
+        self.assertEqual(circuit.state, 'closed')
+        self.assertEqual(circuit.failure_count, 0)
+
+    def test_success_resets_the_failure_count(self):
+        circuit_model = self.env['payment.fintoc.circuit']
+        key = 'circuit_test_3'
+
+        circuit_model._run_isolated('_record_failure', key)
+        self.assertTrue(circuit_model._run_isolated('_acquire', key))
+        circuit_model._run_isolated('_record_success', key)
+        circuit = circuit_model.search([('key', '=', key)])
+        self.assertEqual(circuit.failure_count, 0)
+
+    def test_failures_of_a_closed_circuit_are_counted_in_memory(self):
+        circuit_model = self.env['payment.fintoc.circuit']
+        key = 'circuit_test_4'
+        self.assertTrue(circuit_model._run_isolated('_acquire', key))
+
+        for _i in range(const.CIRCUIT_FAILURE_THRESHOLD - 1):
+            circuit_model._run_isolated('_record_failure', key)
+            circuit_model._run_isolated('_record_success', key)
+        for _i in range(const.CIRCUIT_FAILURE_THRESHOLD - 1):
+            self.assertTrue(circuit_model._run_isolated('_acquire', key))
+            circuit_model._run_isolated('_record_failure', key)
+        self.assertFalse(circuit_model.search([('key', '=', key)]))
+
+        circuit_model._run_isolated('_record_failure', key)
+        circuit = circuit_model.search([('key', '=', key)])
+        self.assertEqual(circuit.state, 'open')
+        self.assertEqual(circuit.failure_count, const.CIRCUIT_FAILURE_THRESHOLD)
+        self.assertFalse(circuit_model._run_isolated('_acquire', key))
@@ -0,0 +1,162 @@
+import json
+from contextlib import closing
+from unittest.mock import patch
+
+from odoo import sql_db
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.models import payment_fintoc_event
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestPaymentFintocEvent(FintocCommon):
+
+    def _create_event(self, event_id, event_type, data):
+        return self.env['payment.fintoc.event'].create({
+            'event_id': event_id,
+            'event_type': event_type,
+            'provider_id': self.provider.id,
+            'payload': json.dumps({'id': event_id, 'type': event_type, 'data': data}),
+        })
+
+    def test_cron_processes_queued_events(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-EVT-001',
+        )
+        event = self._create_event('evt_queued_1', 'payment_intent.succeeded', {
+            'id': 'pi_queued_1',
+            'metadata': {'odoo_tx_reference': tx.reference},
+        })
+
+        self.env['payment.fintoc.event']._cron_process_received_events()
+
+        self.assertEqual(event.state, 'processed')
+        self.assertEqual(event.transaction_id, tx)
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.fintoc_payment_intent_id, 'pi_queued_1')
+
+    def test_unmatched_queued_event_is_marked_as_error(self):
+        event = self._create_event('evt_queued_2', 'payment_intent.succeeded', {
+            'id': 'pi_unknown',
+            'metadata': {'odoo_tx_reference': 'FINTOC-EVT-UNKNOWN'},
+        })
+
+        self.env['payment.fintoc.event']._cron_process_received_events()
+
+        self.assertEqual(event.state, 'error')
+        self.assertTrue(event.error_message)
+
+    def test_cron_coalesces_events_of_a_same_transaction(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-EVT-003',
+        )
+        events = self._create_event('evt_batch_2', 'payment_intent.succeeded', {
+            'id': 'pi_batch_1',
+            'metadata': {'odoo_tx_reference': tx.reference},
+        }) | self._create_event('evt_batch_1', 'checkout_session.finished', {
+            'id': 'cs_batch_1',
+            'payment_intent_id': 'pi_batch_1',
+            'metadata': {'odoo_tx_reference': tx.reference},
+        })
+
+        with patch.object(
+            type(tx), '_process_notification_data', autospec=True,
+            side_effect=type(tx)._process_notification_data,
+        ) as process_notification_data:
+            self.env['payment.fintoc.event']._cron_process_received_events()
+
+        self.assertEqual(process_notification_data.call_count, 1)
+        self.assertEqual(set(events.mapped('state')), {'processed'})
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.fintoc_checkout_session_id, 'cs_batch_1')
+        self.assertEqual(tx.fintoc_payment_intent_id, 'pi_batch_1')
+
+    def test_event_of_a_transaction_locked_by_another_worker_stays_queued(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-EVT-LOCKED',
+        )
+        event = self._create_event('evt_locked_1', 'payment_intent.succeeded', {
+            'id': 'pi_locked_1',
+            'metadata': {'odoo_tx_reference': tx.reference},
+        })
+
+        with closing(sql_db.db_connect(self.env.cr.dbname).cursor()) as other_cr:
+            other_cr.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)',
+                (const.EVENT_PROCESSING_LOCK_NAMESPACE, tx.id),
+            )
+            event._process(partition_lock=True)
+            other_cr.rollback()
+
+        self.assertEqual(event.state, 'received')
+        self.assertEqual(tx.state, 'draft')
+
+        event._process(partition_lock=True)
+        self.assertEqual(event.state, 'processed')
+
+    def test_create_if_new_detects_duplicates_atomically(self):
+        event_model = self.env['payment.fintoc.event']
+        event = event_model._create_if_new(
+            'evt_dedup_1', 'payment_intent.succeeded', self.provider.id, '{"id":"evt_dedup_1"}'
+        )
+
+        self.assertTrue(event)
+        self.assertEqual(event.state, 'received')
+        self.assertFalse(event_model._create_if_new(
+            'evt_dedup_1', 'payment_intent.succeeded', self.provider.id, '{"id":"evt_dedup_1"}'
+        ))
+        self.assertEqual(event_model.search_count([('event_id', '=', 'evt_dedup_1')]), 1)
+
+    def test_event_ids_remembered_for_another_database_are_not_duplicates(self):
+        event_model = self.env['payment.fintoc.event']
+        with patch.object(
+            payment_fintoc_event, 'RECENT_EVENT_IDS', payment_fintoc_event.RecentEventIds()
+        ) as recent_event_ids:
+            recent_event_ids.add(('other_database', 'evt_dedup_2'))
+            self.assertTrue(event_model._create_if_new(
+                'evt_dedup_2', 'payment_intent.succeeded', self.provider.id, '{"id":"evt_dedup_2"}'
+            ))
+
+    def test_cleanup_cron_tombstones_expired_events_and_compresses_payloads(self):
+        expired_event = self._create_event('evt_cleanup_1', 'payment_intent.succeeded', {})
+        aged_event = self._create_event('evt_cleanup_3', 'payment_intent.succeeded', {})
+        large_data = {'id': 'pi_cleanup', 'description': 'x' * 5000}
+        large_event = self._create_event('evt_cleanup_2', 'payment_intent.succeeded', large_data)
+        large_payload = large_event.payload
+        (expired_event | aged_event | large_event).state = 'processed'
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE payment_fintoc_event SET create_date = create_date - interval '40 days' "
+            "WHERE id = %s",
+            (expired_event.id,),
+        )
+        self.env.cr.execute(
+            "UPDATE payment_fintoc_event SET create_date = create_date - interval '400 days' "
+            "WHERE id = %s",
+            (aged_event.id,),
+        )
+
+        event_model = self.env['payment.fintoc.event']
+        event_model._cron_cleanup_events()
+
+        self.assertTrue(expired_event.exists())
+        self.assertFalse(expired_event.payload)
+        self.assertFalse(expired_event.payload_compressed)
+        self.assertFalse(aged_event.exists())
+        self.assertFalse(large_event.payload)
+        self.assertIsInstance(large_event.payload_compressed, bytes)
+        self.assertEqual(large_event._get_payload(), large_payload)
+        with patch.object(
+            payment_fintoc_event, 'RECENT_EVENT_IDS', payment_fintoc_event.RecentEventIds()
+        ):
+            self.assertFalse(event_model._create_if_new(
+                'evt_cleanup_1', 'payment_intent.succeeded', self.provider.id, '{}'
+            ), msg="The tombstone of an expired event should still deduplicate its redeliveries.")
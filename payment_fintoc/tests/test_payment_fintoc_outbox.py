@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestPaymentFintocOutbox(FintocCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.source_tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-OUTBOX',
+            state='done',
+            fintoc_payment_intent_id='pi_outbox_1',
+            provider_reference='pi_outbox_1',
+        )
+
+    def _dispatch(self, **kwargs):
+        with patch(
+            'odoo.addons.payment_fintoc.models.fintoc_api.FintocApiClient.request_raw', **kwargs
+        ) as request_raw:
+            self.env['payment.fintoc.outbox']._cron_dispatch()
+        return request_raw
+
+    def _make_messages_due(self, messages):
+        messages.next_attempt_date = fields.Datetime.subtract(fields.Datetime.now(), minutes=1)
+
+    def test_refund_is_only_sent_by_the_dispatcher(self):
+        with patch.object(type(self.provider), '_fintoc_make_request_raw') as make_request_raw:
+            refund_tx = self.source_tx._send_refund_request(amount_to_refund=10.0)
+        make_request_raw.assert_not_called()
+
+        message = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self.assertEqual(message.state, 'pending')
+        self.assertEqual(refund_tx.state, 'draft')
+        self.assertTrue(self.env['ir.cron.trigger'].search([
+            ('cron_id', '=', self.env.ref('payment_fintoc.cron_dispatch_fintoc_outbox').id),
+        ]))
+
+    def test_refund_is_accepted_during_outage_then_sent_by_cron(self):
+        refund_tx = self.source_tx._send_refund_request(amount_to_refund=10.0)
+        message = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self._dispatch(side_effect=ValidationError("Fintoc is not reachable right now."))
+        self.assertEqual(refund_tx.state, 'draft')
+        self.assertEqual(message.state, 'pending')
+        self.assertEqual(message.attempt_count, 1)
+        self.assertGreater(message.next_attempt_date, fields.Datetime.now())
+
+        self._make_messages_due(message)
+        request_raw = self._dispatch(
+            return_value=(201, {'id': 're_outbox_1', 'status': 'in_progress'})
+        )
+
+        self.assertEqual(request_raw.call_args.kwargs['idempotency_key'], refund_tx.reference)
+        self.assertEqual(message.state, 'sent')
+        self.assertEqual(refund_tx.state, 'pending')
+        self.assertEqual(refund_tx.fintoc_refund_id, 're_outbox_1')
+
+    def test_refund_cancellation_waits_for_its_refund(self):
+        refund_tx = self.source_tx._send_refund_request(amount_to_refund=10.0)
+        refund_tx.action_fintoc_cancel_refund()
+        messages = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self.assertEqual(messages.mapped('operation'), ['refund', 'refund_cancel'])
+        self.assertEqual(messages.mapped('state'), ['pending', 'pending'])
+
+        self._make_messages_due(messages)
+        self.assertEqual(
+            self.env['payment.fintoc.outbox']._claim_due_messages(10), messages[0]
+        )
+
+    def test_definitive_refund_rejection_sets_the_refund_in_error(self):
+        refund_tx = self.source_tx._send_refund_request(amount_to_refund=10.0)
+        self._dispatch(return_value=(400, {'message': "Amount exceeds the payment"}))
+
+        message = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self.assertEqual(message.state, 'failed')
+        self.assertEqual(refund_tx.state, 'error')
+
+    def test_server_errors_are_retried(self):
+        refund_tx = self.source_tx._send_refund_request(amount_to_refund=10.0)
+        self._dispatch(return_value=(500, {'message': "Internal server error"}))
+
+        message = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self.assertEqual(message.state, 'pending')
+        self.assertEqual(message.attempt_count, 1)
+        self.assertEqual(refund_tx.state, 'draft')
@@ -0,0 +1,79 @@
+from unittest.mock import Mock, patch
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.models import fintoc_api
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestPaymentFintocRateLimit(FintocCommon):
+
+    def test_background_requests_leave_a_reserve_for_requests_with_a_deadline(self):
+        rate_limit_model = self.env['payment.fintoc.rate.limit']
+        key, rate, burst = 'rate_limit_test_1', 1, 4
+        background_floor = burst * const.RATE_LIMIT_BACKGROUND_RESERVE
+
+        granted = [
+            rate_limit_model._acquire(key, rate, burst, background_floor)[0] for _i in range(4)
+        ]
+        self.assertEqual(granted, [True, True, True, False])
+
+        granted, wait = rate_limit_model._acquire(key, rate, burst, -5)
+        self.assertTrue(granted)
+        self.assertEqual(wait, 0)
+        granted, wait = rate_limit_model._acquire(key, rate, burst, -5)
+        self.assertTrue(granted)
+        self.assertEqual(wait, 1)  # The borrowed token is refilled in a second.
+
+    def test_block_holds_all_requests_back(self):
+        rate_limit_model = self.env['payment.fintoc.rate.limit']
+        key = 'rate_limit_test_2'
+        rate_limit_model._block(key, 10)
+
+        granted, wait = rate_limit_model._acquire(key, 1, 4, -5)
+        self.assertFalse(granted)
+        self.assertEqual(wait, 10)
+
+    def test_rate_limited_idempotent_request_is_retried_after_retry_after(self):
+        self.env['ir.config_parameter'].set_param(const.RATE_LIMIT_PER_SECOND_PARAM, 10)
+        session = Mock()
+        session.request.side_effect = [
+            Mock(status_code=429, headers={'Retry-After': '2'}, json=Mock(return_value={})),
+            Mock(status_code=201, headers={}, json=Mock(return_value={'id': 're_123'})),
+        ]
+        client = self.provider._fintoc_get_api_client()
+        with patch.object(fintoc_api.SESSION_POOL, 'get', return_value=session), patch.object(
+            fintoc_api.time, 'sleep'
+        ) as sleep:
+            status_code, response_data = client.request_raw(
+                'POST', '/v1/refunds', payload={}, idempotency_key='R-123'
+            )
+            self.assertEqual((status_code, response_data), (201, {'id': 're_123'}))
+            self.assertGreaterEqual(sleep.call_args.args[0], 2)
+
+            session.request.side_effect = [
+                Mock(status_code=429, headers={}, json=Mock(return_value={})),
+            ]
+            status_code, _response_data = client.request_raw('GET', '/v1/refunds/re_123')
+            self.assertEqual(status_code, 429)  # Not retried without idempotency key.
+
+        blocked_until = self.env['payment.fintoc.rate.limit'].search([
+            ('key', '=', fintoc_api.get_credentials_key(client.base_url, client.secret_key)),
+        ]).blocked_until
+        self.assertTrue(blocked_until)
+
+    def test_rate_limiter_is_disabled_by_default(self):
+        session = Mock()
+        session.request.return_value = Mock(
+            status_code=429, headers={}, json=Mock(return_value={})
+        )
+        client = self.provider._fintoc_get_api_client()
+        with patch.object(fintoc_api.SESSION_POOL, 'get', return_value=session), patch.object(
+            type(self.env['payment.fintoc.rate.limit']), '_run_isolated', autospec=True
+        ) as run_isolated:
+            status_code, _response_data = client.request_raw('GET', '/v1/refunds/re_123')
+
+        self.assertEqual(status_code, 429)
+        run_isolated.assert_not_called()
@@ -2,8 +2,12 @@ import hashlib
 import hmac
 from unittest.mock import patch
 
+from odoo import fields
+from odoo.exceptions import ValidationError
 from odoo.tests import tagged
 
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.models.fintoc_api import FintocSessionPool
 from odoo.addons.payment_fintoc.tests.common import FintocCommon
 
 
@@ -30,9 +34,9 @@ class TestPaymentProvider(FintocCommon):
         )
 
     def test_validate_webhook_signature_accepts_valid_signature(self):
-        payload = b'{"id":"evt_1"}'
+        payload = '{"id":"evt_1"}'
         timestamp = 1700000000
-        signed_payload = f"{timestamp}.{payload.decode('utf-8')}".encode('utf-8')
+        signed_payload = f"{timestamp}.{payload}".encode('utf-8')
         signature = hmac.new(
             self.provider.fintoc_webhook_secret.encode('utf-8'),
             signed_payload,
@@ -47,9 +51,9 @@ class TestPaymentProvider(FintocCommon):
             self.assertTrue(self.provider._fintoc_validate_webhook_signature(header, payload))
 
     def test_validate_webhook_signature_rejects_old_timestamp(self):
-        payload = b'{"id":"evt_2"}'
+        payload = '{"id":"evt_2"}'
         timestamp = 1700000000
-        signed_payload = f"{timestamp}.{payload.decode('utf-8')}".encode('utf-8')
+        signed_payload = f"{timestamp}.{payload}".encode('utf-8')
         signature = hmac.new(
             self.provider.fintoc_webhook_secret.encode('utf-8'),
             signed_payload,
@@ -63,6 +67,54 @@ class TestPaymentProvider(FintocCommon):
         ):
             self.assertFalse(self.provider._fintoc_validate_webhook_signature(header, payload))
 
+    def test_validate_webhook_signature_accepts_previous_secret_during_rotation(self):
+        self.provider.write({
+            'fintoc_webhook_secret': 'whsec_test_rotated',
+            'fintoc_webhook_previous_secrets': 'whsec_test_123',
+        })
+        body_text = '{"id":"evt_3"}'
+        timestamp = 1700000000
+        signature = hmac.new(
+            b'whsec_test_123',
+            f"{timestamp}.{body_text}".encode('utf-8'),
+            hashlib.sha256,
+        ).hexdigest()
+        header = f"t={timestamp},v1={signature}"
+
+        with patch(
+            'odoo.addons.payment_fintoc.models.payment_provider.time.time',
+            return_value=timestamp,
+        ):
+            self.assertTrue(self.provider._fintoc_validate_webhook_signature(header, body_text))
+
+        self.provider.fintoc_webhook_previous_secrets = False
+        with patch(
+            'odoo.addons.payment_fintoc.models.payment_provider.time.time',
+            return_value=timestamp,
+        ):
+            self.assertFalse(self.provider._fintoc_validate_webhook_signature(header, body_text))
+
+    def test_generic_webhook_is_attributed_to_the_provider_of_its_transaction(self):
+        other_provider = self.provider.copy({
+            'name': "Fintoc Other",
+            'fintoc_secret_key': 'sk_test_other',
+            'fintoc_webhook_secret': 'whsec_test_other',
+        })
+        tx = self._create_transaction('redirect', reference='FINTOC-ROUTE-1')
+        event_payload = {
+            'id': 'evt_route_1',
+            'type': 'payment_intent.succeeded',
+            'data': {'id': 'pi_route_1', 'metadata': {'odoo_tx_reference': tx.reference}},
+        }
+
+        provider_model = self.env['payment.provider']
+        self.assertEqual(provider_model._fintoc_get_webhook_provider(event_payload), self.provider)
+        tx.provider_id = other_provider
+        self.assertEqual(provider_model._fintoc_get_webhook_provider(event_payload), other_provider)
+        # Unrelated events cannot be attributed among several providers.
+        event_payload['data']['metadata'] = {'odoo_tx_reference': 'UNKNOWN'}
+        self.assertFalse(provider_model._fintoc_get_webhook_provider(event_payload))
+
     def test_accounting_setup_creates_provider_payment_method_line(self):
         self.provider._fintoc_ensure_accounting_setup()
 
@@ -79,3 +131,134 @@ class TestPaymentProvider(FintocCommon):
         ], limit=1)
         self.assertTrue(payment_method_line)
         self.assertEqual(payment_method_line.payment_method_id, account_payment_method)
+
+    def test_accounting_setup_follows_the_journal_of_the_provider(self):
+        self.provider._fintoc_ensure_accounting_setup()
+        new_journal = self.env['account.journal'].create({
+            'name': "Fintoc Bank",
+            'type': 'bank',
+            'code': 'FTCB',
+            'company_id': self.provider.company_id.id,
+        })
+        self.provider.journal_id = new_journal
+
+        self.provider._fintoc_ensure_accounting_setup()
+        payment_method_line = self.env['account.payment.method.line'].search([
+            ('payment_provider_id', '=', self.provider.id),
+            ('journal_id', '=', new_journal.id),
+        ])
+        self.assertEqual(len(payment_method_line), 1)
+        self.assertEqual(payment_method_line.payment_method_id.code, 'fintoc')
+
+    def test_batched_setup_of_several_providers(self):
+        providers = self.provider | self.provider.copy({'fintoc_enable_card': False})
+        providers |= self.provider.copy({'fintoc_enable_bank_transfer': False})
+        providers.fintoc_enable_card = True
+        self.assertEqual(
+            providers.mapped(lambda p: set(p.payment_method_ids.ids)),
+            [set(filter(None, providers._fintoc_get_payment_method_ids()))] * 3,
+        )
+
+        providers.with_context(skip_fintoc_pm_sync=True).payment_method_ids = False
+        providers._fintoc_sync_payment_methods()
+        self.assertTrue(all(provider.payment_method_ids for provider in providers))
+
+        providers._fintoc_ensure_accounting_setup()
+        payment_method_lines = self.env['account.payment.method.line'].search([
+            ('payment_provider_id', 'in', providers.ids),
+            ('journal_id', '!=', False),
+        ])
+        self.assertEqual(payment_method_lines.payment_provider_id, providers)
+        self.assertEqual(payment_method_lines.payment_method_id.code, 'fintoc')
+
+    def test_session_pool_reuses_sessions_per_base_url_and_secret_key(self):
+        pool = FintocSessionPool(max_sessions=2)
+        session = pool.get('https://api.fintoc.com', 'sk_test_123')
+
+        self.assertIs(pool.get('https://api.fintoc.com', 'sk_test_123'), session)
+        self.assertIsNot(pool.get('https://api.fintoc.com', 'sk_test_456'), session)
+
+        pool.get('https://mock.fintoc.test', 'sk_test_123')
+        self.assertEqual(len(pool._sessions), 2)
+        self.assertIsNot(pool.get('https://api.fintoc.com', 'sk_test_123'), session)
+
+    def test_checkout_session_creation_remembers_v1_fallback(self):
+        with patch.object(
+            type(self.provider), '_fintoc_make_request_raw', return_value=(404, {}),
+        ) as make_request_raw, patch.object(
+            type(self.provider), '_fintoc_make_request', return_value={'id': 'cs_v1'},
+        ) as make_request:
+            self.provider._fintoc_create_checkout_session({}, 'key-1')
+            self.provider._fintoc_create_checkout_session({}, 'key-2')
+
+        self.assertEqual(make_request_raw.call_count, 1)
+        self.assertEqual(make_request.call_count, 2)
+        self.assertEqual(make_request.call_args.kwargs['idempotency_key'], 'key-2-v1')
+        self.assertEqual(self.provider.fintoc_checkout_api_version, 'v1')
+
+        self.provider.fintoc_api_base_url = 'https://mock.fintoc.test'
+        self.assertFalse(self.provider.fintoc_checkout_api_version)
+
+    def test_expired_v1_version_is_negotiated_again_inline(self):
+        self.env['payment.fintoc.capability'].create({
+            'provider_id': self.provider.id,
+            'capability': 'checkout_api_version',
+            'value': 'v1',
+            'check_date': fields.Datetime.subtract(
+                fields.Datetime.now(), hours=const.CHECKOUT_API_VERSION_TTL_HOURS + 1
+            ),
+        })
+        with patch.object(
+            type(self.provider), '_fintoc_make_request_raw', return_value=(201, {'id': 'cs_v2'}),
+        ) as make_request_raw:
+            self.provider._fintoc_create_checkout_session({}, 'key-1')
+            self.assertEqual(self.provider.fintoc_checkout_api_version, 'v2')
+
+            with patch.object(
+                type(self.env['payment.fintoc.capability']), '_learn', autospec=True
+            ) as learn, patch.object(type(self.provider), 'write', autospec=True) as write:
+                self.provider._fintoc_create_checkout_session({}, 'key-2')
+            learn.assert_not_called()
+            write.assert_not_called()
+
+        self.assertEqual(make_request_raw.call_count, 2)
+        self.assertEqual(make_request_raw.call_args.kwargs['endpoint'], '/v2/checkout_sessions')
+
+    def test_payment_intent_support_is_only_written_when_it_changes_or_expires(self):
+        capability_model = self.env['payment.fintoc.capability']
+        self.provider._fintoc_set_payment_intent_support(False)
+        self.assertEqual(self.provider.fintoc_payment_intent_support, 'unsupported')
+        self.assertFalse(self.provider._fintoc_supports_payment_intent())
+
+        with patch.object(type(capability_model), '_learn', autospec=True) as learn:
+            self.provider._fintoc_set_payment_intent_support(False)
+        learn.assert_not_called()
+
+        capability_model.search([('provider_id', '=', self.provider.id)]).check_date = (
+            fields.Datetime.subtract(
+                fields.Datetime.now(), hours=const.PAYMENT_INTENT_SUPPORT_TTL_HOURS + 1
+            )
+        )
+        self.provider.invalidate_recordset()
+        self.assertTrue(self.provider._fintoc_supports_payment_intent())
+        with patch.object(type(capability_model), '_learn', autospec=True) as learn:
+            self.provider._fintoc_set_payment_intent_support(False)
+        learn.assert_called_once()
+
+    def test_new_deadline_uses_operation_budget_and_split_timeouts(self):
+        self.provider.write({
+            'fintoc_connect_timeout': 3,
+            'fintoc_read_timeout': 15,
+            'fintoc_checkout_deadline': 10,
+        })
+
+        deadline = self.provider._fintoc_new_deadline('checkout')
+
+        self.assertLessEqual(deadline.get_remaining(), 10)
+        connect_timeout, read_timeout = deadline.get_timeout()
+        self.assertEqual(connect_timeout, 3)
+        self.assertLessEqual(read_timeout, 10)
+
+        deadline.expires_at = 0
+        with self.assertRaises(ValidationError):
+            deadline.get_timeout()
@@ -1,5 +1,8 @@
 from unittest.mock import patch
 
+import psycopg2
+
+from odoo import fields
 from odoo.exceptions import ValidationError
 from odoo.tests import tagged
 
@@ -79,6 +82,115 @@ class TestPaymentTransaction(FintocCommon):
         self.assertEqual(tx.fintoc_checkout_session_id, 'cs_test_fresh_2')
         self.assertEqual(tx.fintoc_checkout_attempt, 2)
 
+    def test_concurrent_renders_share_one_checkout_session(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-001-SINGLEFLIGHT',
+        )
+        before, after = (
+            fields.Datetime.subtract(fields.Datetime.now(), minutes=1),
+            fields.Datetime.add(fields.Datetime.now(), minutes=1),
+        )
+
+        with patch.object(
+            type(self.provider),
+            '_fintoc_create_checkout_session',
+            side_effect=[
+                {'id': 'cs_sf_1', 'redirect_url': 'https://checkout.example.test/sf/1'},
+                {'id': 'cs_sf_2', 'redirect_url': 'https://checkout.example.test/sf/2'},
+            ],
+        ) as create_checkout_session, patch.object(
+            type(tx), '_fintoc_get_request_start', side_effect=[before, before, after],
+        ):
+            first_values = tx._get_specific_rendering_values({})
+            # Started before the session was created: a concurrent render of the same click.
+            concurrent_values = tx._get_specific_rendering_values({})
+            self.assertEqual(create_checkout_session.call_count, 1)
+            self.assertEqual(concurrent_values, first_values)
+
+            # Started after the session was created: a new checkout.
+            later_values = tx._get_specific_rendering_values({})
+
+        self.assertEqual(later_values['api_url'], 'https://checkout.example.test/sf/2')
+        self.assertEqual(tx.fintoc_checkout_attempt, 2)
+
+    def test_render_timing_out_on_a_concurrent_render_does_not_create_a_session(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-001-LOCKED',
+        )
+        self.env.cr.postcommit.data.pop('payment_fintoc.written_tx_ids')
+        committed_values = {
+            'fintoc_checkout_session_id': 'cs_locked',
+            'fintoc_redirect_url': 'https://checkout.example.test/locked',
+        }
+
+        with patch.object(
+            type(self.provider), '_fintoc_create_checkout_session'
+        ) as create_checkout_session, patch.object(
+            type(tx),
+            '_fintoc_read_checkout_session',
+            side_effect=[
+                psycopg2.errors.LockNotAvailable(),
+                (committed_values, 1),
+                psycopg2.errors.LockNotAvailable(),
+                (None, 1),
+            ],
+        ):
+            # The concurrent render committed its session while this one waited.
+            self.assertEqual(tx._fintoc_join_or_create_checkout_session(), committed_values)
+            # The concurrent render is still calling Fintoc.
+            with self.assertRaises(ValidationError):
+                tx._fintoc_join_or_create_checkout_session()
+        self.assertEqual(create_checkout_session.call_count, 0)
+
+    def test_transactions_written_by_the_request_are_not_coalesced(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-001-WRITTEN',
+        )
+        self.assertIsNone(tx._fintoc_get_request_start())
+
+        # As in a later request, which did not write the transaction.
+        self.env.cr.postcommit.data.pop('payment_fintoc.written_tx_ids')
+        self.assertTrue(tx._fintoc_get_request_start())
+
+        with self.env.cr.savepoint():
+            tx.state_message = "Written in a savepoint, not flushed yet."
+        self.assertIsNone(tx._fintoc_get_request_start())
+
+    def test_payment_initiation_fallback_is_remembered_by_provider(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-001-PI',
+        )
+        payload = {'payment_methods': ['payment_intent']}
+
+        with patch.object(
+            type(self.provider),
+            '_fintoc_create_checkout_session',
+            side_effect=[
+                ValidationError("invalid_enum payment_intent not supported"),
+                {'id': 'cs_pi_1', 'redirect_url': 'https://checkout.example.test/pi/1'},
+                {'id': 'cs_pi_2', 'redirect_url': 'https://checkout.example.test/pi/2'},
+            ],
+        ) as create_checkout_session:
+            tx._fintoc_create_checkout_session_with_fallback(payload, 1)
+            tx._fintoc_create_checkout_session_with_fallback(payload, 2)
+
+        self.assertEqual(create_checkout_session.call_count, 3)
+        last_payload, last_idempotency_key = create_checkout_session.call_args.args
+        self.assertEqual(last_payload['payment_methods'], ['payment_initiation'])
+        self.assertEqual(
+            last_idempotency_key,
+            f'odoo-fintoc-tx-{tx.id}-checkout-payment-initiation-fallback-2',
+        )
+        self.assertEqual(self.provider.fintoc_payment_intent_support, 'unsupported')
+
     def test_process_notification_data_marks_transaction_done(self):
         tx = self._create_transaction(
             flow='redirect',
@@ -111,6 +223,122 @@ class TestPaymentTransaction(FintocCommon):
         self.assertEqual(tx.state, 'draft')
         self.assertEqual(tx.fintoc_checkout_session_id, 'cs_finished_1')
 
+    def test_stale_events_are_dropped_before_any_write(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-002-STALE',
+        )
+        tx._process_notification_data({
+            'event_type': 'payment_intent.succeeded',
+            'payment_intent_id': 'pi_stale_1',
+            'created_at': '2026-01-01T12:00:05Z',
+        })
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.fintoc_last_event_type, 'payment_intent.succeeded')
+
+        with patch.object(type(tx), 'write', autospec=True) as write:
+            # Late checkout_session.finished, then an older final state and a replay.
+            tx._process_notification_data({
+                'event_type': 'checkout_session.finished',
+                'checkout_session_id': 'cs_stale_1',
+                'created_at': '2026-01-01T12:00:01Z',
+            })
+            tx._process_notification_data({
+                'event_type': 'payment_intent.failed',
+                'payment_intent_id': 'pi_stale_1',
+                'created_at': '2026-01-01T12:00:00Z',
+            })
+            tx._process_notification_data({
+                'event_type': 'payment_intent.succeeded',
+                'payment_intent_id': 'pi_stale_1',
+                'created_at': '2026-01-01T12:00:05Z',
+            })
+        write.assert_not_called()
+        self.assertEqual(tx.state, 'done')
+
+    def test_final_states_are_ordered_to_the_microsecond(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-002-SAME-SECOND',
+        )
+        tx._process_notification_data({
+            'event_type': 'payment_intent.failed',
+            'payment_intent_id': 'pi_same_second_1',
+            'created_at': '2026-01-01T12:00:00.200000Z',
+        })
+        tx._process_notification_data({
+            'event_type': 'payment_intent.succeeded',
+            'payment_intent_id': 'pi_same_second_1',
+            'created_at': '2026-01-01T12:00:00.700000Z',
+        })
+        self.assertEqual(tx.fintoc_last_event_type, 'payment_intent.succeeded')
+
+        # An undated final state cannot be ordered against the applied one.
+        tx._process_notification_data({
+            'event_type': 'payment_intent.rejected',
+            'payment_intent_id': 'pi_same_second_1',
+        })
+        self.assertEqual(tx.fintoc_last_event_type, 'payment_intent.succeeded')
+
+    def test_unchanged_identifiers_are_not_written(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-002-ELIDED',
+            fintoc_payment_intent_id='pi_elided_1',
+            provider_reference='pi_elided_1',
+            fintoc_checkout_session_id='cs_elided_1',
+        )
+        with patch.object(type(tx), 'write', autospec=True, side_effect=type(tx).write) as write:
+            self.assertFalse(tx._fintoc_write_changed_values({
+                'fintoc_checkout_session_id': 'cs_elided_1',
+            }))
+            write.assert_not_called()
+
+            tx._process_notification_data({
+                'event_type': 'payment_intent.succeeded',
+                'payment_intent_id': 'pi_elided_1',
+                'checkout_session_id': 'cs_elided_1',
+                'created_at': '2026-01-01T12:00:00Z',
+            })
+        written_fields = set().union(*(call.args[1] for call in write.call_args_list))
+        self.assertNotIn('fintoc_payment_intent_id', written_fields)
+        self.assertNotIn('provider_reference', written_fields)
+        self.assertNotIn('fintoc_checkout_session_id', written_fields)
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.fintoc_last_event_type, 'payment_intent.succeeded')
+
+    def test_get_tx_from_notification_data_follows_identifier_priority(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-002-B',
+            fintoc_payment_intent_id='pi_lookup_1',
+            fintoc_checkout_session_id='cs_lookup_1',
+        )
+        other_tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-002-C',
+        )
+        tx_model = self.env['payment.transaction']
+
+        self.assertEqual(
+            tx_model._get_tx_from_notification_data('fintoc', {'payment_intent_id': 'pi_lookup_1'}),
+            tx,
+        )
+        self.assertEqual(
+            tx_model._get_tx_from_notification_data('fintoc', {
+                'odoo_tx_reference': other_tx.reference,
+                'checkout_session_id': 'cs_lookup_1',
+            }),
+            other_tx,
+        )
+        with self.assertRaises(ValidationError):
+            tx_model._get_tx_from_notification_data('fintoc', {'payment_intent_id': 'pi_unknown'})
+
     def test_send_refund_request_creates_pending_refund_transaction(self):
         tx = self._create_transaction(
             flow='redirect',
@@ -121,17 +349,99 @@ class TestPaymentTransaction(FintocCommon):
             provider_reference='pi_refundable_1',
         )
 
-        with patch.object(
-            type(self.provider),
-            '_fintoc_make_request',
-            return_value={'id': 're_test_1', 'status': 'in_progress'},
+        refund_tx = tx._send_refund_request(amount_to_refund=10.0)
+        with patch(
+            'odoo.addons.payment_fintoc.models.fintoc_api.FintocApiClient.request_raw',
+            return_value=(201, {'id': 're_test_1', 'status': 'in_progress'}),
         ):
-            refund_tx = tx._send_refund_request(amount_to_refund=10.0)
+            self.env['payment.fintoc.outbox']._cron_dispatch()
 
         self.assertEqual(refund_tx.operation, 'refund')
         self.assertEqual(refund_tx.state, 'pending')
         self.assertEqual(refund_tx.fintoc_refund_id, 're_test_1')
 
+    def test_bulk_refund_is_sent_through_the_outbox(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-003-BULK',
+            state='done',
+            fintoc_payment_intent_id='pi_bulk_1',
+            provider_reference='pi_bulk_1',
+        )
+
+        tx.action_fintoc_bulk_refund()
+        refund_tx = tx.child_transaction_ids.filtered(lambda t: t.operation == 'refund')
+        message = self.env['payment.fintoc.outbox'].search([('transaction_id', '=', refund_tx.id)])
+        self.assertEqual(message.operation, 'refund')
+        self.assertEqual(message.state, 'pending')
+
+        tx.action_fintoc_bulk_refund()  # Already fully refunded.
+        self.assertEqual(len(tx.child_transaction_ids), 1)
+
+        with patch(
+            'odoo.addons.payment_fintoc.models.fintoc_api.FintocApiClient.request_raw',
+            return_value=(200, {'id': 're_bulk_1', 'status': 'in_progress'}),
+        ) as request_raw:
+            self.env['payment.fintoc.outbox']._cron_dispatch()
+
+        self.assertEqual(request_raw.call_args.kwargs['idempotency_key'], refund_tx.reference)
+        self.assertEqual(message.state, 'sent')
+        self.assertEqual(refund_tx.fintoc_refund_id, 're_bulk_1')
+        self.assertEqual(refund_tx.state, 'pending')
+
+    def test_reconciliation_cron_processes_missed_payment_intent_status(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-004-RECONCILE',
+            fintoc_payment_intent_id='pi_missed_1',
+        )
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE payment_transaction SET create_date = create_date - interval '2 hours' "
+            "WHERE id = %s",
+            (tx.id,),
+        )
+        tx.invalidate_recordset(['create_date'])
+
+        with patch(
+            'odoo.addons.payment_fintoc.models.fintoc_api.FintocApiClient.request_raw',
+            return_value=(200, {'id': 'pi_missed_1', 'status': 'succeeded'}),
+        ) as request_raw:
+            self.env['payment.transaction']._cron_fintoc_reconcile_stale_transactions()
+
+        self.assertEqual(request_raw.call_args.kwargs['endpoint'], '/v1/payment_intents/pi_missed_1')
+        self.assertEqual(tx.state, 'done')
+
+    def test_reconciliation_cron_backs_off_transactions_without_final_status(self):
+        tx = self._create_transaction(
+            flow='redirect',
+            payment_method_id=self.payment_method_bank.id,
+            reference='FINTOC-TX-004-BACKOFF',
+            fintoc_payment_intent_id='pi_waiting_1',
+        )
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE payment_transaction SET create_date = create_date - interval '2 hours' "
+            "WHERE id = %s",
+            (tx.id,),
+        )
+        tx.invalidate_recordset(['create_date'])
+
+        with patch(
+            'odoo.addons.payment_fintoc.models.fintoc_api.FintocApiClient.request_raw',
+            return_value=(200, {'id': 'pi_waiting_1', 'status': 'pending'}),
+        ) as request_raw:
+            self.env['payment.transaction']._cron_fintoc_reconcile_stale_transactions()
+            self.assertEqual(request_raw.call_count, 1)
+            self.assertEqual(tx.fintoc_reconcile_count, 1)
+            self.assertGreater(tx.fintoc_reconcile_next_date, fields.Datetime.now())
+
+            self.env['payment.transaction']._cron_fintoc_reconcile_stale_transactions()
+            self.assertEqual(request_raw.call_count, 1)
+        self.assertEqual(tx.state, 'draft')
+
     def test_payment_initiation_fallback_detection(self):
         should_fallback = self.env['payment.transaction']._fintoc_should_fallback_to_payment_initiation
 
@@ -0,0 +1,54 @@
+import json
+import os
+import shutil
+import tempfile
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_fintoc import const, tracing
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+
+@tagged('-at_install', 'post_install')
+class TestFintocTracing(FintocCommon):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.trace_path = os.path.join(directory, 'traces.jsonl')
+        set_param = self.env['ir.config_parameter'].sudo().set_param
+        set_param(const.TRACE_EXPORTER_PARAM, 'file')
+        set_param(const.TRACE_EXPORTER_TARGET_PARAM, self.trace_path)
+
+    def test_file_exporter_writes_the_span_tree(self):
+        with tracing.start_trace(self.env, 'fintoc.webhook'):
+            with tracing.span('signature'):
+                pass
+            with tracing.span('process'):
+                with tracing.span('apply', event_type='payment_intent.succeeded'):
+                    pass
+
+        with open(self.trace_path, encoding='utf-8') as trace_file:
+            trace = json.loads(trace_file.readline())
+        spans_by_name = {span['name']: span for span in trace['spans']}
+        self.assertEqual(set(spans_by_name), {'fintoc.webhook', 'signature', 'process', 'apply'})
+        self.assertEqual(
+            spans_by_name['apply']['parent_span_id'], spans_by_name['process']['span_id']
+        )
+        self.assertEqual(
+            spans_by_name['apply']['attributes'], {'event_type': 'payment_intent.succeeded'}
+        )
+
+    def test_slow_trace_is_logged_with_its_breakdown(self):
+        self.env['ir.config_parameter'].sudo().set_param(const.TRACE_SLOW_THRESHOLD_MS_PARAM, 1)
+        with self.assertLogs('odoo.addons.payment_fintoc.tracing', level='WARNING') as logs:
+            with tracing.start_trace(self.env, 'fintoc.webhook'):
+                with tracing.span('dedup'):
+                    self.env.cr.execute('SELECT pg_sleep(0.01)')
+        self.assertIn('dedup:', logs.output[0])
+
+    def test_spans_outside_of_a_trace_are_no_ops(self):
+        with tracing.span('tx_lookup') as span:
+            self.assertIsNone(span)
+        self.assertFalse(os.path.exists(self.trace_path))
@@ -0,0 +1,238 @@
+"""Throughput benchmark of the Fintoc webhook controller, with regression budgets.
+
+Not part of the standard test run. Run it with `--test-tags fintoc_benchmark`; the volumes are set
+through environment variables:
+
+- FINTOC_BENCHMARK_EVENTS: events replayed per scenario (default 50).
+- FINTOC_BENCHMARK_PROVIDER_COUNTS: comma-separated Fintoc provider counts (default "1,10").
+- FINTOC_BENCHMARK_TX_TABLE_SIZES: comma-separated filler transaction counts (default "0,2000").
+- FINTOC_BENCHMARK_FIXTURES: path of the webhook fixtures (default: the operational pack's
+  sandbox/webhook-fixtures.json).
+- FINTOC_BENCHMARK_RECORD=1: store the results as the new baselines instead of checking them;
+  FINTOC_BENCHMARK_RECORD=queries only stores the query counts, which do not depend on the machine.
+- FINTOC_BENCHMARK_OUTPUT: path where the results are also written, as JSON.
+
+Baselines are stored in benchmarks/webhook_baselines.json, by scenario. A scenario regresses when its
+throughput drops, or its query count per event grows, beyond the tolerances of that file. Scenarios
+without any baseline are never reported as passing: once the others are checked, the benchmark is
+skipped with the list of the scenarios to record. Throughput baselines depend on the machine:
+record them on the machine that checks them; the committed baselines only hold the query counts.
+"""
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import os
+import statistics
+import time
+import uuid
+
+from odoo.tests import tagged
+
+from odoo.addons.payment.tests.http_common import PaymentHttpCommon
+from odoo.addons.payment_fintoc import const
+from odoo.addons.payment_fintoc.tests.common import FintocCommon
+
+_logger = logging.getLogger(__name__)
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'benchmarks', 'webhook_baselines.json')
+DEFAULT_FIXTURES_PATH = os.path.join(
+    os.path.dirname(__file__),
+    '..', '..', 'fintoc_odoo_operational_pack', 'sandbox', 'webhook-fixtures.json',
+)
+FILLER_BATCH_SIZE = 1000
+
+
+def _get_int_list(name, default):
+    return sorted({int(value) for value in os.environ.get(name, default).split(',') if value})
+
+
+@tagged('-at_install', 'post_install', '-standard', 'fintoc_benchmark')
+class TestFintocWebhookBenchmark(FintocCommon, PaymentHttpCommon):
+
+    def test_webhook_throughput(self):
+        fixtures_path = os.environ.get('FINTOC_BENCHMARK_FIXTURES') or DEFAULT_FIXTURES_PATH
+        if not os.path.exists(fixtures_path):
+            self.skipTest(f"Webhook fixtures not found at {fixtures_path}")
+        with open(fixtures_path, encoding='utf-8') as fixtures_file:
+            fixtures = json.load(fixtures_file)
+
+        events_per_scenario = int(os.environ.get('FINTOC_BENCHMARK_EVENTS', 50))
+        results = {}
+        for tx_table_size in _get_int_list('FINTOC_BENCHMARK_TX_TABLE_SIZES', '0,2000'):
+            self._grow_transaction_table(tx_table_size)
+            for provider_count in _get_int_list('FINTOC_BENCHMARK_PROVIDER_COUNTS', '1,10'):
+                self._grow_providers(provider_count)
+                for event_type, fixture in fixtures.items():
+                    scenario = f'{event_type}|providers={provider_count}|txs={tx_table_size}'
+                    results[scenario] = self._run_scenario(fixture, events_per_scenario)
+                    _logger.info("Fintoc webhook benchmark %s: %s", scenario, results[scenario])
+
+        if os.environ.get('FINTOC_BENCHMARK_OUTPUT'):
+            with open(os.environ['FINTOC_BENCHMARK_OUTPUT'], 'w', encoding='utf-8') as output_file:
+                json.dump(results, output_file, indent=2, sort_keys=True)
+        with open(BASELINES_PATH, encoding='utf-8') as baselines_file:
+            baselines = json.load(baselines_file)
+        record_mode = os.environ.get('FINTOC_BENCHMARK_RECORD')
+        if record_mode:
+            recorded_keys = ['queries_per_event']
+            if record_mode != 'queries':
+                recorded_keys.append('events_per_second')
+            for scenario, result in results.items():
+                baselines['scenarios'][scenario] = {key: result[key] for key in recorded_keys}
+            with open(BASELINES_PATH, 'w', encoding='utf-8') as baselines_file:
+                json.dump(baselines, baselines_file, indent=2, sort_keys=True)
+                baselines_file.write('\n')
+            return
+
+        regressions = self._get_regressions(results, baselines)
+        if regressions:
+            self.fail("Fintoc webhook benchmark regressions:\n" + '\n'.join(regressions))
+        missing_scenarios = sorted(set(results) - set(baselines['scenarios']))
+        if missing_scenarios:
+            self.skipTest(
+                "No Fintoc webhook benchmark baseline for the scenarios below; record them with "
+                "FINTOC_BENCHMARK_RECORD=queries:\n" + '\n'.join(missing_scenarios)
+            )
+
+    # === SCENARIO SETUP === #
+
+    def _grow_transaction_table(self, size):
+        """Add done filler transactions until the table holds `size` of them."""
+        tx_model = self.env['payment.transaction']
+        existing_count = tx_model.search_count([('reference', '=like', 'BENCH-FILL-%')])
+        for batch_start in range(existing_count, size, FILLER_BATCH_SIZE):
+            tx_model.create([
+                {
+                    'provider_id': self.fintoc.id,
+                    'payment_method_id': self.payment_method_bank.id,
+                    'amount': self.amount,
+                    'currency_id': self.currency.id,
+                    'partner_id': self.partner.id,
+                    'reference': f'BENCH-FILL-{i}',
+                    'operation': 'online_redirect',
+                    'state': 'done',
+                    'provider_reference': f'pi_bench_fill_{i}',
+                    'fintoc_payment_intent_id': f'pi_bench_fill_{i}',
+                    'fintoc_checkout_session_id': f'cs_bench_fill_{i}',
+                }
+                for i in range(batch_start, min(batch_start + FILLER_BATCH_SIZE, size))
+            ])
+
+    def _grow_providers(self, count):
+        """Add Fintoc providers, each with its own webhook secret, until there are `count`."""
+        provider_model = self.env['payment.provider']
+        existing_count = provider_model.search_count([
+            ('code', '=', 'fintoc'), ('fintoc_webhook_secret', '!=', False),
+        ])
+        for i in range(existing_count, count):
+            # The secret key is not copied, but is required on enabled providers.
+            self.fintoc.copy({
+                'name': f"Fintoc benchmark {i}",
+                'state': 'test',
+                'fintoc_secret_key': self.fintoc.fintoc_secret_key,
+                'fintoc_webhook_secret': f'whsec_bench_{i}',
+            })
+
+    def _prepare_event(self, fixture):
+        """Return a copy of the fixture targeting a fresh transaction."""
+        event = copy.deepcopy(fixture)
+        suffix = uuid.uuid4().hex[:12]
+        event['id'] = f'evt_bench_{suffix}'
+        data = event['data']
+        payment_intent_id = f'pi_bench_{suffix}'
+        if event['type'].startswith('refund.'):
+            source_tx = self._create_transaction(
+                flow='redirect',
+                reference=f'BENCH-{suffix}',
+                state='done',
+                fintoc_payment_intent_id=payment_intent_id,
+                provider_reference=payment_intent_id,
+            )
+            refund_tx = self._create_transaction(
+                flow='redirect',
+                reference=f'R-BENCH-{suffix}',
+                amount=-self.amount,
+                operation='refund',
+                state='pending',
+                source_transaction_id=source_tx.id,
+                fintoc_refund_id=f're_bench_{suffix}',
+                provider_reference=f're_bench_{suffix}',
+            )
+            data.update({'id': refund_tx.fintoc_refund_id, 'resource_id': payment_intent_id})
+            data.setdefault('metadata', {})['odoo_tx_reference'] = refund_tx.reference
+            return event
+
+        tx = self._create_transaction(flow='redirect', reference=f'BENCH-{suffix}')
+        if event['type'] == 'checkout_session.finished':
+            data.update({'id': f'cs_bench_{suffix}', 'payment_intent_id': payment_intent_id})
+        else:
+            data['id'] = payment_intent_id
+        data.setdefault('metadata', {})['odoo_tx_reference'] = tx.reference
+        return event
+
+    # === MEASURE === #
+
+    def _run_scenario(self, fixture, events_count):
+        bodies = [json.dumps(self._prepare_event(fixture)) for _i in range(events_count)]
+        latencies, query_counts = [], []
+        start = time.monotonic()
+        for body in bodies:
+            headers = {
+                'Content-Type': 'application/json',
+                'Fintoc-Signature': self._sign(body, self.fintoc.fintoc_webhook_secret),
+            }
+            query_count = self.cr.sql_log_count
+            request_start = time.monotonic()
+            response = self.url_open(const.WEBHOOK_ROUTE, data=body, headers=headers)
+            latencies.append(time.monotonic() - request_start)
+            query_counts.append(self.cr.sql_log_count - query_count)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['status'], 'ok')
+        elapsed = time.monotonic() - start
+
+        percentiles = (
+            statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        )
+        return {
+            'events': events_count,
+            'events_per_second': round(events_count / elapsed, 2),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(percentiles[98] * 1000, 2),
+            'queries_per_event': round(statistics.mean(query_counts), 2),
+        }
+
+    @staticmethod
+    def _sign(body, secret):
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode('utf-8'),
+            f'{timestamp}.{body}'.encode('utf-8'),
+            hashlib.sha256,
+        ).hexdigest()
+        return f't={timestamp},v1={signature}'
+
+    @staticmethod
+    def _get_regressions(results, baselines):
+        throughput_tolerance = baselines['tolerance']['events_per_second']
+        queries_tolerance = baselines['tolerance']['queries_per_event']
+        regressions = []
+        for scenario, result in sorted(results.items()):
+            baseline = baselines['scenarios'].get(scenario)
+            if not baseline:
+                continue  # Reported apart, as the scenario cannot be checked.
+            if 'events_per_second' in baseline:
+                min_throughput = baseline['events_per_second'] * (1 - throughput_tolerance)
+                if result['events_per_second'] < min_throughput:
+                    regressions.append(
+                        f"{scenario}: {result['events_per_second']} events/s "
+                        f"< {min_throughput:.2f} (baseline {baseline['events_per_second']})"
+                    )
+            max_queries = baseline['queries_per_event'] * (1 + queries_tolerance)
+            if result['queries_per_event'] > max_queries:
+                regressions.append(
+                    f"{scenario}: {result['queries_per_event']} queries/event "
+                    f"> {max_queries:.2f} (baseline {baseline['queries_per_event']})"
+                )
+        return regressions
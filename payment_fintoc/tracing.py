@@ -0,0 +1,260 @@
+"""Lightweight tracing of the Fintoc hot paths.
+
+A trace is a tree of spans, each recording its wall time and the number of SQL queries executed by
+the thread during the span. Spans opened outside of a trace are no-ops, so that instrumented code
+called from crons or thread pools costs nothing. Finished traces are exported to a JSON lines file
+or to an OpenTelemetry collector (OTLP/HTTP with JSON encoding), and the slow ones are logged with
+their full breakdown.
+"""
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from odoo.tools import config
+
+from odoo.addons.payment_fintoc import const
+
+_logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Span:
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = None
+        self._start = time.monotonic()
+        self._start_query_count = _get_query_count()
+        self.duration = 0.0
+        self.query_count = 0
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_time_ns = time.time_ns()
+        self.duration = time.monotonic() - self._start
+        self.query_count = _get_query_count() - self._start_query_count
+
+    def iter_spans(self):
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+
+    def format_breakdown(self, depth=0):
+        """Return the indented tree of the durations and query counts of the span."""
+        lines = [
+            f"{'  ' * depth}{self.name}: {self.duration * 1000:.1f} ms, {self.query_count} queries"
+        ]
+        for child in self.children:
+            lines.append(child.format_breakdown(depth + 1))
+        return '\n'.join(lines)
+
+
+def _get_query_count():
+    # Odoo counts the queries of all the cursors of the thread serving a request or a cron.
+    return getattr(threading.current_thread(), 'query_count', 0)
+
+
+def get_current_span():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def start_trace(env, name, **attributes):
+    """Open the root span of a trace, exported and checked for slowness when it ends.
+
+    :param odoo.api.Environment env: The environment used to read the tracing settings.
+    :param str name: The name of the root span.
+    """
+    if get_current_span() is not None:  # Already traced: nest into the current trace.
+        with span(name, **attributes) as child:
+            yield child
+        return
+
+    root = Span(name, attributes=attributes)
+    _local.stack = [root]
+    try:
+        yield root
+    except Exception as error:
+        root.set_attribute('error', type(error).__name__)
+        raise
+    finally:
+        root.end()
+        _local.stack = None
+        _finish_trace(env, root)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child span of the current span, or do nothing outside of a trace."""
+    parent = get_current_span()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent=parent, attributes=attributes)
+    parent.children.append(child)
+    _local.stack.append(child)
+    try:
+        yield child
+    except Exception as error:
+        child.set_attribute('error', type(error).__name__)
+        raise
+    finally:
+        child.end()
+        _local.stack.pop()
+
+
+def _finish_trace(env, root):
+    try:
+        get_param = env['ir.config_parameter'].sudo().get_param
+        slow_threshold_ms = int(get_param(
+            const.TRACE_SLOW_THRESHOLD_MS_PARAM, const.DEFAULT_TRACE_SLOW_THRESHOLD_MS
+        ))
+        exporter_name = get_param(const.TRACE_EXPORTER_PARAM) or ''
+        target = get_param(const.TRACE_EXPORTER_TARGET_PARAM) or ''
+    except Exception:  # The transaction may be aborted; never fail the traced request.
+        _logger.debug("Unable to read the Fintoc tracing settings", exc_info=True)
+        return
+
+    if slow_threshold_ms and root.duration * 1000 >= slow_threshold_ms:
+        _logger.warning("Slow Fintoc trace %s:\n%s", root.trace_id, root.format_breakdown())
+    if exporter_name == 'file':
+        path = target or os.path.join(config['data_dir'], 'fintoc_traces.jsonl')
+        FILE_EXPORTER.export(root, path)
+    elif exporter_name == 'otlp' and target:
+        OTLP_EXPORTER.export(root, target)
+
+
+class FileExporter:
+    """Append each finished trace as one JSON line to a local file, for offline analysis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def export(self, root, path):
+        line = json.dumps({
+            'trace_id': root.trace_id,
+            'spans': [
+                {
+                    'span_id': s.span_id,
+                    'parent_span_id': s.parent.span_id if s.parent else None,
+                    'name': s.name,
+                    'start_time_ns': s.start_time_ns,
+                    'duration_ms': round(s.duration * 1000, 3),
+                    'query_count': s.query_count,
+                    'attributes': s.attributes,
+                }
+                for s in root.iter_spans()
+            ],
+        }, default=str)
+        try:
+            with self._lock, open(path, 'a', encoding='utf-8') as trace_file:
+                trace_file.write(line + '\n')
+        except OSError:
+            _logger.warning("Unable to write the Fintoc trace to %s", path)
+
+
+class OtlpExporter:
+    """Send the finished traces to an OTLP/HTTP collector from a background thread.
+
+    Traces are queued and sent by a daemon thread so that the traced requests never wait for the
+    collector; they are dropped when the queue is full.
+    """
+
+    def __init__(self, maxsize=const.TRACE_EXPORT_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._reset()
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, root, endpoint):
+        try:
+            self._queue.put_nowait((self._build_payload(root), endpoint))
+        except queue.Full:
+            _logger.debug("Fintoc trace export queue is full, dropping trace %s", root.trace_id)
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='fintoc-trace-exporter', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            payload, endpoint = self._queue.get()
+            try:
+                requests.post(endpoint, json=payload, timeout=const.TRACE_EXPORT_TIMEOUT)
+            except requests.exceptions.RequestException:
+                _logger.debug("Unable to export the Fintoc trace to %s", endpoint, exc_info=True)
+
+    @staticmethod
+    def _build_payload(root):
+        def format_attributes(attributes):
+            formatted_attributes = []
+            for key, value in attributes.items():
+                if isinstance(value, bool):
+                    formatted_value = {'boolValue': value}
+                elif isinstance(value, int):
+                    formatted_value = {'intValue': str(value)}
+                elif isinstance(value, float):
+                    formatted_value = {'doubleValue': value}
+                else:
+                    formatted_value = {'stringValue': str(value)}
+                formatted_attributes.append({'key': key, 'value': formatted_value})
+            return formatted_attributes
+
+        spans = []
+        for s in root.iter_spans():
+            otlp_span = {
+                'traceId': s.trace_id,
+                'spanId': s.span_id,
+                'name': s.name,
+                'kind': 1,  # SPAN_KIND_INTERNAL
+                'startTimeUnixNano': str(s.start_time_ns),
+                'endTimeUnixNano': str(s.end_time_ns),
+                'attributes': format_attributes(
+                    dict(s.attributes, **{'db.query_count': s.query_count})
+                ),
+            }
+            if s.parent:
+                otlp_span['parentSpanId'] = s.parent.span_id
+            if 'error' in s.attributes:
+                otlp_span['status'] = {'code': 2}  # STATUS_CODE_ERROR
+            spans.append(otlp_span)
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': format_attributes({'service.name': 'odoo'})},
+                'scopeSpans': [{'scope': {'name': 'payment_fintoc'}, 'spans': spans}],
+            }],
+        }
+
+    def _after_fork_in_child(self):
+        # The exporter thread of the parent does not exist in the child.
+        self._reset()
+
+
+FILE_EXPORTER = FileExporter()
+OTLP_EXPORTER = OtlpExporter()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=OTLP_EXPORTER._after_fork_in_child)